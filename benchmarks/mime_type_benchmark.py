@@ -0,0 +1,77 @@
+"""
+Times content type lookups for generated file names, next to the stdlib's 
+mimetypes and (if installed) the "mime" package they used to go through.
+
+    python benchmarks/mime_type_benchmark.py [file name count]
+"""
+
+import os
+import sys
+import time
+import random
+import mimetypes
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "boa_nimbus"))
+
+import mime_type_helpers
+
+default_file_name_count = 100000
+
+extension_list = [
+    ".html", ".HTML", ".js", ".css", ".json", ".png", ".JPG", ".svg", ".woff2", ".map",
+    ".txt", ".zip", ".pdf", ".ico", ".webp", ".mp4", ".xml", ".unknownext", ""
+]
+
+def build_file_name_list(file_name_count):
+    random.seed(0)
+    
+    return [
+        "assets/dir{}/file{}{}".format(x % 100, x, random.choice(extension_list)) for x in range(file_name_count)
+    ]
+
+def time_lookups(label, lookup_function, file_name_list):
+    start_time = time.time()
+    
+    for each_file_name in file_name_list:
+        lookup_function(each_file_name)
+    
+    elapsed_seconds = time.time() - start_time
+    
+    print("{}: {:.3f}s ({:.2f}us per file name)".format(
+        label,
+        elapsed_seconds,
+        1000000.0 * elapsed_seconds / len(file_name_list)
+    ))
+
+def main():
+    file_name_count = int(sys.argv[1]) if len(sys.argv) > 1 else default_file_name_count
+    
+    file_name_list = build_file_name_list(file_name_count)
+    
+    print("{} file names:".format(file_name_count))
+    
+    # The first lookup loads mime.types.txt; keep it out of the timings.
+    start_time = time.time()
+    mime_type_helpers.load_extension_mime_type_map()
+    print("Loading mime.types.txt: {:.3f}s".format(time.time() - start_time))
+    
+    content_type_overrides = {mime_type_helpers.normalize_extension(".map"): "application/json"}
+    
+    time_lookups("mime_type_helpers.get_mime_type", mime_type_helpers.get_mime_type, file_name_list)
+    time_lookups(
+        "mime_type_helpers.get_mime_type with overrides",
+        lambda x: mime_type_helpers.get_mime_type(x, content_type_overrides),
+        file_name_list
+    )
+    time_lookups("mimetypes.guess_type", mimetypes.guess_type, file_name_list)
+    
+    try:
+        import mime
+    except ImportError:
+        print("mime.Types.of: skipped (the mime package is not installed)")
+        return
+    
+    time_lookups("mime.Types.of", mime.Types.of, file_name_list)
+
+if __name__ == "__main__":
+    main()
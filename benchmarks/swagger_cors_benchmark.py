@@ -0,0 +1,76 @@
+"""
+Times the CORS preprocessing of a generated Swagger template.
+
+    python benchmarks/swagger_cors_benchmark.py [path count]
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "boa_nimbus"))
+
+from preprocess_swagger_input import SwaggerCorsTransformer, canonical_yaml_dump
+
+default_path_count = 5000
+
+def build_template(path_count):
+    input_template = {
+        "swagger": "2.0",
+        "info": {"title": "benchmark", "version": "1"},
+        "x-boa-cors-enable": True,
+        "x-boa-cors-headers": "Content-Type,X-Requested-With",
+        "x-boa-cors-max-age": 600,
+        "x-boa-lambda-default-error-regex-format": ".*\"errorCode\": {error_code}.*",
+        "x-boa-lambda-catchall-error-status-code": 500,
+        "x-boa-lambda-catchall-error-regex-format": ".+",
+        "securityDefinitions": {
+            "api_key": {"type": "apiKey", "name": "x-api-key", "in": "header"}
+        },
+        "paths": {}
+    }
+    
+    for each_index in range(path_count):
+        input_template["paths"]["/resource{}/{{id}}".format(each_index)] = {
+            "get": {
+                "security": [{"api_key": []}],
+                "responses": {"200": {"description": "OK"}, "404": {"description": "Missing"}},
+                "x-boa-lambda-resource-name": "GetFunction{}".format(each_index % 20),
+                "x-boa-lambda-integration-type": "direct" if each_index % 2 == 0 else "proxy"
+            },
+            "post": {
+                "responses": {"201": {"description": "Created"}},
+                "x-boa-lambda-resource-name": "PostFunction{}".format(each_index % 20)
+            }
+        }
+    
+    return input_template
+
+def main():
+    path_count = int(sys.argv[1]) if len(sys.argv) > 1 else default_path_count
+    
+    input_template = build_template(path_count)
+    
+    start_time = time.time()
+    
+    cors_transformer = SwaggerCorsTransformer(input_template, "us-west-2", "123456789012")
+    
+    for each_path in input_template["paths"].keys():
+        cors_transformer.enable_cors_for_path(each_path)
+    
+    transform_seconds = time.time() - start_time
+    
+    start_time = time.time()
+    output_string = canonical_yaml_dump(input_template)
+    dump_seconds = time.time() - start_time
+    
+    print("{} paths: CORS {:.2f}s ({:.3f}ms per path), YAML dump {:.2f}s, {:.1f} MB output".format(
+        path_count,
+        transform_seconds,
+        1000.0 * transform_seconds / path_count,
+        dump_seconds,
+        len(output_string) / (1024.0 * 1024.0)
+    ))
+
+if __name__ == "__main__":
+    main()
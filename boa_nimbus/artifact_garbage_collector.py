@@ -0,0 +1,121 @@
+import datetime
+import click
+from botocore.exceptions import ClientError
+import aws_helpers
+
+from upload_directory_contents_to_bucket import UploadDirectoryContentsToBucketDeployStepAction
+
+default_retention_days = 7
+
+# Unreferenced artifacts are only deleted once older than the retention 
+# window, so a rollback or an in-flight deploy can still use them.
+class ArtifactGarbageCollector(object):
+    
+    def __init__(self, full_config, retention_days = None, dry_run = False):
+        self.full_config = full_config
+        self.dry_run = dry_run
+        
+        if retention_days is None:
+            retention_days = full_config.get("ArtifactRetentionDays", default_retention_days)
+        
+        self.retention_days = retention_days
+    
+    def get_deploy_step_list(self):
+        step_list = []
+        
+        for each_group_dict in self.full_config.get("DeployStepGroups", []):
+            step_list.extend(each_group_dict.get("Steps", []))
+        
+        return step_list
+    
+    def get_stack_referenced_keys(self):
+        
+        cf_client = aws_helpers.get_client("cloudformation")
+        
+        referenced_key_set = set()
+        
+        for each_step in self.get_deploy_step_list():
+            if each_step.get("Action") != "CreateOrUpdateCloudFormationStack":
+                continue
+            
+            parameter_name_set = set(each_step.get("ArtifactKeyParameters", {}).keys())
+            
+            if len(parameter_name_set) == 0:
+                continue
+            
+            try:
+                response = cf_client.describe_stacks(
+                    StackName = each_step["StackName"]
+                )
+            except ClientError as e:
+                if e.response['Error']['Code'] == 'ValidationError' and "does not exist" in str(e):
+                    continue
+                else:
+                    raise
+            
+            for each_parameter_dict in response["Stacks"][0].get("Parameters", []):
+                if each_parameter_dict["ParameterKey"] in parameter_name_set:
+                    referenced_key_set.add(each_parameter_dict["ParameterValue"])
+        
+        return referenced_key_set
+    
+    def run(self):
+        
+        upload_action_list = []
+        
+        for each_step in self.get_deploy_step_list():
+            if each_step.get("Action") != "UploadDirectoryContentsToBucket":
+                continue
+            
+            if not each_step.get("ContentAddressedKeys", False):
+                continue
+            
+            upload_action_list.append(UploadDirectoryContentsToBucketDeployStepAction(self.full_config, each_step))
+        
+        if len(upload_action_list) == 0:
+            click.echo("No upload steps with \"ContentAddressedKeys\" enabled. Nothing to collect.")
+            return
+        
+        referenced_key_set = self.get_stack_referenced_keys()
+        
+        cutoff_time = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(days = self.retention_days)
+        
+        s3_client = aws_helpers.get_client("s3")
+        
+        for each_upload_action in upload_action_list:
+            bucket_name = each_upload_action.get_bucket_name()
+            
+            step_referenced_key_set = referenced_key_set | set(each_upload_action.get_content_addressed_keys())
+            
+            delete_key_list = []
+            kept_count = 0
+            
+            response_iter = s3_client.get_paginator("list_objects_v2").paginate(
+                Bucket = bucket_name,
+                Prefix = each_upload_action.content_addressed_key_prefix
+            )
+            
+            for each_response in response_iter:
+                for each_object in each_response.get("Contents", []):
+                    if each_object["Key"] in step_referenced_key_set or each_object["LastModified"] > cutoff_time:
+                        kept_count += 1
+                        continue
+                    
+                    delete_key_list.append(each_object["Key"])
+            
+            click.echo("s3://{}/{}: {} unreferenced artifact(s) older than {} day(s), {} kept.".format(
+                bucket_name,
+                each_upload_action.content_addressed_key_prefix,
+                len(delete_key_list),
+                self.retention_days,
+                kept_count
+            ))
+            
+            if self.dry_run:
+                for each_key in delete_key_list:
+                    click.echo(" * Would delete {}".format(each_key))
+                continue
+            
+            deleted_count = aws_helpers.delete_objects(s3_client, bucket_name, delete_key_list)
+            
+            click.echo("Deleted {} artifact(s).".format(deleted_count))
@@ -0,0 +1,46 @@
+import os
+import base64
+import binascii
+import threading
+import click
+
+default_content_addressed_key_prefix = "artifacts/"
+
+resolved_keys_lock = threading.Lock()
+
+# Key a file would have been uploaded to -> the content-addressed key it was 
+# uploaded to in this run.
+resolved_keys = {}
+
+# "lambda/MyFunction.zip" -> "<prefix>lambda/MyFunction-<sha256>.zip"
+def get_content_addressed_key(s3_key, file_sha256_base64, key_prefix = default_content_addressed_key_prefix):
+    file_sha256_hex = binascii.hexlify(base64.b64decode(file_sha256_base64)).decode("utf-8")
+    
+    key_stem, key_extension = os.path.splitext(s3_key)
+    
+    return "{}{}-{}{}".format(key_prefix, key_stem, file_sha256_hex, key_extension)
+
+def record_resolved_key(s3_key, resolved_s3_key):
+    with resolved_keys_lock:
+        resolved_keys[s3_key] = resolved_s3_key
+
+def get_resolved_key(s3_key):
+    with resolved_keys_lock:
+        return resolved_keys.get(s3_key)
+
+# Each key has to have been uploaded by an earlier step.
+def get_parameter_values(parameter_key_map):
+    parameter_values = {}
+    
+    for each_parameter_key, each_s3_key in parameter_key_map.items():
+        resolved_s3_key = get_resolved_key(each_s3_key)
+        
+        if resolved_s3_key is None:
+            raise click.ClickException("No content-addressed upload of {} for stack parameter {}. Is it uploaded by an earlier step with \"ContentAddressedKeys\" enabled?".format(
+                each_s3_key,
+                each_parameter_key
+            ))
+        
+        parameter_values[each_parameter_key] = resolved_s3_key
+    
+    return parameter_values
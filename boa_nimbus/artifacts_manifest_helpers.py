@@ -0,0 +1,132 @@
+import os
+import json
+import time
+import threading
+import hashing_helpers
+import file_helpers
+
+default_artifacts_manifest_path = ".boa-nimbus-artifacts.json"
+artifacts_manifest_version = 1
+
+artifacts_manifest_path = default_artifacts_manifest_path
+
+manifest_lock = threading.Lock()
+loaded_manifest = None
+
+# Recorded artifacts are written out at most this often while building, 
+# rather than rewriting the whole manifest for every artifact.
+manifest_write_interval_seconds = 10
+manifest_changed = False
+manifest_written_time = 0
+
+# Called with each newly recorded artifact's manifest entry.
+artifact_listeners = []
+
+def configure_artifacts_manifest(full_config):
+    global artifacts_manifest_path
+    global loaded_manifest
+    
+    flush_manifest()
+    
+    artifacts_manifest_path = full_config.get("ArtifactsManifestPath", default_artifacts_manifest_path)
+    loaded_manifest = None
+
+def get_manifest_key(path):
+    return os.path.normpath(os.path.relpath(path)).replace(os.sep, "/")
+
+def load_manifest():
+    global loaded_manifest
+    
+    if loaded_manifest is None:
+        try:
+            loaded_manifest = json.loads(open(artifacts_manifest_path).read())
+        except (IOError, ValueError):
+            loaded_manifest = {}
+        
+        loaded_manifest.setdefault("Version", artifacts_manifest_version)
+        loaded_manifest.setdefault("Artifacts", {})
+    
+    return loaded_manifest
+
+def write_manifest():
+    global manifest_changed
+    global manifest_written_time
+    
+    file_helpers.write_file_if_changed(
+        artifacts_manifest_path,
+        json.dumps(loaded_manifest, indent = 2, sort_keys = True).encode("utf-8")
+    )
+    
+    manifest_changed = False
+    manifest_written_time = time.time()
+
+def flush_manifest():
+    with manifest_lock:
+        if manifest_changed:
+            write_manifest()
+
+# The manifest is only written now and then; call flush_manifest() once the 
+# build is done.
+def record_artifact(path, source_hash = None, runtime = None):
+    global manifest_changed
+    
+    file_stat = os.stat(path)
+    file_md5, file_sha256_base64 = hashing_helpers.file_md5_and_sha256_base64(path)
+    
+    artifact_dict = {
+        "Path": get_manifest_key(path),
+        "Size": file_stat.st_size,
+        "ModifiedTime": file_stat.st_mtime,
+        "QuickChecksum": hashing_helpers.file_quick_checksum(path),
+        "Md5": file_md5,
+        "Sha256Base64": file_sha256_base64,
+        "SourceHash": source_hash,
+        "Runtime": runtime,
+        "RecordedAt": int(time.time())
+    }
+    
+    with manifest_lock:
+        manifest = load_manifest()
+        manifest["Artifacts"][artifact_dict["Path"]] = artifact_dict
+        manifest_changed = True
+        
+        if time.time() - manifest_written_time >= manifest_write_interval_seconds:
+            write_manifest()
+    
+    for each_listener in list(artifact_listeners):
+        each_listener(artifact_dict)
+    
+    return artifact_dict
+
+# A file of the recorded size still matches if its mtime is unchanged, or else 
+# (e.g. after being copied between jobs) if its quick checksum agrees.
+def get_artifact(path):
+    with manifest_lock:
+        artifact_dict = load_manifest()["Artifacts"].get(get_manifest_key(path))
+    
+    if artifact_dict is None:
+        return None
+    
+    try:
+        file_stat = os.stat(path)
+    except OSError:
+        return None
+    
+    if file_stat.st_size != artifact_dict.get("Size"):
+        return None
+    
+    if file_stat.st_mtime == artifact_dict.get("ModifiedTime"):
+        return artifact_dict
+    
+    if artifact_dict.get("QuickChecksum") is None or hashing_helpers.file_quick_checksum(path) != artifact_dict["QuickChecksum"]:
+        return None
+    
+    return artifact_dict
+
+def get_file_digests(path):
+    artifact_dict = get_artifact(path)
+    
+    if artifact_dict is not None:
+        return artifact_dict["Md5"], artifact_dict["Sha256Base64"]
+    
+    return hashing_helpers.file_md5_and_sha256_base64(path)
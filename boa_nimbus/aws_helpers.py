@@ -0,0 +1,123 @@
+import threading
+import boto3
+import click
+import concurrency_helpers
+
+# Creating clients from boto3's default session isn't thread-safe, but using 
+# them is. Steps create clients from worker threads, so go through here.
+client_creation_lock = threading.Lock()
+
+account_id = None
+
+# Largest number of keys a single DeleteObjects request accepts.
+delete_objects_batch_size = 1000
+
+# Client methods that don't make requests.
+unlimited_client_methods = set([
+    "can_paginate",
+    "get_waiter",
+    "generate_presigned_url",
+    "generate_presigned_post"
+])
+
+# Every request (including each page of a listing) takes a slot from the 
+# service's adaptive concurrency limiter.
+class LimitedClient(object):
+    
+    def __init__(self, client, limiter):
+        self.client = client
+        self.limiter = limiter
+    
+    def __getattr__(self, name):
+        attribute = getattr(self.client, name)
+        
+        if name == "get_paginator":
+            return lambda operation_name: LimitedPaginator(attribute(operation_name), self.limiter)
+        
+        if name.startswith("_") or name in unlimited_client_methods or not callable(attribute):
+            return attribute
+        
+        return lambda *args, **kwargs: self.limiter.call(attribute, *args, **kwargs)
+
+class LimitedPaginator(object):
+    
+    def __init__(self, paginator, limiter):
+        self.paginator = paginator
+        self.limiter = limiter
+    
+    def paginate(self, **kwargs):
+        page_iterator = iter(self.paginator.paginate(**kwargs))
+        
+        while True:
+            # A page iterator can't be retried, so pages only take a slot.
+            try:
+                with self.limiter.slot():
+                    each_page = next(page_iterator)
+            except StopIteration:
+                return
+            
+            yield each_page
+
+def get_client(service_name, region_name = None):
+    with client_creation_lock:
+        client = boto3.client(service_name, region_name = region_name)
+    
+    if hasattr(client, "meta"):
+        client.meta.events.register(
+            "needs-retry.{}".format(service_name),
+            concurrency_helpers.on_needs_retry(service_name)
+        )
+    
+    return LimitedClient(client, concurrency_helpers.get_limiter(service_name))
+
+def get_account_id():
+    global account_id
+    
+    if account_id is None:
+        account_id = get_client("sts").get_caller_identity()["Account"]
+    
+    return account_id
+
+# Bucket names are global, so when deploying to explicitly listed regions each 
+# region's bucket also carries the region name.
+def get_bucket_name(bucket_name_prefix, region_name = None):
+    bucket_name = bucket_name_prefix + get_account_id()
+    
+    if region_name is not None:
+        bucket_name = "{}-{}".format(bucket_name, region_name)
+    
+    return bucket_name
+
+def get_s3_url(bucket_name, key, region_name = None):
+    if region_name is None or region_name == "us-east-1":
+        return "https://s3.amazonaws.com/{}/{}".format(bucket_name, key)
+    
+    return "https://s3.{}.amazonaws.com/{}/{}".format(region_name, bucket_name, key)
+
+# Up to 1000 keys per request. Returns the number deleted.
+def delete_objects(s3_client, bucket_name, s3_key_list):
+    deleted_count = 0
+    
+    for batch_start in range(0, len(s3_key_list), delete_objects_batch_size):
+        batch_key_list = s3_key_list[batch_start:batch_start + delete_objects_batch_size]
+        
+        response = s3_client.delete_objects(
+            Bucket = bucket_name,
+            Delete = {
+                "Objects": [{"Key": x} for x in batch_key_list],
+                "Quiet": True
+            }
+        )
+        
+        error_list = response.get("Errors", [])
+        
+        for each_error in error_list:
+            click.echo("Unable to delete s3://{}/{}: {}".format(
+                bucket_name,
+                each_error.get("Key"),
+                each_error.get("Message")
+            ), err = True)
+        
+        deleted_count += len(batch_key_list) - len(error_list)
+    
+    return deleted_count
@@ -3,14 +3,26 @@ import json
 import uuid
 import hashlib
 import hashing_helpers
+import local_cache_helpers
 
 build_cache_hashes_directory = None
 
-def get_hash_of_path(path):
+def get_hash_of_path(path, dependency_hashes = None):
     if os.path.isfile(path):
-        return hashing_helpers.file_md5_checksum(path)
+        path_hash = hashing_helpers.file_md5_checksum(path)
     else:
-        return hashing_helpers.directory_sha1_hash(path)
+        path_hash = hashing_helpers.directory_sha1_hash(path)
+    
+    if not dependency_hashes:
+        return path_hash
+    
+    # Fold in the hashes of anything else the build output depends on.
+    combined_hash = hashlib.sha1(str(path_hash).encode("utf-8"))
+    
+    for each_key in sorted(dependency_hashes.keys()):
+        combined_hash.update("\n{}={}".format(each_key, dependency_hashes[each_key]).encode("utf-8"))
+    
+    return combined_hash.hexdigest()
 
 def get_previous_build_cache_hash_file_path(build_key, path):
     cache_file = "{}-{}.json".format(
@@ -33,18 +45,24 @@ def get_previous_build_hash_for_path(build_key, path):
         # Effectively guarantee the hash doesn't match.
         return hashlib.md5(str(uuid.uuid4()).encode("utf-8")).hexdigest()
 
-def has_build_hash_changed_for_path(build_key, path):
-    new_hash = get_hash_of_path(path)
+def has_build_hash_changed_for_path(build_key, path, dependency_hashes = None):
+    new_hash = get_hash_of_path(path, dependency_hashes)
     old_hash = get_previous_build_hash_for_path(build_key, path)
     
+    local_cache_helpers.record_access(
+        build_cache_hashes_directory,
+        get_previous_build_cache_hash_file_path(build_key, path),
+        hit = old_hash == new_hash
+    )
+    
     return old_hash != new_hash
 
-def write_build_hash_for_path(build_key, path):
+def write_build_hash_for_path(build_key, path, dependency_hashes = None):
     cache_hash_file_path = get_previous_build_cache_hash_file_path(build_key, path)
     
     with open(cache_hash_file_path, "w") as f:
     
-        current_path_hash = get_hash_of_path(path)
+        current_path_hash = get_hash_of_path(path, dependency_hashes)
     
         f.write(json.dumps({
             "path": current_path_hash
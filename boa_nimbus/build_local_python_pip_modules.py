@@ -3,9 +3,15 @@ import sys
 import json
 import subprocess
 import hashlib
+import shutil
+import tempfile
+import concurrent.futures
 import click
 import hashing_helpers
 import build_cache_helpers
+import remote_cache_helpers
+
+supported_package_formats = ["wheel", "sdist"]
 
 class BuildLocalPythonPipModulesBuildStepAction(object):
     
@@ -14,10 +20,19 @@ class BuildLocalPythonPipModulesBuildStepAction(object):
     def __init__(self, full_config, step_config):
         self.input_directory = step_config.get("InputDirectory", "")
         self.output_directory = step_config.get("OutputDirectory", "")
+        self.package_format = step_config.get("PackageFormat", "wheel")
+        self.max_workers = step_config.get("MaxWorkers", os.cpu_count() or 4)
+        
+        if self.package_format not in supported_package_formats:
+            raise click.ClickException("Unsupported \"PackageFormat\" for BuildLocalPythonPipModules: {}".format(
+                self.package_format
+            ))
         
         self.build_cache_hashes_directory = full_config.get("BuildCacheHashesDirectory")
         
-        self.build_cache_key = "BuildLocalPythonPipModules"
+        # Switching formats has to rebuild, or the other format's output is 
+        # all that's left in the output directory.
+        self.build_cache_key = "BuildLocalPythonPipModules-{}".format(self.package_format)
     
     def run(self):
         
@@ -28,12 +43,25 @@ class BuildLocalPythonPipModulesBuildStepAction(object):
         if use_docker:
             click.echo("WARNING: Docker-based builds of pip modules not yet implemented. Building without Docker.")
         
+        os.makedirs(self.output_directory, exist_ok = True)
+        
+        module_dir_list = []
+        
         for root, dir_list, file_list in os.walk(self.input_directory):
             if root != self.input_directory:
                 break
             
             for each_dir in dir_list:
-                self.build_pip_module_from_dir(os.path.join(root, each_dir))
+                module_dir_list.append(os.path.join(root, each_dir))
+        
+        with concurrent.futures.ThreadPoolExecutor(max_workers = self.max_workers) as executor:
+            future_list = [
+                executor.submit(self.build_pip_module_from_dir, each_dir) for each_dir in module_dir_list
+            ]
+        
+        # Let every module finish before reporting the first failure.
+        for each_future in future_list:
+            each_future.result()
     
     def build_pip_module_from_dir(self, source_dir):
         
@@ -43,37 +71,72 @@ class BuildLocalPythonPipModulesBuildStepAction(object):
             ))
             return
         
-        click.echo("Building pip module: {}".format(source_dir))
+        output_dir = os.path.abspath(self.output_directory)
+        
+        module_remote_cache_key = remote_cache_helpers.get_remote_cache_key(
+            self.build_cache_key,
+            build_cache_helpers.get_hash_of_path(source_dir),
+            "dist.zip"
+        )
+        
+        if remote_cache_helpers.fetch_directory(module_remote_cache_key, output_dir):
+            click.echo("Fetched pip module {} from remote build cache.".format(source_dir))
+            build_cache_helpers.write_build_hash_for_path(self.build_cache_key, source_dir)
+            return
+        
+        click.echo("Building pip module ({}): {}".format(self.package_format, source_dir))
         
-        pip_build_args = [
-            sys.executable,
-            "-u",
-            "setup.py",
-            "-q",
-            "sdist",
-            "--dist-dir",
-            os.path.abspath(self.output_directory)
-        ]
+        # Build into a directory of its own so exactly this module's 
+        # distributions can be pushed to the remote build cache.
+        dist_dir = tempfile.mkdtemp()
         
-        previous_working_dir = os.getcwd()
-        os.chdir(source_dir)
+        if self.package_format == "wheel":
+            pip_build_args = [
+                sys.executable,
+                "-m",
+                "pip",
+                "wheel",
+                "-q",
+                "--no-deps",
+                "--wheel-dir",
+                dist_dir,
+                "."
+            ]
+        else:
+            pip_build_args = [
+                sys.executable,
+                "-u",
+                "setup.py",
+                "-q",
+                "sdist",
+                "--dist-dir",
+                dist_dir
+            ]
         
+        # Each build gets its own working directory rather than changing the
+        # working directory of the whole process.
         try:
             p = subprocess.run(
                 pip_build_args,
+                cwd = source_dir,
                 check = True,
                 stdout = subprocess.PIPE,
                 stderr = subprocess.PIPE
             )
-        except Exception as e:
-            try:
-                click.error(p.stderr)
-            except:
-                pass
+        except subprocess.CalledProcessError as e:
+            shutil.rmtree(dist_dir)
+            
+            click.echo(e.stderr.decode("utf-8", "replace"), err = True)
             
-            raise
+            raise click.ClickException("Unable to build pip module: {}".format(source_dir))
+        
+        try:
+            remote_cache_helpers.push_directory(module_remote_cache_key, dist_dir)
+            
+            for each_file in os.listdir(dist_dir):
+                shutil.move(os.path.join(dist_dir, each_file), os.path.join(output_dir, each_file))
         finally:
-            os.chdir(previous_working_dir)
+            shutil.rmtree(dist_dir)
         
         build_cache_helpers.write_build_hash_for_path(self.build_cache_key, source_dir)
-        
\ No newline at end of file
+
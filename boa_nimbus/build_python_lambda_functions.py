@@ -1,24 +1,50 @@
 import os
 import sys
 import json
+import hashlib
 import subprocess
 import uuid
+import zlib
 import shutil
 import click
 import yaml
 import docker_helpers
 import hashing_helpers
 import build_cache_helpers
+import zip_helpers
+import local_module_helpers
+import remote_cache_helpers
+import artifacts_manifest_helpers
+import package_size_helpers
 
 exclude_files = [".DS_Store"]
 
+# Wheels Lambda's Amazon Linux can load, by runtime.
+default_manylinux_platform_tags = ["manylinux2014_x86_64", "manylinux2010_x86_64", "manylinux1_x86_64"]
+
+lambda_runtime_wheel_tags = {
+    "python2.7": ("2.7", "cp27mu"),
+    "python3.6": ("3.6", "cp36m")
+}
+
 class BuildPythonLambdaFunctionsBuildStepAction(object):
     
     def __init__(self, full_config, step_config):
         self.input_directory = step_config.get("InputDirectory", "")
         self.output_directory = step_config.get("OutputDirectory", "")
         self.local_python_packages_directory = step_config.get("LocalPythonPackagesDirectory")
+        self.local_module_source_directories = local_module_helpers.get_local_module_source_directories(full_config)
         self.pip_cache_directory = step_config.get("PipCacheDirectory")
+        self.compression_level = step_config.get("CompressionLevel", zlib.Z_DEFAULT_COMPRESSION)
+        self.compression_workers = step_config.get("CompressionWorkers", os.cpu_count() or 1)
+        self.store_only_extensions = step_config.get("StoreOnlyExtensions", zip_helpers.default_store_only_extensions)
+        
+        # {"MaxZipBytes": ..., "MaxUncompressedBytes": ...} for every function,
+        # and overrides for individual ones.
+        self.package_size_budget = full_config.get("PackageSizeBudget", {})
+        self.function_size_budgets = step_config.get("FunctionSizeBudgets", {})
+        self.size_report_top_count = step_config.get("SizeReportTopCount", 10)
+        self.manylinux_platform_tags = step_config.get("ManylinuxPlatformTags", default_manylinux_platform_tags)
         
         self.build_cache_key_prefix = "BuildPythonLambdaFunctions"
     
@@ -28,22 +54,217 @@ class BuildPythonLambdaFunctionsBuildStepAction(object):
         
         os.makedirs(self.output_directory, exist_ok = True)
         
+        local_distribution_hashes = local_module_helpers.get_local_distribution_hashes(
+            self.local_python_packages_directory,
+            self.local_module_source_directories
+        )
+        
+        for each_dir in self.get_function_source_dirs():
+            self.build_lambda_function_from_dir(
+                each_dir,
+                self.get_local_module_hashes(each_dir, local_distribution_hashes)
+            )
+        
+        self.check_package_sizes()
+    
+    def get_size_report_path(self, function_name):
+        if build_cache_helpers.build_cache_hashes_directory is None:
+            return None
+        
+        return os.path.join(
+            build_cache_helpers.build_cache_hashes_directory,
+            "package-size-reports",
+            "{}-{}.json".format(
+                hashlib.md5(os.path.abspath(self.output_directory).encode("utf-8")).hexdigest(),
+                function_name
+            )
+        )
+    
+    # Only the zips' directories are read, so unchanged functions are cheap.
+    def check_package_sizes(self):
+        violation_list = []
+        
+        for each_dir in self.get_function_source_dirs():
+            function_name = os.path.split(each_dir)[1]
+            
+            build_zip_path = os.path.join(self.output_directory, "{}.zip".format(function_name))
+            
+            if not os.path.exists(build_zip_path):
+                continue
+            
+            report = package_size_helpers.get_package_size_report(build_zip_path, self.size_report_top_count)
+            
+            report_path = self.get_size_report_path(function_name)
+            
+            previous_report = None
+            
+            if report_path is not None:
+                previous_report = package_size_helpers.load_report(report_path)
+                package_size_helpers.write_report(report_path, report)
+            
+            package_size_helpers.print_report(function_name, report, previous_report, self.size_report_top_count)
+            
+            if report["UncompressedBytes"] > package_size_helpers.lambda_max_uncompressed_bytes:
+                click.echo("WARNING: {} is over Lambda's limit of {} unzipped.".format(
+                    function_name,
+                    package_size_helpers.format_bytes(package_size_helpers.lambda_max_uncompressed_bytes)
+                ), err = True)
+            
+            budget = dict(self.package_size_budget)
+            budget.update(self.function_size_budgets.get(function_name, {}))
+            
+            violation_list.extend(package_size_helpers.get_budget_violations(function_name, report, budget))
+        
+        if len(violation_list) > 0:
+            raise click.ClickException("Package size budget exceeded:\n{}".format("\n".join(violation_list)))
+    
+    def get_function_source_dirs(self):
+        function_source_dir_list = []
+        
         for root, dir_list, file_list in os.walk(self.input_directory):
             if root != self.input_directory:
                 break
             
             for each_dir in dir_list:
-                self.build_lambda_function_from_dir(os.path.join(root, each_dir))
+                function_source_dir_list.append(os.path.join(root, each_dir))
+        
+        return function_source_dir_list
+    
+    def get_local_module_hashes(self, source_dir, local_distribution_hashes):
+        return local_module_helpers.get_local_module_hashes_for_requirements(
+            os.path.join(source_dir, "requirements.txt"),
+            local_distribution_hashes
+        )
     
-    def build_lambda_function_from_dir(self, source_dir):
+    # {local module: [function name, ...]}
+    def get_local_module_dependents(self):
+        local_distribution_hashes = local_module_helpers.get_local_distribution_hashes(
+            self.local_python_packages_directory,
+            self.local_module_source_directories
+        )
+        
+        dependents_map = {}
+        
+        for each_dir in self.get_function_source_dirs():
+            function_name = os.path.split(each_dir)[1]
+            
+            for each_module in self.get_local_module_hashes(each_dir, local_distribution_hashes).keys():
+                dependents_map.setdefault(each_module, []).append(function_name)
+        
+        return dependents_map
+    
+    def print_dependency_graph(self):
+        
+        click.echo("Local module dependents for functions in {}:".format(self.input_directory))
+        
+        dependents_map = self.get_local_module_dependents()
+        
+        if len(dependents_map) == 0:
+            click.echo(" (none)")
+        
+        for each_module in sorted(dependents_map.keys()):
+            click.echo(" * {}".format(each_module))
+            
+            for each_function_name in sorted(dependents_map[each_module]):
+                click.echo("    - {}".format(each_function_name))
+    
+    def get_dependencies_hash(self, pip_requirements_path, lambda_runtime, dependency_install_mode, package_config_settings, local_module_hashes):
+        dependencies_inputs = {
+            "requirements": open(pip_requirements_path).read(),
+            "runtime": lambda_runtime,
+            # Named for when this was a flag, so earlier hashes stay valid.
+            "use_docker": dependency_install_mode,
+            "post_install_commands": package_config_settings.get("PostInstallCommands", []),
+            "local_modules": local_module_hashes or {}
+        }
+        
+        return hashlib.sha1(json.dumps(dependencies_inputs, sort_keys = True).encode("utf-8")).hexdigest()
+    
+    # Returns False (leaving deps_output_dir empty) if some requirement has no 
+    # wheel for Lambda's platform.
+    def install_manylinux_wheels(self, function_name, pip_requirements_path, deps_output_dir, lambda_runtime, package_config_settings):
+        if len(package_config_settings.get("PostInstallCommands", [])) > 0:
+            click.echo("{} has \"PostInstallCommands\", which only run in Docker.".format(function_name))
+            return False
+        
+        python_version, python_abi = lambda_runtime_wheel_tags[lambda_runtime]
+        
+        click.echo("Installing dependencies for {} from manylinux wheels.".format(function_name))
+        
+        pip_args = [
+            sys.executable,
+            "-m",
+            "pip",
+            "install",
+            "--only-binary=:all:",
+            "--python-version",
+            python_version,
+            "--implementation",
+            "cp",
+            "--abi",
+            python_abi
+        ]
+        
+        for each_platform_tag in self.manylinux_platform_tags:
+            pip_args.extend(["--platform", each_platform_tag])
+        
+        if self.local_python_packages_directory is not None:
+            pip_args.extend([
+                "--find-links",
+                os.path.abspath(self.local_python_packages_directory)
+            ])
+        
+        if self.pip_cache_directory is not None:
+            # The same layout as the Docker build's /root/.cache.
+            pip_args.extend([
+                "--cache-dir",
+                os.path.join(os.path.abspath(self.pip_cache_directory), "pip")
+            ])
+        
+        pip_args.extend([
+            "-r",
+            os.path.abspath(pip_requirements_path),
+            "-t",
+            deps_output_dir
+        ])
+        
+        p = subprocess.run(
+            pip_args,
+            stdout = subprocess.PIPE,
+            stderr = subprocess.PIPE
+        )
+        
+        if p.returncode == 0:
+            return True
+        
+        pip_output = p.stderr.decode("utf-8", "replace")
+        
+        if "No matching distribution found" not in pip_output:
+            click.echo(pip_output, err = True)
+            shutil.rmtree(deps_output_dir)
+            raise click.ClickException("Unable to install dependencies for {}.".format(function_name))
+        
+        click.echo("No Lambda-compatible wheel for some of {}'s requirements.".format(function_name))
+        
+        # Don't leave a partial install behind for the fallback.
+        shutil.rmtree(deps_output_dir)
+        os.makedirs(deps_output_dir)
+        
+        return False
+    
+    def build_lambda_function_from_dir(self, source_dir, local_module_hashes = None):
         use_docker = hasattr(self, "use_docker") and self.use_docker
+        use_manylinux_wheels = hasattr(self, "use_manylinux_wheels") and self.use_manylinux_wheels
+        
+        # Packages built each way can differ, so they're cached separately.
+        dependency_install_mode = "manylinux" if use_manylinux_wheels else use_docker
         
         build_cache_key = "{}-{}".format(
             self.build_cache_key_prefix,
-            use_docker
+            dependency_install_mode
         )
         
-        if not build_cache_helpers.has_build_hash_changed_for_path(build_cache_key, source_dir):
+        if not build_cache_helpers.has_build_hash_changed_for_path(build_cache_key, source_dir, local_module_hashes):
             click.echo("Skipping Lambda function: {}. No change since last build.".format(
                 source_dir
             ))
@@ -64,15 +285,68 @@ class BuildPythonLambdaFunctionsBuildStepAction(object):
         if lambda_runtime not in ["python2.7", "python3.6"]:
             raise click.ClickException("Unsupported Lambda function runtime: {}".format(lambda_runtime))
         
+        function_name = os.path.split(source_dir)[1]
+        
+        build_zip_path = os.path.join(self.output_directory, "{}.zip".format(function_name))
+        
+        function_remote_cache_key = remote_cache_helpers.get_remote_cache_key(
+            build_cache_key,
+            build_cache_helpers.get_hash_of_path(source_dir, local_module_hashes),
+            "{}.zip".format(function_name)
+        )
+        
+        if remote_cache_helpers.fetch_file(function_remote_cache_key, build_zip_path):
+            click.echo("Fetched Lambda function package for {} from remote build cache.".format(function_name))
+            
+            artifacts_manifest_helpers.record_artifact(
+                build_zip_path,
+                source_hash = hashing_helpers.directory_sha1_hash(source_dir),
+                runtime = lambda_runtime
+            )
+            
+            build_cache_helpers.write_build_hash_for_path(build_cache_key, source_dir, local_module_hashes)
+            return
+        
         pip_requirements_path = os.path.join(source_dir, "requirements.txt")
         
-        function_build_dir = os.path.join("/tmp", str(uuid.uuid4()))
         deps_output_dir = os.path.join("/tmp", str(uuid.uuid4()))
         
-        for each_dir in [function_build_dir, deps_output_dir]:
-            os.makedirs(each_dir)
+        os.makedirs(deps_output_dir)
+        
+        dependencies_remote_cache_key = None
         
         if os.path.exists(pip_requirements_path):
+            dependencies_remote_cache_key = remote_cache_helpers.get_remote_cache_key(
+                "dependencies",
+                self.get_dependencies_hash(pip_requirements_path, lambda_runtime, dependency_install_mode, package_config_settings, local_module_hashes),
+                "dependencies.zip"
+            )
+            
+            if remote_cache_helpers.fetch_directory(dependencies_remote_cache_key, deps_output_dir):
+                click.echo("Fetched dependencies for {} from remote build cache.".format(function_name))
+                dependencies_remote_cache_key = None
+        
+        installed_from_wheels = False
+        
+        if dependencies_remote_cache_key is not None and use_manylinux_wheels:
+            installed_from_wheels = self.install_manylinux_wheels(
+                function_name,
+                pip_requirements_path,
+                deps_output_dir,
+                lambda_runtime,
+                package_config_settings
+            )
+            
+            if not installed_from_wheels:
+                if not use_docker:
+                    shutil.rmtree(deps_output_dir)
+                    raise click.ClickException("Unable to install dependencies for {} from manylinux wheels, and Docker is disabled.".format(function_name))
+                
+                click.echo("Falling back to Docker for {}'s dependencies.".format(function_name))
+                
+                docker_helpers.prepare_packager_docker_image()
+        
+        if dependencies_remote_cache_key is not None and not installed_from_wheels:
         
             pip_binary = "pip3.6"
             venv_path = "/venv3"
@@ -120,8 +394,7 @@ class BuildPythonLambdaFunctionsBuildStepAction(object):
                         check = True
                     )
                 except:
-                    for each_dir in [function_build_dir, deps_output_dir]:
-                        shutil.rmtree(each_dir)
+                    shutil.rmtree(deps_output_dir)
                     raise
             
             else:
@@ -150,61 +423,43 @@ class BuildPythonLambdaFunctionsBuildStepAction(object):
                         check = True
                     )
                 except:
-                    for each_dir in [function_build_dir, deps_output_dir]:
-                        shutil.rmtree(each_dir)
+                    shutil.rmtree(deps_output_dir)
                     raise
-            
-            
-            
-            for each_item in os.listdir(deps_output_dir):
-                if each_item in exclude_files:
-                    continue
-                
-                shutil.move(
-                    os.path.join(deps_output_dir, each_item),
-                    function_build_dir
-                )
         
-        
-            
-        for each_item in os.listdir(source_dir):
-            if each_item == "package.yaml":
-                continue
-            if each_item in exclude_files:
-                continue
-            
-            shutil.copy(
-                os.path.join(source_dir, each_item),
-                function_build_dir
-            )
-        
-        function_name = os.path.split(source_dir)[1]
+        if dependencies_remote_cache_key is not None:
+            remote_cache_helpers.push_directory(dependencies_remote_cache_key, deps_output_dir)
         
         click.echo("Function: {}".format(function_name))
         
-        build_zip_path_without_extension = os.path.join(self.output_directory, function_name)
-        build_zip_path = "{}.zip".format(build_zip_path_without_extension)
-        if os.path.exists(build_zip_path):
-            os.unlink(build_zip_path)
-            
         click.echo("Creating Lambda function package at {}.".format(build_zip_path))
-        shutil.make_archive(build_zip_path_without_extension, "zip", function_build_dir)
         
-        for each_dir in [function_build_dir, deps_output_dir]:
-            shutil.rmtree(each_dir)
-        
-        source_dir_hash = hashing_helpers.directory_sha1_hash(source_dir)
-        new_zip_hash = hashing_helpers.file_sha256_checksum_base64(build_zip_path)
+        # Files are read straight from the installed dependencies and the 
+        # function's source, with the source taking precedence.
+        try:
+            tree_entries_list = [
+                zip_helpers.get_tree_entries(deps_output_dir, [], exclude_files),
+                zip_helpers.get_tree_entries(source_dir, exclude_files, ["package.yaml"])
+            ]
+            
+            zip_helpers.write_zip_from_trees(
+                build_zip_path,
+                tree_entries_list,
+                compress_level = self.compression_level,
+                max_workers = self.compression_workers,
+                store_only_extensions = self.store_only_extensions
+            )
+        finally:
+            shutil.rmtree(deps_output_dir)
         
-        new_build_metadata = {
-            "source": source_dir_hash,
-            "zip": new_zip_hash,
-            "runtime": lambda_runtime
-        }
+        artifacts_manifest_helpers.record_artifact(
+            build_zip_path,
+            source_hash = hashing_helpers.directory_sha1_hash(source_dir),
+            runtime = lambda_runtime
+        )
         
-        build_cache_helpers.write_build_hash_for_path(build_cache_key, source_dir)
+        remote_cache_helpers.push_file(function_remote_cache_key, build_zip_path)
         
-        #click.echo("Metadata: {}".format(json.dumps(new_build_metadata)))
+        build_cache_helpers.write_build_hash_for_path(build_cache_key, source_dir, local_module_hashes)
             
         
             
@@ -12,6 +12,13 @@ sys.path.append(os.path.dirname(os.path.realpath(__file__)))
 import docker_helpers
 import hashing_helpers
 import build_cache_helpers
+import remote_cache_helpers
+import artifacts_manifest_helpers
+import compression_helpers
+import deploy_journal_helpers
+import stack_fingerprint_helpers
+import concurrency_helpers
+import local_cache_helpers
 
 from run_command import RunCommandBuildStepAction
 from preprocess_swagger_input import PreprocessSwaggerInputBuildStepAction
@@ -22,6 +29,11 @@ from create_bucket_if_not_exists import CreateBucketIfNotExistsDeployStepAction
 from upload_directory_contents_to_bucket import UploadDirectoryContentsToBucketDeployStepAction
 from create_or_update_cloudformation_stack import CreateOrUpdateCloudFormationStackDeployStepAction
 from update_lambda_function_sources import UpdateLambdaFunctionSourcesDeployStepAction
+from pipelined_deploy import PipelinedDeployer
+from multi_region_deploy import MultiRegionDeployer
+from parallel_stack_deploy import ParallelStackDeployer, get_deploy_step_batches
+from artifact_garbage_collector import ArtifactGarbageCollector
+from import_profiler import ImportTimeProfiler
 
 boafile_name = "boafile.yaml"
 
@@ -57,24 +69,73 @@ def cli(ctx, verbose, region, profile, use_docker):
 
 @click.command(name="build-and-deploy")
 @click.option('--use-docker/--no-use-docker', default=True)
+@click.option('--pipelined', is_flag=True, default=False, help='Upload packages and update functions as each one is built.')
+@click.option('--regions', help='Comma-separated AWS regions to deploy to in parallel.')
+@click.option('--resume', is_flag=True, default=False, help='Trust the deploy journal of an interrupted deploy.')
+@click.option('--force-stack-check', is_flag=True, default=False, help='Check every CloudFormation stack even if unchanged since its last deploy.')
+@click.option('--use-manylinux-wheels', is_flag=True, default=False, help='Install Lambda dependencies from manylinux wheels, falling back to Docker.')
 @click.pass_context
-def build_and_deploy(ctx, use_docker):
+def build_and_deploy(ctx, use_docker, pipelined, regions, resume, force_stack_check, use_manylinux_wheels):
     
-    ctx.forward(build)
-    ctx.forward(deploy)
+    if pipelined and regions is not None:
+        raise click.ClickException("--pipelined can't be combined with --regions.")
+    
+    if not pipelined:
+        ctx.invoke(build, use_docker = use_docker, use_manylinux_wheels = use_manylinux_wheels)
+        ctx.invoke(deploy, use_docker = use_docker, regions = regions, resume = resume, force_stack_check = force_stack_check)
+        return
+    
+    if not os.path.exists(boafile_name):
+        raise click.ClickException("No {} file found in current directory.".format(boafile_name))
+    
+    boafile_config = yaml.load(open(boafile_name).read())
+    
+    artifacts_manifest_helpers.configure_artifacts_manifest(boafile_config)
+    compression_helpers.configure_compressed_cache(boafile_config)
+    deploy_journal_helpers.configure_deploy_journal(boafile_config)
+    deploy_journal_helpers.start_run(resume)
+    concurrency_helpers.configure_concurrency(boafile_config)
+    
+    pipelined_deployer = PipelinedDeployer(boafile_config)
+    pipelined_deployer.start()
+    
+    try:
+        ctx.invoke(build, use_docker = use_docker, use_manylinux_wheels = use_manylinux_wheels)
+    except:
+        pipelined_deployer.finish(raise_errors = False)
+        raise
+    
+    pipelined_deployer.finish()
+    
+    # The full deploy still runs in order; whatever the pipeline already 
+    # shipped is in the journal and skipped.
+    ctx.invoke(deploy, use_docker = use_docker, resume = True, force_stack_check = force_stack_check, skip_step_indices = pipelined_deployer.completed_step_indices)
     
 cli.add_command(build_and_deploy)
 
 @click.command()
 @click.option('--use-docker/--no-use-docker', default=True)
+@click.option('--print-dependency-graph', is_flag=True, default=False, help='Print which functions depend on each local pip module, then exit.')
+@click.option('--profile-imports', is_flag=True, default=False, help='Profile each function\'s import time after building.')
+@click.option('--python', 'python_binary', help='Interpreter for --profile-imports. Defaults to each function\'s runtime, in the packager image with Docker.')
+@click.option('--budget-ms', type=float, help='With --profile-imports, fail if any function takes longer than this to import.')
+@click.option('--use-manylinux-wheels', is_flag=True, default=False, help='Install Lambda dependencies from manylinux wheels, falling back to Docker.')
 @click.pass_context
-def build(ctx, use_docker):
+def build(ctx, use_docker, print_dependency_graph, profile_imports, python_binary, budget_ms, use_manylinux_wheels):
+    if not profile_imports and (python_binary is not None or budget_ms is not None):
+        raise click.ClickException("--python and --budget-ms only apply with --profile-imports.")
+    
     if not os.path.exists(boafile_name):
         raise click.ClickException("No {} file found in current directory.".format(boafile_name))
     
-    if use_docker:
-        docker_helpers.verify_docker_reachable()
-        docker_helpers.build_packager_docker_image()
+    if print_dependency_graph:
+        print_build_dependency_graph(yaml.load(open(boafile_name).read()))
+        return
+    
+    # With manylinux wheels, Docker is only needed (and the image only 
+    # built) if some requirement has no compatible wheel.
+    if use_docker and not use_manylinux_wheels:
+        docker_helpers.prepare_packager_docker_image()
     
     boafile_config = yaml.load(open(boafile_name).read())
     
@@ -84,6 +145,13 @@ def build(ctx, use_docker):
         os.makedirs(build_cache_hashes_dir, exist_ok = True)
         build_cache_helpers.build_cache_hashes_directory = build_cache_hashes_dir
     
+    artifacts_manifest_helpers.configure_artifacts_manifest(boafile_config)
+    
+    remote_build_cache_config = boafile_config.get("RemoteBuildCache")
+    
+    if remote_build_cache_config is not None:
+        remote_cache_helpers.configure_remote_cache(remote_build_cache_config)
+    
     
     
     build_step_groups = boafile_config.get("BuildStepGroups", [])
@@ -91,12 +159,45 @@ def build(ctx, use_docker):
     if len(build_step_groups) == 0:
         raise click.ClickException("No \"BuildStepGroups\" specified in {}.".format(boafile_name))
     
-    for each_group_dict in build_step_groups:
-        run_build_step_group(boafile_config, each_group_dict, use_docker)
+    # Caches over their "CacheLimits" are trimmed while the build runs.
+    local_cache_helpers.configure_cache_limits(boafile_config)
+    local_cache_helpers.start_background_eviction(boafile_config)
+    
+    try:
+        for each_group_dict in build_step_groups:
+            run_build_step_group(boafile_config, each_group_dict, use_docker, use_manylinux_wheels)
+    finally:
+        artifacts_manifest_helpers.flush_manifest()
+        local_cache_helpers.finish()
+    
+    if profile_imports:
+        ImportTimeProfiler(boafile_config, python_binary, budget_ms = budget_ms, use_docker = use_docker).run()
 
 cli.add_command(build)
 
-def run_build_step_group(full_config, group_config, use_docker):
+@click.command(name="profile-imports")
+@click.option('--use-docker/--no-use-docker', default=True)
+@click.option('--python', 'python_binary', help='Interpreter to import with. Defaults to each function\'s runtime, in the packager image with Docker.')
+@click.option('--top', 'top_count', type=int, default=10, help='Number of slowest imports to list per function.')
+@click.option('--budget-ms', type=float, help='Fail if any function takes longer than this to import.')
+@click.pass_context
+def profile_imports(ctx, use_docker, python_binary, top_count, budget_ms):
+    if not os.path.exists(boafile_name):
+        raise click.ClickException("No {} file found in current directory.".format(boafile_name))
+    
+    boafile_config = yaml.load(open(boafile_name).read())
+    
+    ImportTimeProfiler(boafile_config, python_binary, top_count, budget_ms, use_docker).run()
+
+cli.add_command(profile_imports)
+
+def print_build_dependency_graph(full_config):
+    for each_group_dict in full_config.get("BuildStepGroups", []):
+        for each_step in each_group_dict.get("Steps", []):
+            if each_step.get("Action", "") == "BuildPythonLambdaFunctions":
+                BuildPythonLambdaFunctionsBuildStepAction(full_config, each_step).print_dependency_graph()
+
+def run_build_step_group(full_config, group_config, use_docker, use_manylinux_wheels = False):
     
     each_group_name = group_config.get("Name", "<Untitled group>")
     
@@ -113,7 +214,7 @@ def run_build_step_group(full_config, group_config, use_docker):
     
     step_list = group_config.get("Steps", [])
     for each_step in step_list:
-        run_build_step(full_config, each_step, use_docker)
+        run_build_step(full_config, each_step, use_docker, use_manylinux_wheels)
     
     if build_only_if_changes_in_path is not None:
         build_cache_helpers.write_build_hash_for_path(
@@ -121,7 +222,7 @@ def run_build_step_group(full_config, group_config, use_docker):
             build_only_if_changes_in_path
         )
 
-def run_build_step(full_config, step_config, use_docker):
+def run_build_step(full_config, step_config, use_docker, use_manylinux_wheels = False):
     step_action = step_config.get("Action", "")
     
     action_handler_class = None
@@ -140,36 +241,132 @@ def run_build_step(full_config, step_config, use_docker):
     if action_handler_class is not None:
         new_action_handler = action_handler_class(full_config, step_config)
         new_action_handler.use_docker = use_docker
+        new_action_handler.use_manylinux_wheels = use_manylinux_wheels
         new_action_handler.run()
 
 @click.command()
 @click.option('--use-docker/--no-use-docker', default=True)
+@click.option('--regions', help='Comma-separated AWS regions to deploy to in parallel.')
+@click.option('--resume', is_flag=True, default=False, help='Trust the deploy journal of an interrupted deploy.')
+@click.option('--force-stack-check', is_flag=True, default=False, help='Check every CloudFormation stack even if unchanged since its last deploy.')
 @click.pass_context
-def deploy(ctx, use_docker):
+def deploy(ctx, use_docker, regions, resume, force_stack_check, skip_step_indices = None):
     
     if not os.path.exists(boafile_name):
         raise click.ClickException("No {} file found in current directory.".format(boafile_name))
     
     boafile_config = yaml.load(open(boafile_name).read())
     
+    artifacts_manifest_helpers.configure_artifacts_manifest(boafile_config)
+    compression_helpers.configure_compressed_cache(boafile_config)
+    deploy_journal_helpers.configure_deploy_journal(boafile_config)
+    stack_fingerprint_helpers.configure_stack_fingerprints(boafile_config, force_stack_check)
+    
+    if skip_step_indices is None:
+        # A pipelined deploy's limiters already know how the services are 
+        # doing, so only reset them for a fresh deploy.
+        concurrency_helpers.configure_concurrency(boafile_config)
+    
     deploy_step_groups = boafile_config.get("DeployStepGroups", [])
     
     if len(deploy_step_groups) == 0:
         raise click.ClickException("No \"DeployStepGroups\" specified in {}.".format(boafile_name))
     
-    for each_group_dict in deploy_step_groups:
-        run_deploy_step_group(boafile_config, each_group_dict)
+    if regions is not None:
+        region_list = [x.strip() for x in regions.split(",") if x.strip() != ""]
+        
+        if len(region_list) == 0:
+            raise click.ClickException("No regions given to --regions.")
+    
+    # Each completed upload and update is journaled, so a deploy that dies 
+    # partway can be rerun with --resume without checking everything again.
+    deploy_journal_helpers.start_run(resume)
+    
+    try:
+        if regions is not None:
+            MultiRegionDeployer(boafile_config, region_list).run()
+        else:
+            # Steps are numbered in order across all groups.
+            step_index = 0
+            
+            for each_group_dict in deploy_step_groups:
+                run_deploy_step_group(boafile_config, each_group_dict, step_index, skip_step_indices or set())
+                step_index += len(each_group_dict.get("Steps", []))
+    finally:
+        concurrency_helpers.print_summary()
+        local_cache_helpers.finish()
+    
+    deploy_journal_helpers.finish_run()
 
 cli.add_command(deploy)
 
-def run_deploy_step_group(full_config, group_config):
+@click.command()
+@click.option('--retention-days', type=int, help='Keep unreferenced artifacts younger than this. Defaults to "ArtifactRetentionDays" or 7.')
+@click.option('--dry-run', is_flag=True, default=False, help='List what would be deleted without deleting it.')
+@click.pass_context
+def gc(ctx, retention_days, dry_run):
+    
+    if not os.path.exists(boafile_name):
+        raise click.ClickException("No {} file found in current directory.".format(boafile_name))
+    
+    boafile_config = yaml.load(open(boafile_name).read())
+    
+    artifacts_manifest_helpers.configure_artifacts_manifest(boafile_config)
+    
+    ArtifactGarbageCollector(boafile_config, retention_days, dry_run).run()
+
+cli.add_command(gc)
+
+@click.group(help='Inspect and trim the local build caches.')
+def cache():
+    pass
+
+@click.command(name="stats")
+@click.pass_context
+def cache_stats(ctx):
+    
+    if not os.path.exists(boafile_name):
+        raise click.ClickException("No {} file found in current directory.".format(boafile_name))
+    
+    boafile_config = yaml.load(open(boafile_name).read())
+    
+    local_cache_helpers.configure_cache_limits(boafile_config)
+    local_cache_helpers.print_cache_stats(boafile_config)
+
+cache.add_command(cache_stats)
+
+@click.command(name="prune")
+@click.pass_context
+def cache_prune(ctx):
+    
+    if not os.path.exists(boafile_name):
+        raise click.ClickException("No {} file found in current directory.".format(boafile_name))
+    
+    boafile_config = yaml.load(open(boafile_name).read())
+    
+    local_cache_helpers.configure_cache_limits(boafile_config)
+    local_cache_helpers.evict_caches(boafile_config, blocking = True)
+
+cache.add_command(cache_prune)
+
+cli.add_command(cache)
+
+def run_deploy_step_group(full_config, group_config, first_step_index = 0, skip_step_indices = set()):
     each_group_name = group_config.get("Name", "<Untitled group>")
     
     click.echo("Starting group: {}".format(each_group_name))
     
-    step_list = group_config.get("Steps", [])
-    for each_step in step_list:
-        run_deploy_step(full_config, each_step)
+    step_list = [
+        x for i, x in enumerate(group_config.get("Steps", [])) if first_step_index + i not in skip_step_indices
+    ]
+    
+    # Consecutive stacks are deployed concurrently, in the order their 
+    # exports and imports require.
+    for each_batch in get_deploy_step_batches(step_list):
+        if len(each_batch) > 1:
+            ParallelStackDeployer(full_config, each_batch).run()
+        else:
+            run_deploy_step(full_config, each_batch[0])
 
 def run_deploy_step(full_config, step_config):
     step_action = step_config.get("Action", "")
@@ -0,0 +1,149 @@
+import re
+import yaml
+
+# Turns short-form intrinsic functions (e.g. "!ImportValue") into long form.
+class CloudFormationTemplateLoader(yaml.SafeLoader):
+    
+    pass
+
+def construct_intrinsic_function(loader, tag_suffix, node):
+    if isinstance(node, yaml.ScalarNode):
+        value = loader.construct_scalar(node)
+    elif isinstance(node, yaml.SequenceNode):
+        value = loader.construct_sequence(node, deep = True)
+    else:
+        value = loader.construct_mapping(node, deep = True)
+    
+    if tag_suffix in ["Ref", "Condition"]:
+        return {tag_suffix: value}
+    
+    if tag_suffix == "GetAtt" and isinstance(value, str):
+        value = value.split(".", 1)
+    
+    return {"Fn::{}".format(tag_suffix): value}
+
+CloudFormationTemplateLoader.add_multi_constructor("!", construct_intrinsic_function)
+
+def load_template(template_path):
+    with open(template_path) as f:
+        return yaml.load(f, Loader = CloudFormationTemplateLoader)
+
+def get_parameter_defaults(cf_template):
+    parameter_defaults = {}
+    
+    for each_key, each_parameter_dict in (cf_template.get("Parameters") or {}).items():
+        if isinstance(each_parameter_dict, dict) and "Default" in each_parameter_dict:
+            parameter_defaults[each_key] = str(each_parameter_dict["Default"])
+    
+    return parameter_defaults
+
+# Returns None if the expression can't be resolved from variables alone.
+def resolve_string(value, variables):
+    if isinstance(value, str):
+        return value
+    
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return str(value)
+    
+    if not isinstance(value, dict) or len(value) != 1:
+        return None
+    
+    function_name, function_args = list(value.items())[0]
+    
+    if function_name == "Ref":
+        return variables.get(function_args)
+    
+    if function_name == "Fn::Join":
+        if not isinstance(function_args, list) or len(function_args) != 2 or not isinstance(function_args[1], list):
+            return None
+        
+        resolved_list = [resolve_string(x, variables) for x in function_args[1]]
+        
+        if None in resolved_list or not isinstance(function_args[0], str):
+            return None
+        
+        return function_args[0].join(resolved_list)
+    
+    if function_name == "Fn::Sub":
+        sub_variables = dict(variables)
+        
+        if isinstance(function_args, list):
+            if len(function_args) != 2 or not isinstance(function_args[1], dict):
+                return None
+            
+            for each_key, each_value in function_args[1].items():
+                sub_variables[each_key] = resolve_string(each_value, variables)
+            
+            function_args = function_args[0]
+        
+        if not isinstance(function_args, str):
+            return None
+        
+        unresolved_names = []
+        
+        def substitute(match):
+            variable_name = match.group(1)
+            
+            if variable_name.startswith("!"):
+                return "${" + variable_name[1:] + "}"
+            
+            variable_value = sub_variables.get(variable_name)
+            
+            if variable_value is None:
+                unresolved_names.append(variable_name)
+                return ""
+            
+            return variable_value
+        
+        resolved_value = re.sub(r"\$\{([^}]*)\}", substitute, function_args)
+        
+        if len(unresolved_names) > 0:
+            return None
+        
+        return resolved_value
+    
+    return None
+
+# Returns (names, whether any couldn't be resolved).
+def get_export_names(cf_template, variables):
+    export_names = set()
+    has_unresolved_exports = False
+    
+    for each_output_dict in (cf_template.get("Outputs") or {}).values():
+        if not isinstance(each_output_dict, dict) or "Export" not in each_output_dict:
+            continue
+        
+        export_name = resolve_string((each_output_dict["Export"] or {}).get("Name"), variables)
+        
+        if export_name is None:
+            has_unresolved_exports = True
+        else:
+            export_names.add(export_name)
+    
+    return export_names, has_unresolved_exports
+
+# Returns (names, whether any couldn't be resolved).
+def get_import_names(cf_template, variables):
+    import_names = set()
+    unresolved_imports = []
+    
+    def visit(value):
+        if isinstance(value, dict):
+            for each_key, each_value in value.items():
+                if each_key == "Fn::ImportValue":
+                    import_name = resolve_string(each_value, variables)
+                    
+                    if import_name is None:
+                        unresolved_imports.append(each_value)
+                    else:
+                        import_names.add(import_name)
+                else:
+                    visit(each_value)
+        
+        elif isinstance(value, list):
+            for each_value in value:
+                visit(each_value)
+    
+    visit(cf_template)
+    
+    return import_names, len(unresolved_imports) > 0
@@ -0,0 +1,71 @@
+import os
+import io
+import gzip
+import base64
+import binascii
+import click
+import file_helpers
+import local_cache_helpers
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+default_compressed_cache_directory = ".boa-nimbus-compressed"
+
+supported_content_encodings = ["gzip", "br"]
+
+compressed_cache_directory = default_compressed_cache_directory
+
+def configure_compressed_cache(full_config):
+    global compressed_cache_directory
+    
+    compressed_cache_directory = full_config.get("CompressedCacheDirectory", default_compressed_cache_directory)
+
+def validate_content_encoding(content_encoding):
+    if content_encoding not in supported_content_encodings:
+        raise click.ClickException("Unsupported \"ContentEncoding\": {}. Supported: {}".format(
+            content_encoding,
+            ", ".join(supported_content_encodings)
+        ))
+    
+    if content_encoding == "br" and brotli is None:
+        raise click.ClickException("The \"brotli\" package is required for \"ContentEncoding: br\". Install it with: pip install brotli")
+
+def compress_bytes(content, content_encoding):
+    if content_encoding == "br":
+        return brotli.compress(content)
+    
+    # No file name or timestamp in the header, so the same input always 
+    # compresses to the same bytes (and the same ETag).
+    compressed_buffer = io.BytesIO()
+    
+    with gzip.GzipFile(filename = "", mode = "wb", fileobj = compressed_buffer, compresslevel = 9, mtime = 0) as f:
+        f.write(content)
+    
+    return compressed_buffer.getvalue()
+
+# Cached on disk by the source's SHA-256, so each version is compressed once.
+def get_compressed_content(file_path, file_sha256_base64, content_encoding):
+    validate_content_encoding(content_encoding)
+    
+    cached_file_path = os.path.join(compressed_cache_directory, "{}.{}".format(
+        binascii.hexlify(base64.b64decode(file_sha256_base64)).decode("utf-8"),
+        content_encoding
+    ))
+    
+    try:
+        with open(cached_file_path, "rb") as f:
+            compressed_content = f.read()
+        
+        local_cache_helpers.record_access(compressed_cache_directory, cached_file_path)
+        return compressed_content
+    except IOError:
+        local_cache_helpers.record_access(compressed_cache_directory, hit = False)
+    
+    compressed_content = compress_bytes(open(file_path, "rb").read(), content_encoding)
+    
+    file_helpers.write_file_if_changed(cached_file_path, compressed_content)
+    
+    return compressed_content
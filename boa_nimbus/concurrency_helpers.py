@@ -0,0 +1,226 @@
+import time
+import random
+import threading
+import click
+from botocore.exceptions import ClientError
+
+# Error codes AWS services use to say "slow down".
+throttling_error_codes = set([
+    "SlowDown",
+    "Throttling",
+    "ThrottlingException",
+    "ThrottledException",
+    "TooManyRequestsException",
+    "RequestLimitExceeded",
+    "RequestThrottled",
+    "ProvisionedThroughputExceededException"
+])
+
+default_limit_settings = {
+    "Initial": 8,
+    "Min": 1,
+    "Max": 64
+}
+
+limit_settings = {}
+
+limiters = {}
+limiters_lock = threading.Lock()
+
+# Lets a slot know botocore's retry handler already counted its throttling.
+call_state = threading.local()
+
+# "ConcurrencyLimits" can set Initial, Min and Max per service, e.g. {"s3": 
+# {"Max": 128}}.
+def configure_concurrency(full_config):
+    global limit_settings
+    
+    limit_settings = full_config.get("ConcurrencyLimits", {})
+    
+    with limiters_lock:
+        limiters.clear()
+
+def is_throttling_error(e):
+    return isinstance(e, ClientError) and e.response.get("Error", {}).get("Code") in throttling_error_codes
+
+# Normal answers from a healthy service (e.g. a 404 from HeadObject).
+def is_client_side_error(e):
+    if not isinstance(e, ClientError):
+        return False
+    
+    return e.response.get("ResponseMetadata", {}).get("HTTPStatusCode", 400) < 500
+
+# AIMD: the limit creeps up by about one per round of calls while calls 
+# succeed, and halves when the service throttles.
+class AdaptiveConcurrencyLimiter(object):
+    
+    def __init__(self, name, initial_limit = 8, min_limit = 1, max_limit = 64, max_throttled_attempts = 6):
+        self.name = name
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.max_throttled_attempts = max_throttled_attempts
+        
+        self.limit = float(max(min_limit, min(initial_limit, max_limit)))
+        self.peak_limit = self.limit
+        
+        self.in_flight = 0
+        self.condition = threading.Condition()
+        
+        self.average_latency = None
+        self.average_error_rate = 0.0
+        self.last_decrease_time = 0
+        
+        self.call_count = 0
+        self.throttle_count = 0
+        self.error_count = 0
+    
+    def acquire(self):
+        with self.condition:
+            while self.in_flight >= int(self.limit):
+                self.condition.wait()
+            
+            self.in_flight += 1
+    
+    def release(self):
+        with self.condition:
+            self.in_flight -= 1
+            self.condition.notify_all()
+    
+    def record_success(self, latency):
+        with self.condition:
+            self.call_count += 1
+            self.average_error_rate *= 0.9
+            
+            # Only grow while calls take no longer than usual, i.e. the 
+            # extra concurrency isn't just queueing up at the service.
+            is_healthy = self.average_latency is None or latency <= 2 * self.average_latency
+            
+            if self.average_latency is None:
+                self.average_latency = latency
+            else:
+                self.average_latency = 0.9 * self.average_latency + 0.1 * latency
+            
+            if is_healthy and self.average_error_rate < 0.1:
+                self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+                self.peak_limit = max(self.peak_limit, self.limit)
+                self.condition.notify_all()
+    
+    def record_error(self):
+        with self.condition:
+            self.call_count += 1
+            self.error_count += 1
+            self.average_error_rate = 0.9 * self.average_error_rate + 0.1
+    
+    def record_throttle(self):
+        with self.condition:
+            self.throttle_count += 1
+            
+            # Calls throttled together are one signal, not several, so back 
+            # off at most once per typical call duration.
+            now = time.time()
+            
+            if now - self.last_decrease_time < (self.average_latency or 0.1):
+                return
+            
+            self.last_decrease_time = now
+            self.limit = max(self.min_limit, self.limit / 2)
+    
+    def slot(self):
+        return LimiterSlot(self)
+    
+    # Retries with jittered backoff while the service is throttling.
+    def call(self, fn, *args, **kwargs):
+        attempt = 0
+        
+        while True:
+            attempt += 1
+            
+            try:
+                with self.slot():
+                    return fn(*args, **kwargs)
+            except ClientError as e:
+                if not is_throttling_error(e) or attempt >= self.max_throttled_attempts:
+                    raise
+            
+            time.sleep(random.uniform(0, min(20, 0.1 * (2 ** attempt))))
+    
+    def get_summary(self):
+        with self.condition:
+            return "{}: concurrency {} (peak {}), {} call(s), {} throttled, {} failed".format(
+                self.name,
+                int(self.limit),
+                int(self.peak_limit),
+                self.call_count,
+                self.throttle_count,
+                self.error_count
+            )
+
+class LimiterSlot(object):
+    
+    def __init__(self, limiter):
+        self.limiter = limiter
+    
+    def __enter__(self):
+        self.limiter.acquire()
+        self.start_time = time.time()
+        call_state.throttle_recorded = False
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.limiter.release()
+        
+        if exc_type is None:
+            self.limiter.record_success(time.time() - self.start_time)
+        elif is_throttling_error(exc_value):
+            if not getattr(call_state, "throttle_recorded", False):
+                self.limiter.record_throttle()
+        elif is_client_side_error(exc_value):
+            self.limiter.record_success(time.time() - self.start_time)
+        elif exc_type is not StopIteration:
+            self.limiter.record_error()
+        
+        return False
+
+def get_limiter(service_name):
+    with limiters_lock:
+        if service_name not in limiters:
+            service_settings = dict(default_limit_settings)
+            service_settings.update(limit_settings.get(service_name, {}))
+            
+            limiters[service_name] = AdaptiveConcurrencyLimiter(
+                service_name,
+                initial_limit = service_settings["Initial"],
+                min_limit = service_settings["Min"],
+                max_limit = service_settings["Max"]
+            )
+        
+        return limiters[service_name]
+
+# botocore retries throttled requests on its own, so its needs-retry event is 
+# where throttling shows up first.
+def on_needs_retry(service_name):
+    def handler(response = None, **kwargs):
+        if response is None:
+            return None
+        
+        parsed_response = response[1]
+        
+        if parsed_response.get("Error", {}).get("Code") in throttling_error_codes:
+            get_limiter(service_name).record_throttle()
+            call_state.throttle_recorded = True
+        
+        return None
+    
+    return handler
+
+def print_summary():
+    with limiters_lock:
+        limiter_list = [limiters[x] for x in sorted(limiters.keys())]
+    
+    if len(limiter_list) == 0:
+        return
+    
+    click.echo("AWS request concurrency:")
+    
+    for each_limiter in limiter_list:
+        click.echo(" * {}".format(each_limiter.get_summary()))
@@ -1,28 +1,29 @@
 import os
 import subprocess
 import click
-import boto3
 from botocore.exceptions import ClientError
+import aws_helpers
 
 class CreateBucketIfNotExistsDeployStepAction(object):
     
     def __init__(self, full_config, step_config):
         self.bucket_name_prefix = step_config.get("BucketNamePrefix", "")
+        self.region_name = None
     
     def run(self):
         
         click.echo("Checking / creating bucket with prefix: \"{}\".".format(self.bucket_name_prefix))
         
-        response = boto3.client("sts").get_caller_identity()
+        bucket_name = aws_helpers.get_bucket_name(self.bucket_name_prefix, self.region_name)
         
-        bucket_name = self.bucket_name_prefix + response["Account"]
+        s3_client = aws_helpers.get_client("s3", self.region_name)
         
         click.echo("Bucket name: {}".format(bucket_name))
         
         bucket_exists = False
         
         try:
-            response = boto3.client("s3").head_bucket(
+            response = s3_client.head_bucket(
                 Bucket = bucket_name
             )
             bucket_exists = True
@@ -35,6 +36,14 @@ class CreateBucketIfNotExistsDeployStepAction(object):
         if not bucket_exists:
             click.echo("Creating bucket.")
             
-            boto3.client("s3").create_bucket(
-                Bucket = bucket_name
-            )
\ No newline at end of file
+            create_bucket_kwargs = {
+                "Bucket": bucket_name
+            }
+            
+            # us-east-1 is the default and can't be given as a constraint.
+            if self.region_name is not None and self.region_name != "us-east-1":
+                create_bucket_kwargs["CreateBucketConfiguration"] = {
+                    "LocationConstraint": self.region_name
+                }
+            
+            s3_client.create_bucket(**create_bucket_kwargs)
\ No newline at end of file
@@ -1,12 +1,11 @@
 import os
 import time
 import click
-import boto3
 from botocore.exceptions import ClientError
 import hashing_helpers
-
-cf_client = boto3.client("cloudformation")
-s3_client = boto3.client("s3")
+import aws_helpers
+import artifact_keys_helpers
+import stack_fingerprint_helpers
 
 class CreateOrUpdateCloudFormationStackDeployStepAction(object):
     
@@ -16,14 +15,40 @@ class CreateOrUpdateCloudFormationStackDeployStepAction(object):
         self.template_path = step_config["TemplatePath"]
         self.stack_parameter_updates = step_config.get("StackParameterUpdates", {})
         self.stack_parameter_defaults = step_config.get("StackParameterDefaults", {})
+        self.artifact_key_parameters = step_config.get("ArtifactKeyParameters", {})
+        self.region_name = None
+        
+        # Called with (stack name, status) while waiting, instead of printing.
+        self.status_listener = None
     
     def run(self):
         
         click.echo("Creating / updating CloudFormation stack: {}".format(self.stack_name))
         
-        response = boto3.client("sts").get_caller_identity()
+        cf_client = aws_helpers.get_client("cloudformation", self.region_name)
+        s3_client = aws_helpers.get_client("s3", self.region_name)
+        
+        template_md5 = hashing_helpers.file_md5_checksum(os.path.abspath(self.template_path))
+        
+        parameter_update_values = self.get_parameter_update_values()
+        
+        # Everything sent to CloudFormation is known locally, so a stack last 
+        # deployed from the same inputs can be skipped once DescribeStacks 
+        # confirms it's still the same, settled stack.
+        stack_record_key = stack_fingerprint_helpers.get_stack_record_key(
+            aws_helpers.get_account_id(),
+            cf_client.meta.region_name,
+            self.stack_name
+        )
+        stack_fingerprint = stack_fingerprint_helpers.get_stack_fingerprint({
+            "TemplateMd5": template_md5,
+            "SourceBucketNamePrefix": self.bucket_name_prefix,
+            "BucketRegionName": self.region_name,
+            "StackParameterDefaults": self.stack_parameter_defaults,
+            "StackParameterUpdates": parameter_update_values
+        })
         
-        bucket_name = self.bucket_name_prefix + response["Account"]
+        bucket_name = aws_helpers.get_bucket_name(self.bucket_name_prefix, self.region_name)
         
         stack_exists = False
         try:
@@ -37,9 +62,16 @@ class CreateOrUpdateCloudFormationStackDeployStepAction(object):
             else:
                 raise
         
-        cf_template_key = "boa-nimbus/{}.cftemplate".format(
-            hashing_helpers.file_md5_checksum(os.path.abspath(self.template_path))
-        )
+        if stack_exists and stack_fingerprint_helpers.is_stack_unchanged(
+            stack_record_key,
+            stack_fingerprint,
+            response["Stacks"][0]["StackId"],
+            response["Stacks"][0]["StackStatus"]
+        ):
+            click.echo("Stack unchanged since its last deploy. Skipping. (Use --force-stack-check to check anyway.)")
+            return
+        
+        cf_template_key = "boa-nimbus/{}.cftemplate".format(template_md5)
         
         try:
             s3_client.head_object(
@@ -67,11 +99,7 @@ class CreateOrUpdateCloudFormationStackDeployStepAction(object):
             for each_key, each_value in self.stack_parameter_defaults.items():
                 required_params_map[each_key] = each_value
         
-        for each_key, each_value in self.stack_parameter_updates.items():
-            if each_key == "ApiDefinitionVersion":
-                # The value should be a hash of the given file.
-                param_value = hashing_helpers.file_md5_checksum(each_value)
-                required_params_map[each_key] = param_value
+        required_params_map.update(parameter_update_values)
         
         required_parameter_list = []
         
@@ -90,10 +118,7 @@ class CreateOrUpdateCloudFormationStackDeployStepAction(object):
             
             response = cf_client.create_stack(
                 StackName = self.stack_name,
-                TemplateURL = "https://s3.amazonaws.com/{}/{}".format(
-                    bucket_name,
-                    cf_template_key
-                ),
+                TemplateURL = aws_helpers.get_s3_url(bucket_name, cf_template_key, self.region_name),
                 Parameters = required_parameter_list,
                 Capabilities = [
                     "CAPABILITY_IAM"
@@ -137,10 +162,7 @@ class CreateOrUpdateCloudFormationStackDeployStepAction(object):
             try:
                 response = cf_client.update_stack(
                     StackName = self.stack_name,
-                    TemplateURL = "https://s3.amazonaws.com/{}/{}".format(
-                        bucket_name,
-                        cf_template_key
-                    ),
+                    TemplateURL = aws_helpers.get_s3_url(bucket_name, cf_template_key, self.region_name),
                     Parameters = new_parameter_list,
                     Capabilities = [
                         "CAPABILITY_IAM"
@@ -150,6 +172,14 @@ class CreateOrUpdateCloudFormationStackDeployStepAction(object):
             except ClientError as e:
                 if e.response['Error']['Code'] == 'ValidationError' and "No updates are to be performed." in str(e):
                     click.echo("No updates necessary for CloudFormation stack.")
+                    
+                    this_stack = response["Stacks"][0]
+                    stack_fingerprint_helpers.record_stack(
+                        stack_record_key,
+                        stack_fingerprint,
+                        this_stack["StackId"],
+                        this_stack["StackStatus"]
+                    )
                 else:
                     raise
         
@@ -166,7 +196,10 @@ class CreateOrUpdateCloudFormationStackDeployStepAction(object):
                 this_stack = response["Stacks"][0]
                 this_stack_status = this_stack["StackStatus"]
                 
-                click.echo(" > Stack status: {}".format(this_stack_status))
+                if self.status_listener is not None:
+                    self.status_listener(self.stack_name, this_stack_status)
+                else:
+                    click.echo(" > Stack status: {}".format(this_stack_status))
                 
                 if not this_stack_status.endswith("_IN_PROGRESS"):
                     stack_ending_status = this_stack_status
@@ -175,4 +208,26 @@ class CreateOrUpdateCloudFormationStackDeployStepAction(object):
                 time.sleep(15)
             
             if "ROLLBACK" in stack_ending_status:
-                raise click.ClickException("Stack update ended with status: {}".format(stack_ending_status))
\ No newline at end of file
+                stack_fingerprint_helpers.forget_stack(stack_record_key)
+                raise click.ClickException("Stack update ended with status: {}".format(stack_ending_status))
+            
+            stack_fingerprint_helpers.record_stack(
+                stack_record_key,
+                stack_fingerprint,
+                this_stack["StackId"],
+                stack_ending_status
+            )
+    
+    def get_parameter_update_values(self):
+        parameter_values = {}
+        
+        for each_key, each_value in self.stack_parameter_updates.items():
+            if each_key == "ApiDefinitionVersion":
+                # The value should be a hash of the given file.
+                parameter_values[each_key] = hashing_helpers.file_md5_checksum(each_value)
+        
+        # Content-addressed keys change with the artifact, so CloudFormation 
+        # sees a changed parameter whenever the code changes.
+        parameter_values.update(artifact_keys_helpers.get_parameter_values(self.artifact_key_parameters))
+        
+        return parameter_values
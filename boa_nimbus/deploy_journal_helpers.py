@@ -0,0 +1,175 @@
+import os
+import json
+import time
+import threading
+import click
+from botocore.exceptions import ClientError
+import aws_helpers
+
+default_deploy_journal_path = ".boa-nimbus-deploy-journal.jsonl"
+
+deploy_journal_path = default_deploy_journal_path
+
+journal_lock = threading.Lock()
+
+# Entries from the interrupted run being resumed, by what they describe.
+resumed_entries = {}
+
+def configure_deploy_journal(full_config):
+    global deploy_journal_path
+    
+    deploy_journal_path = full_config.get("DeployJournalPath", default_deploy_journal_path)
+
+# When resuming, completed mutations in the journal are trusted. Otherwise the 
+# previous run's unfinished multipart uploads are aborted first (S3 bills for 
+# their parts until then).
+def start_run(resume = False):
+    with journal_lock:
+        resumed_entries.clear()
+        
+        if not os.path.exists(deploy_journal_path):
+            if resume:
+                click.echo("No deploy journal found at {}. Nothing to resume.".format(deploy_journal_path))
+            return
+        
+        entry_list = load_journal_entries()
+        
+        if not resume:
+            abort_unfinished_multipart_uploads(entry_list)
+            os.unlink(deploy_journal_path)
+            return
+        
+        for each_entry in entry_list:
+            resumed_entries[get_entry_key(each_entry)] = each_entry
+        
+        click.echo("Resuming deploy with {} journal entries.".format(len(resumed_entries)))
+
+def load_journal_entries():
+    entry_list = []
+    
+    with open(deploy_journal_path) as f:
+        for each_line in f:
+            try:
+                entry_list.append(json.loads(each_line))
+            except ValueError:
+                # The last line may have been cut off mid-write.
+                continue
+    
+    return entry_list
+
+# Only those whose upload was never recorded as done.
+def abort_unfinished_multipart_uploads(entry_list):
+    uploaded_keys = set((x["Bucket"], x["Key"]) for x in entry_list if x["Action"] == "Upload")
+    
+    unfinished_entry_list = [
+        x for x in entry_list if x["Action"] == "MultipartUpload" and (x["Bucket"], x["SourceKey"]) not in uploaded_keys
+    ]
+    
+    if len(unfinished_entry_list) == 0:
+        return
+    
+    click.echo("Aborting {} unfinished multipart upload(s) from the previous deploy.".format(len(unfinished_entry_list)))
+    
+    for each_entry in unfinished_entry_list:
+        try:
+            aws_helpers.get_client("s3", each_entry.get("Region")).abort_multipart_upload(
+                Bucket = each_entry["Bucket"],
+                Key = each_entry["SourceKey"],
+                UploadId = each_entry["UploadId"]
+            )
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'NoSuchUpload':
+                click.echo("Unable to abort multipart upload of {}: {}".format(each_entry["SourceKey"], e), err = True)
+
+def finish_run():
+    with journal_lock:
+        resumed_entries.clear()
+        
+        if os.path.exists(deploy_journal_path):
+            os.unlink(deploy_journal_path)
+
+def get_entry_key(entry):
+    if entry["Action"] == "UpdateFunctionCode":
+        return (entry["Action"], entry.get("Region"), entry["FunctionName"])
+    
+    return (entry["Action"], entry["Bucket"], entry["SourceKey"])
+
+def append_entry(entry):
+    entry["Time"] = int(time.time())
+    
+    with journal_lock:
+        with open(deploy_journal_path, "a") as f:
+            f.write(json.dumps(entry, sort_keys = True) + "\n")
+
+def get_resumed_entry(entry_key):
+    with journal_lock:
+        return resumed_entries.get(entry_key)
+
+def record_upload(bucket_name, source_s3_key, s3_key, file_path, file_md5, etag = None):
+    file_stat = os.stat(file_path)
+    
+    append_entry({
+        "Action": "Upload",
+        "Bucket": bucket_name,
+        "SourceKey": source_s3_key,
+        "Key": s3_key,
+        "Size": file_stat.st_size,
+        "ModifiedTime": file_stat.st_mtime,
+        "Md5": file_md5,
+        "ETag": etag
+    })
+
+# Only if the file hasn't changed since.
+def get_completed_upload(bucket_name, source_s3_key, file_path):
+    entry = get_resumed_entry(("Upload", bucket_name, source_s3_key))
+    
+    if entry is None:
+        return None
+    
+    try:
+        file_stat = os.stat(file_path)
+    except OSError:
+        return None
+    
+    if file_stat.st_size != entry["Size"] or file_stat.st_mtime != entry["ModifiedTime"]:
+        return None
+    
+    return entry
+
+def record_multipart_upload_started(bucket_name, s3_key, file_md5, part_size, upload_id, region_name = None):
+    append_entry({
+        "Action": "MultipartUpload",
+        "Region": region_name,
+        "Bucket": bucket_name,
+        "SourceKey": s3_key,
+        "Md5": file_md5,
+        "PartSize": part_size,
+        "UploadId": upload_id
+    })
+
+# Only for the same file, in parts of the same size.
+def get_multipart_upload_id(bucket_name, s3_key, file_md5, part_size):
+    entry = get_resumed_entry(("MultipartUpload", bucket_name, s3_key))
+    
+    if entry is None or entry["Md5"] != file_md5 or entry["PartSize"] != part_size:
+        return None
+    
+    return entry["UploadId"]
+
+def record_function_update(region_name, function_name, bucket_name, s3_key, etag):
+    append_entry({
+        "Action": "UpdateFunctionCode",
+        "Region": region_name,
+        "FunctionName": function_name,
+        "Bucket": bucket_name,
+        "Key": s3_key,
+        "ETag": etag
+    })
+
+def is_function_update_completed(region_name, function_name, bucket_name, s3_key, etag):
+    entry = get_resumed_entry(("UpdateFunctionCode", region_name, function_name))
+    
+    if entry is None:
+        return False
+    
+    return entry["Bucket"] == bucket_name and entry["Key"] == s3_key and entry["ETag"] == etag
@@ -8,6 +8,8 @@ amazon_linux_docker_image_name = "amazonlinux"
 amazon_linux_docker_image_tag = "latest"
 local_lambda_packager_image_name = "boa-nimbus-packager"
 
+packager_docker_image_ready = False
+
 def verify_docker_reachable():
     
     try:
@@ -110,4 +112,16 @@ def build_packager_docker_image():
         stdout = subprocess.PIPE,
         stderr = subprocess.PIPE
     )
-    
\ No newline at end of file
+    
+
+# Once per run.
+def prepare_packager_docker_image():
+    global packager_docker_image_ready
+    
+    if packager_docker_image_ready:
+        return
+    
+    verify_docker_reachable()
+    build_packager_docker_image()
+    
+    packager_docker_image_ready = True
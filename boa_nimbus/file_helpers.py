@@ -0,0 +1,34 @@
+import os
+import uuid
+
+# Leaving an unchanged file alone keeps its mtime, so anything keyed on it 
+# stays valid. Returns True if the file was written.
+def write_file_if_changed(path, content):
+    try:
+        with open(path, "rb") as f:
+            if f.read() == content:
+                return False
+    except FileNotFoundError:
+        pass
+    
+    output_dir = os.path.dirname(os.path.abspath(path))
+    os.makedirs(output_dir, exist_ok = True)
+    
+    # Write alongside the target and swap it in, so readers never see a 
+    # partially written file.
+    temp_path = os.path.join(output_dir, ".{}.{}.tmp".format(
+        os.path.basename(path),
+        uuid.uuid4()
+    ))
+    
+    try:
+        with open(temp_path, "wb") as f:
+            f.write(content)
+        
+        os.replace(temp_path, path)
+    except:
+        if os.path.exists(temp_path):
+            os.unlink(temp_path)
+        raise
+    
+    return True
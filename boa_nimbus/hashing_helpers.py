@@ -10,6 +10,13 @@ def file_md5_checksum(fname):
             hash_md5.update(chunk)
     return hash_md5.hexdigest()
 
+def file_sha1_checksum(fname):
+    hash_sha1 = hashlib.sha1()
+    with open(fname, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            hash_sha1.update(chunk)
+    return hash_sha1.hexdigest()
+
 def file_sha256_checksum_base64(fname):
     hash_sha256 = hashlib.sha256()
     with open(fname, "rb") as f:
@@ -42,4 +49,36 @@ def directory_sha1_hash(directory):
                 SHAhash.update(hashlib.sha1(buf).digest())
             f1.close()
     
-    return SHAhash.hexdigest()
\ No newline at end of file
+    return SHAhash.hexdigest()
+
+# Reads the file only once.
+def file_md5_and_sha256_base64(fname):
+    hash_md5 = hashlib.md5()
+    hash_sha256 = hashlib.sha256()
+    
+    with open(fname, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            hash_md5.update(chunk)
+            hash_sha256.update(chunk)
+    
+    return hash_md5.hexdigest(), base64.b64encode(hash_sha256.digest()).decode("utf-8")
+
+# Hashes the size and the first and last sample_bytes, which tells builds of 
+# the same package apart (a zip's central directory, with every entry's CRC, 
+# is at its end).
+def file_quick_checksum(fname, sample_bytes = 64 * 1024):
+    hash_sha1 = hashlib.sha1()
+    
+    with open(fname, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        file_size = f.tell()
+        
+        hash_sha1.update(str(file_size).encode("utf-8"))
+        
+        f.seek(0)
+        hash_sha1.update(f.read(sample_bytes))
+        
+        f.seek(max(sample_bytes, file_size - sample_bytes))
+        hash_sha1.update(f.read(sample_bytes))
+    
+    return hash_sha1.hexdigest()
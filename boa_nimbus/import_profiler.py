@@ -0,0 +1,251 @@
+import os
+import json
+import shutil
+import tempfile
+import subprocess
+import click
+import yaml
+import zip_helpers
+import docker_helpers
+
+default_handler = "index.lambda_handler"
+
+default_lambda_runtime = "python3.6"
+
+import_times_marker = "BOA-NIMBUS-IMPORT-TIMES "
+
+# Run with "-c" by the function's own interpreter, which may be Python 2.7 
+# (so no "-X importtime", which needs 3.7). Wraps __import__ to time each 
+# import that loads new modules, minus the time of the imports it makes.
+import_timer_code = """
+import sys, time, json
+try:
+    import builtins
+except ImportError:
+    import __builtin__ as builtins
+
+timer = getattr(time, "perf_counter", time.time)
+original_import = builtins.__import__
+nested_times = [0.0]
+import_records = []
+
+def timed_import(name, *args, **kwargs):
+    module_count = len(sys.modules)
+    nested_times.append(0.0)
+    start_time = timer()
+    try:
+        return original_import(name, *args, **kwargs)
+    finally:
+        elapsed = timer() - start_time
+        nested_time = nested_times.pop()
+        nested_times[-1] += elapsed
+        if len(sys.modules) > module_count:
+            fromlist = args[2] if len(args) > 2 else kwargs.get("fromlist")
+            level = args[3] if len(args) > 3 else kwargs.get("level", 0)
+            import_records.append({
+                "Self": int((elapsed - nested_time) * 1000000),
+                "Cumulative": int(elapsed * 1000000),
+                "Depth": len(nested_times) - 1,
+                "Name": "." * max(level, 0) + (name or ",".join(fromlist or []))
+            })
+
+builtins.__import__ = timed_import
+try:
+    __import__(sys.argv[1])
+finally:
+    builtins.__import__ = original_import
+    sys.stdout.write("\\n" + MARKER + json.dumps(import_records) + "\\n")
+""".replace("MARKER", json.dumps(import_times_marker))
+
+# No .pyc files are written, as on Lambda, where the package directory is 
+# read-only, so the numbers include compiling the function's modules.
+class ImportTimeProfiler(object):
+    
+    def __init__(self, full_config, python_binary = None, top_count = 10, budget_ms = None, use_docker = True):
+        self.full_config = full_config
+        self.python_binary = python_binary
+        self.top_count = top_count
+        self.budget_ms = budget_ms
+        self.use_docker = use_docker
+        
+        self.handler_map = self.get_template_handler_map()
+    
+    # {package file name: handler} from the deploy steps' templates.
+    def get_template_handler_map(self):
+        handler_map = {}
+        
+        template_path_set = set()
+        
+        for each_group_dict in self.full_config.get("DeployStepGroups", []):
+            for each_step in each_group_dict.get("Steps", []):
+                if each_step.get("TemplatePath") is not None:
+                    template_path_set.add(each_step["TemplatePath"])
+        
+        for each_template_path in sorted(template_path_set):
+            try:
+                cf_template = yaml.load(open(each_template_path))
+            except Exception:
+                continue
+            
+            for each_resource_dict in (cf_template.get("Resources") or {}).values():
+                if each_resource_dict.get("Type") != "AWS::Lambda::Function":
+                    continue
+                
+                each_properties = each_resource_dict.get("Properties", {})
+                each_s3_key = each_properties.get("Code", {}).get("S3Key")
+                
+                if isinstance(each_s3_key, str) and isinstance(each_properties.get("Handler"), str):
+                    handler_map[os.path.basename(each_s3_key)] = each_properties["Handler"]
+        
+        return handler_map
+    
+    # [(function name, zip path, source dir, step budget), ...]
+    def get_function_list(self):
+        function_list = []
+        
+        for each_group_dict in self.full_config.get("BuildStepGroups", []):
+            for each_step in each_group_dict.get("Steps", []):
+                if each_step.get("Action") != "BuildPythonLambdaFunctions":
+                    continue
+                
+                input_directory = each_step.get("InputDirectory", "")
+                output_directory = each_step.get("OutputDirectory", "")
+                
+                if not os.path.isdir(output_directory):
+                    continue
+                
+                for each_file in sorted(os.listdir(output_directory)):
+                    if not each_file.endswith(".zip"):
+                        continue
+                    
+                    function_name = each_file[:-len(".zip")]
+                    
+                    function_list.append((
+                        function_name,
+                        os.path.join(output_directory, each_file),
+                        os.path.join(input_directory, function_name),
+                        each_step.get("ImportTimeBudgetMs")
+                    ))
+        
+        return function_list
+    
+    def get_package_options(self, source_dir):
+        try:
+            return yaml.load(open(os.path.join(source_dir, "package.yaml")))["Options"] or {}
+        except Exception:
+            return {}
+    
+    def run(self):
+        
+        function_list = self.get_function_list()
+        
+        if len(function_list) == 0:
+            click.echo("No built Lambda function packages to profile.")
+            return
+        
+        over_budget_list = []
+        
+        for function_name, zip_path, source_dir, step_budget_ms in function_list:
+            package_options = self.get_package_options(source_dir)
+            
+            handler = package_options.get("Handler") or self.handler_map.get(os.path.basename(zip_path)) or default_handler
+            handler_module = handler.rsplit(".", 1)[0].replace("/", ".")
+            
+            budget_ms = self.budget_ms
+            
+            if budget_ms is None:
+                budget_ms = package_options.get("ImportTimeBudgetMs", step_budget_ms)
+            
+            lambda_runtime = package_options.get("Runtime") or default_lambda_runtime
+            
+            # One function that can't be imported (e.g. a missing native 
+            # library) shouldn't stop the others being profiled.
+            try:
+                total_ms = self.profile_function(function_name, zip_path, handler_module, lambda_runtime)
+            except click.ClickException as e:
+                click.echo("{} ({}): not profiled. {}".format(function_name, handler_module, e.message), err = True)
+                continue
+            
+            if budget_ms is not None and total_ms > budget_ms:
+                over_budget_list.append("{} ({:.1f} ms > {} ms)".format(function_name, total_ms, budget_ms))
+        
+        if len(over_budget_list) > 0:
+            raise click.ClickException("Import time over budget: {}".format(", ".join(over_budget_list)))
+    
+    def get_python_command(self, lambda_runtime, package_dir):
+        if self.python_binary is not None:
+            return [self.python_binary]
+        
+        # Compiled dependencies only load under the runtime they were built 
+        # for, and on Linux.
+        if self.use_docker:
+            docker_helpers.prepare_packager_docker_image()
+            
+            return [
+                "docker", "run", "--rm",
+                "-v", "{}:/var/task:ro".format(os.path.realpath(package_dir)),
+                "-w", "/var/task",
+                "-e", "PYTHONPATH=/var/task",
+                "-e", "PYTHONDONTWRITEBYTECODE=1",
+                docker_helpers.local_lambda_packager_image_name,
+                lambda_runtime
+            ]
+        
+        python_binary = shutil.which(lambda_runtime)
+        
+        if python_binary is None:
+            raise click.ClickException("No {} interpreter found, and Docker is disabled. Use --python to choose one.".format(lambda_runtime))
+        
+        return [python_binary]
+    
+    def get_import_time_lines(self, handler_module, lambda_runtime, package_dir):
+        env = dict(os.environ)
+        env["PYTHONDONTWRITEBYTECODE"] = "1"
+        env["PYTHONPATH"] = package_dir
+        
+        python_command = self.get_python_command(lambda_runtime, package_dir)
+        
+        try:
+            p = subprocess.run(
+                python_command + ["-c", import_timer_code, handler_module],
+                cwd = package_dir,
+                env = env,
+                stdout = subprocess.PIPE,
+                stderr = subprocess.PIPE
+            )
+        except OSError as e:
+            raise click.ClickException("Unable to run {}: {}".format(python_command[0], e))
+        
+        if p.returncode != 0:
+            raise click.ClickException("Import failed under {}:\n{}".format(
+                lambda_runtime if self.python_binary is None else self.python_binary,
+                p.stderr.decode("utf-8", "replace").strip()
+            ))
+        
+        for each_line in reversed(p.stdout.decode("utf-8", "replace").splitlines()):
+            if each_line.startswith(import_times_marker):
+                return json.loads(each_line[len(import_times_marker):])
+        
+        raise click.ClickException("No import times reported.")
+    
+    # Returns the total in milliseconds.
+    def profile_function(self, function_name, zip_path, handler_module, lambda_runtime):
+        package_dir = tempfile.mkdtemp()
+        
+        try:
+            zip_helpers.extract_zip_preserving_modes(zip_path, package_dir)
+            
+            import_time_lines = self.get_import_time_lines(handler_module, lambda_runtime, package_dir)
+        finally:
+            shutil.rmtree(package_dir)
+        
+        total_ms = sum(x["Cumulative"] for x in import_time_lines if x["Depth"] == 0) / 1000.0
+        
+        click.echo("{} ({}): {:.1f} ms total import time".format(function_name, handler_module, total_ms))
+        
+        slowest_lines = sorted(import_time_lines, key = lambda x: x["Self"], reverse = True)[:self.top_count]
+        
+        for each_line in slowest_lines:
+            click.echo("  {:>10.1f} ms  {}".format(each_line["Self"] / 1000.0, each_line["Name"]))
+        
+        return total_ms
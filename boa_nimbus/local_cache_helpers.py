@@ -0,0 +1,323 @@
+import os
+import json
+import time
+import fcntl
+import threading
+import click
+import file_helpers
+import compression_helpers
+import package_size_helpers
+
+cache_lock_file_name = ".boa-nimbus-cache.lock"
+cache_stats_file_name = ".boa-nimbus-cache-stats.json"
+
+cache_metadata_file_names = set([cache_lock_file_name, cache_stats_file_name])
+
+# Entries used this recently are never evicted for size, since a build 
+# running alongside may be about to read them.
+recent_access_grace_seconds = 10 * 60
+
+# {"MaxSizeMB": ..., "MaxAgeDays": ..., "Caches": {cache name: {...}}}
+cache_limits_config = {}
+
+# {cache path: {"Hits": ..., "Misses": ...}} not yet written to the caches.
+pending_cache_counts = {}
+pending_cache_counts_lock = threading.Lock()
+
+eviction_thread = None
+
+def configure_cache_limits(full_config):
+    global cache_limits_config
+    
+    cache_limits_config = full_config.get("CacheLimits", {})
+
+# [(cache name, path), ...]
+def get_managed_caches(full_config):
+    cache_list = []
+    
+    if full_config.get("BuildCacheHashesDirectory") is not None:
+        cache_list.append(("BuildCacheHashes", full_config["BuildCacheHashesDirectory"]))
+    
+    for each_group_dict in full_config.get("BuildStepGroups", []):
+        for each_step in each_group_dict.get("Steps", []):
+            if each_step.get("Action") == "BuildPythonLambdaFunctions" and each_step.get("PipCacheDirectory") is not None:
+                cache_list.append(("PipCache", each_step["PipCacheDirectory"]))
+            
+            if each_step.get("Action") == "RunCommand" and each_step.get("OutputCacheDirectory") is not None:
+                cache_list.append(("RunCommandOutputCache", each_step["OutputCacheDirectory"]))
+    
+    remote_build_cache_config = full_config.get("RemoteBuildCache") or {}
+    
+    if remote_build_cache_config.get("Type", "Directory") == "Directory" and remote_build_cache_config.get("Path") is not None:
+        cache_list.append(("RemoteBuildCache", remote_build_cache_config["Path"]))
+    
+    cache_list.append((
+        "CompressedCache",
+        full_config.get("CompressedCacheDirectory", compression_helpers.default_compressed_cache_directory)
+    ))
+    
+    unique_cache_list = []
+    seen_paths = set()
+    
+    for each_name, each_path in cache_list:
+        if os.path.abspath(each_path) in seen_paths:
+            continue
+        
+        seen_paths.add(os.path.abspath(each_path))
+        unique_cache_list.append((each_name, each_path))
+    
+    return unique_cache_list
+
+# (max bytes, max age in seconds), either of which may be None.
+def get_cache_limits(cache_name):
+    limits_dict = dict(cache_limits_config)
+    limits_dict.update((cache_limits_config.get("Caches") or {}).get(cache_name) or {})
+    
+    max_bytes = None
+    max_age_seconds = None
+    
+    if limits_dict.get("MaxSizeMB") is not None:
+        max_bytes = int(limits_dict["MaxSizeMB"] * 1024 * 1024)
+    
+    if limits_dict.get("MaxAgeDays") is not None:
+        max_age_seconds = limits_dict["MaxAgeDays"] * 24 * 60 * 60
+    
+    return max_bytes, max_age_seconds
+
+def get_last_access_time(file_stat):
+    # Filesystems mounted with relatime only update atime now and then, so 
+    # a file written later than its atime was last used when written.
+    return max(file_stat.st_atime, file_stat.st_mtime)
+
+# A hit also marks entry_path as recently used (only its atime changes; mtimes 
+# may be meaningful).
+def record_access(cache_path, entry_path = None, hit = True):
+    if cache_path is None:
+        return
+    
+    with pending_cache_counts_lock:
+        cache_counts = pending_cache_counts.setdefault(os.path.abspath(cache_path), {"Hits": 0, "Misses": 0})
+        cache_counts["Hits" if hit else "Misses"] += 1
+    
+    if hit and entry_path is not None:
+        touch_entry(entry_path)
+
+# Turns an already counted hit into a miss, e.g. for a corrupt entry.
+def record_unusable_hit(cache_path):
+    with pending_cache_counts_lock:
+        cache_counts = pending_cache_counts.setdefault(os.path.abspath(cache_path), {"Hits": 0, "Misses": 0})
+        cache_counts["Hits"] -= 1
+        cache_counts["Misses"] += 1
+
+def touch_entry(entry_path):
+    try:
+        os.utime(entry_path, (time.time(), os.stat(entry_path).st_mtime))
+    except OSError:
+        pass
+
+# Held while a cache is evicted or its stats updated, so concurrent builds 
+# don't trip over each other.
+class CacheLock(object):
+    
+    def __init__(self, cache_path, blocking = True):
+        self.cache_path = cache_path
+        self.blocking = blocking
+        self.lock_file = None
+    
+    def __enter__(self):
+        os.makedirs(self.cache_path, exist_ok = True)
+        
+        self.lock_file = open(os.path.join(self.cache_path, cache_lock_file_name), "a")
+        
+        try:
+            fcntl.flock(self.lock_file, fcntl.LOCK_EX if self.blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except (IOError, OSError):
+            self.lock_file.close()
+            self.lock_file = None
+        
+        return self.lock_file is not None
+    
+    def __exit__(self, *args):
+        if self.lock_file is not None:
+            fcntl.flock(self.lock_file, fcntl.LOCK_UN)
+            self.lock_file.close()
+            self.lock_file = None
+
+def load_cache_stats(cache_path):
+    try:
+        with open(os.path.join(cache_path, cache_stats_file_name)) as f:
+            return json.loads(f.read())
+    except (IOError, ValueError):
+        return {}
+
+def write_cache_stats(cache_path, cache_stats):
+    file_helpers.write_file_if_changed(
+        os.path.join(cache_path, cache_stats_file_name),
+        json.dumps(cache_stats, indent = 4, sort_keys = True).encode("utf-8")
+    )
+
+def flush_cache_counts():
+    with pending_cache_counts_lock:
+        cache_counts_map = dict(pending_cache_counts)
+        pending_cache_counts.clear()
+    
+    for each_cache_path, each_counts in cache_counts_map.items():
+        with CacheLock(each_cache_path):
+            cache_stats = load_cache_stats(each_cache_path)
+            
+            for each_key in ["Hits", "Misses"]:
+                cache_stats[each_key] = cache_stats.get(each_key, 0) + each_counts[each_key]
+            
+            write_cache_stats(each_cache_path, cache_stats)
+
+# [(path, size in bytes, last access time), ...]
+def get_cache_entries(cache_path):
+    entry_list = []
+    
+    for root, dirs, files in os.walk(cache_path):
+        for each_file_name in files:
+            if root == cache_path and each_file_name in cache_metadata_file_names:
+                continue
+            
+            each_path = os.path.join(root, each_file_name)
+            
+            try:
+                each_stat = os.stat(each_path)
+            except OSError:
+                continue
+            
+            entry_list.append((each_path, each_stat.st_size, get_last_access_time(each_stat)))
+    
+    return entry_list
+
+# Age cap first, then least recently used until under the size cap. Returns 
+# (files deleted, bytes freed), or None if another build is evicting it.
+def evict_cache(cache_name, cache_path, blocking = False):
+    max_bytes, max_age_seconds = get_cache_limits(cache_name)
+    
+    if (max_bytes is None and max_age_seconds is None) or not os.path.isdir(cache_path):
+        return (0, 0)
+    
+    cache_path = os.path.abspath(cache_path)
+    
+    with CacheLock(cache_path, blocking) as is_locked:
+        if not is_locked:
+            return None
+        
+        now = time.time()
+        
+        # Least recently used first.
+        entry_list = sorted(get_cache_entries(cache_path), key = lambda x: x[2])
+        
+        total_bytes = sum(x[1] for x in entry_list)
+        
+        deleted_count = 0
+        deleted_bytes = 0
+        
+        for each_path, each_size, each_last_access_time in entry_list:
+            is_expired = max_age_seconds is not None and each_last_access_time < now - max_age_seconds
+            is_over_size = max_bytes is not None and total_bytes > max_bytes and each_last_access_time < now - recent_access_grace_seconds
+            
+            if not is_expired and not is_over_size:
+                continue
+            
+            try:
+                os.unlink(each_path)
+            except OSError:
+                continue
+            
+            total_bytes -= each_size
+            deleted_count += 1
+            deleted_bytes += each_size
+        
+        # Leave no empty directories behind (but keep the cache's own).
+        for root, dirs, files in os.walk(cache_path, topdown = False):
+            if root != cache_path and len(os.listdir(root)) == 0:
+                try:
+                    os.rmdir(root)
+                except OSError:
+                    pass
+        
+        if deleted_count > 0:
+            cache_stats = load_cache_stats(cache_path)
+            cache_stats["LastEviction"] = {
+                "Time": now,
+                "FilesDeleted": deleted_count,
+                "BytesFreed": deleted_bytes
+            }
+            write_cache_stats(cache_path, cache_stats)
+    
+    return (deleted_count, deleted_bytes)
+
+def evict_caches(full_config, blocking = False):
+    for each_name, each_path in get_managed_caches(full_config):
+        try:
+            eviction_result = evict_cache(each_name, each_path, blocking)
+        except Exception as e:
+            click.echo("Unable to evict cache {}: {}".format(each_path, e), err = True)
+            continue
+        
+        if eviction_result is not None and eviction_result[0] > 0:
+            click.echo("Evicted {} file(s) ({}) from cache {}.".format(
+                eviction_result[0],
+                package_size_helpers.format_bytes(eviction_result[1]),
+                each_path
+            ))
+
+def start_background_eviction(full_config):
+    global eviction_thread
+    
+    eviction_thread = threading.Thread(target = evict_caches, args = (full_config,))
+    eviction_thread.start()
+
+def finish():
+    global eviction_thread
+    
+    if eviction_thread is not None:
+        eviction_thread.join()
+        eviction_thread = None
+    
+    flush_cache_counts()
+
+def print_cache_stats(full_config):
+    
+    for each_name, each_path in get_managed_caches(full_config):
+        click.echo("{} ({}):".format(each_name, each_path))
+        
+        if not os.path.isdir(each_path):
+            click.echo(" * Not created yet.")
+            continue
+        
+        entry_list = get_cache_entries(each_path)
+        cache_stats = load_cache_stats(each_path)
+        max_bytes, max_age_seconds = get_cache_limits(each_name)
+        
+        click.echo(" * Size: {} in {} file(s){}".format(
+            package_size_helpers.format_bytes(sum(x[1] for x in entry_list)),
+            len(entry_list),
+            "" if max_bytes is None else " (limit {})".format(package_size_helpers.format_bytes(max_bytes))
+        ))
+        
+        if len(entry_list) > 0:
+            click.echo(" * Least recently used: {:.1f} day(s) ago{}".format(
+                (time.time() - min(x[2] for x in entry_list)) / (24 * 60 * 60),
+                "" if max_age_seconds is None else " (limit {} day(s))".format(max_age_seconds / (24 * 60 * 60))
+            ))
+        
+        lookup_count = cache_stats.get("Hits", 0) + cache_stats.get("Misses", 0)
+        
+        if lookup_count > 0:
+            click.echo(" * Hit rate: {:.1f}% ({} hit(s), {} miss(es))".format(
+                100.0 * cache_stats.get("Hits", 0) / lookup_count,
+                cache_stats.get("Hits", 0),
+                cache_stats.get("Misses", 0)
+            ))
+        else:
+            click.echo(" * Hit rate: no lookups recorded")
+        
+        if cache_stats.get("LastEviction") is not None:
+            click.echo(" * Last eviction: {} ({} file(s), {} freed)".format(
+                time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(cache_stats["LastEviction"]["Time"])),
+                cache_stats["LastEviction"]["FilesDeleted"],
+                package_size_helpers.format_bytes(cache_stats["LastEviction"]["BytesFreed"])
+            ))
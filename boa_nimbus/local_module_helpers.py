@@ -0,0 +1,142 @@
+import os
+import re
+import hashlib
+import hashing_helpers
+import build_cache_helpers
+
+requirement_name_regex = re.compile(r"^([A-Za-z0-9][A-Za-z0-9._-]*)")
+distribution_file_regex = re.compile(r"^(.+?)-(\d[^-]*)(-.*)?\.(whl|tar\.gz|zip)$")
+setup_name_regex = re.compile(r"""\bname\s*=\s*["']([^"']+)["']""")
+
+def normalize_distribution_name(name):
+    return re.sub(r"[-_.]+", "-", name).lower()
+
+# Only bare distribution names and directory paths (relative to the 
+# requirements file) can refer to a local module.
+def get_requirement_references(requirements_path):
+    reference_list = []
+    
+    if not os.path.exists(requirements_path):
+        return reference_list
+    
+    requirements_directory = os.path.dirname(os.path.abspath(requirements_path))
+    
+    for each_line in open(requirements_path).read().split("\n"):
+        each_line = each_line.split(" #")[0].strip()
+        
+        if each_line.startswith("-e ") or each_line.startswith("--editable "):
+            each_line = each_line.split(" ", 1)[1].strip()
+        
+        if len(each_line) == 0 or each_line.startswith("#") or each_line.startswith("-"):
+            continue
+        
+        each_path = os.path.normpath(os.path.join(requirements_directory, each_line))
+        
+        if os.path.isdir(each_path):
+            reference_list.append(each_path)
+            continue
+        
+        match = requirement_name_regex.match(each_line.split(";")[0])
+        
+        if match is not None:
+            reference_list.append(match.group(1))
+    
+    return reference_list
+
+# From setup.py or setup.cfg, or else the directory's name.
+def get_module_distribution_name(module_dir):
+    for each_file in ["setup.py", "setup.cfg"]:
+        each_path = os.path.join(module_dir, each_file)
+        
+        if not os.path.isfile(each_path):
+            continue
+        
+        match = setup_name_regex.search(open(each_path).read())
+        
+        if match is not None:
+            return normalize_distribution_name(match.group(1))
+    
+    return normalize_distribution_name(os.path.basename(os.path.normpath(module_dir)))
+
+# {normalized distribution name: source directory} for 
+# BuildLocalPythonPipModules steps.
+def get_local_module_source_directories(full_config):
+    source_directories_map = {}
+    
+    for each_group_dict in full_config.get("BuildStepGroups", []):
+        for each_step in each_group_dict.get("Steps", []):
+            if each_step.get("Action") != "BuildLocalPythonPipModules":
+                continue
+            
+            input_directory = each_step.get("InputDirectory", "")
+            
+            if not os.path.isdir(input_directory):
+                continue
+            
+            for each_dir in sorted(os.listdir(input_directory)):
+                module_dir = os.path.join(input_directory, each_dir)
+                
+                if os.path.isdir(module_dir):
+                    source_directories_map[get_module_distribution_name(module_dir)] = module_dir
+    
+    return source_directories_map
+
+# Rebuilt archives differ (they embed timestamps) even when the source didn't 
+# change, so a module's source directory is hashed when known, and its 
+# archives otherwise.
+def get_local_distribution_hashes(local_packages_directory, source_directories_map = None):
+    distribution_hashes_map = {}
+    
+    for each_name, each_dir in (source_directories_map or {}).items():
+        distribution_hashes_map[each_name] = build_cache_helpers.get_hash_of_path(each_dir)
+    
+    distribution_files_map = {}
+    
+    if local_packages_directory is None or not os.path.isdir(local_packages_directory):
+        return distribution_hashes_map
+    
+    for each_file in sorted(os.listdir(local_packages_directory)):
+        match = distribution_file_regex.match(each_file)
+        
+        if match is None:
+            continue
+        
+        distribution_name = normalize_distribution_name(match.group(1))
+        
+        if distribution_name in distribution_hashes_map:
+            continue
+        
+        distribution_files_map.setdefault(distribution_name, []).append(each_file)
+    
+    for each_name, each_file_list in distribution_files_map.items():
+        combined_hash = hashlib.sha1()
+        
+        for each_file in each_file_list:
+            combined_hash.update(each_file.encode("utf-8"))
+            combined_hash.update(hashing_helpers.file_md5_checksum(
+                os.path.join(local_packages_directory, each_file)
+            ).encode("utf-8"))
+        
+        distribution_hashes_map[each_name] = combined_hash.hexdigest()
+    
+    return distribution_hashes_map
+
+# {reference: hash} for each local module, by distribution name or path.
+def get_local_module_hashes_for_requirements(requirements_path, local_distribution_hashes):
+    local_module_hashes = {}
+    
+    for each_reference in get_requirement_references(requirements_path):
+        
+        if os.path.isdir(each_reference):
+            # Keyed by the path as the requirements file would have it, so 
+            # the hashes don't depend on where the project is checked out.
+            reference_key = os.path.relpath(each_reference, os.path.dirname(os.path.abspath(requirements_path)))
+            local_module_hashes[reference_key] = build_cache_helpers.get_hash_of_path(each_reference)
+            continue
+        
+        distribution_name = normalize_distribution_name(each_reference)
+        
+        if distribution_name in local_distribution_hashes:
+            local_module_hashes[distribution_name] = local_distribution_hashes[distribution_name]
+    
+    return local_module_hashes
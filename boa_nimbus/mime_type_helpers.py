@@ -0,0 +1,49 @@
+import os
+import threading
+
+default_mime_type = "binary/octet-stream"
+
+mime_types_file_path = os.path.join(
+    os.path.dirname(os.path.realpath(__file__)),
+    "mime.types.txt"
+)
+
+extension_mime_type_map = None
+extension_mime_type_map_lock = threading.Lock()
+
+def normalize_extension(extension):
+    return extension.lower().lstrip(".")
+
+def load_extension_mime_type_map():
+    global extension_mime_type_map
+    
+    with extension_mime_type_map_lock:
+        if extension_mime_type_map is None:
+            new_extension_mime_type_map = {}
+            
+            with open(mime_types_file_path) as f:
+                for each_line in f:
+                    line_parts = each_line.split()
+                    
+                    if len(line_parts) < 2 or line_parts[0].startswith("#"):
+                        continue
+                    
+                    for each_extension in line_parts[1:]:
+                        new_extension_mime_type_map.setdefault(normalize_extension(each_extension), line_parts[0])
+            
+            extension_mime_type_map = new_extension_mime_type_map
+    
+    return extension_mime_type_map
+
+# content_type_overrides is an already normalized {extension: MIME type}, 
+# checked first.
+def get_mime_type(file_path, content_type_overrides = None):
+    extension = normalize_extension(os.path.splitext(file_path)[1])
+    
+    if content_type_overrides and extension in content_type_overrides:
+        return content_type_overrides[extension]
+    
+    if extension_mime_type_map is None:
+        load_extension_mime_type_map()
+    
+    return extension_mime_type_map.get(extension, default_mime_type)
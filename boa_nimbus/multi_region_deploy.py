@@ -0,0 +1,233 @@
+import time
+import threading
+import concurrent.futures
+import click
+from botocore.exceptions import ClientError
+import aws_helpers
+
+from create_bucket_if_not_exists import CreateBucketIfNotExistsDeployStepAction
+from upload_directory_contents_to_bucket import UploadDirectoryContentsToBucketDeployStepAction
+from create_or_update_cloudformation_stack import CreateOrUpdateCloudFormationStackDeployStepAction
+from update_lambda_function_sources import UpdateLambdaFunctionSourcesDeployStepAction
+from parallel_stack_deploy import ParallelStackDeployer, get_deploy_step_batches
+
+deploy_step_action_classes = {
+    "CreateBucketIfNotExists": CreateBucketIfNotExistsDeployStepAction,
+    "UploadDirectoryContentsToBucket": UploadDirectoryContentsToBucketDeployStepAction,
+    "CreateOrUpdateCloudFormationStack": CreateOrUpdateCloudFormationStackDeployStepAction,
+    "UpdateLambdaFunctionSources": UpdateLambdaFunctionSourcesDeployStepAction
+}
+
+# Files for prefix-named buckets are uploaded once, to the first region, and 
+# copied server-side to the other regions' buckets.
+class MultiRegionDeployer(object):
+    
+    def __init__(self, full_config, region_list, max_copy_workers = 16):
+        self.full_config = full_config
+        self.region_list = region_list
+        self.max_copy_workers = max_copy_workers
+        
+        self.region_results_map = {}
+        self.region_results_lock = threading.Lock()
+    
+    def get_deploy_step_list(self):
+        step_list = []
+        
+        for each_group_dict in self.full_config.get("DeployStepGroups", []):
+            step_list.extend(each_group_dict.get("Steps", []))
+        
+        return step_list
+    
+    def create_action(self, step_config, region_name):
+        step_action = step_config.get("Action", "")
+        
+        if step_action not in deploy_step_action_classes:
+            click.echo("Unknown command action: {}".format(step_action), err=True)
+            return None
+        
+        new_action_handler = deploy_step_action_classes[step_action](self.full_config, step_config)
+        new_action_handler.region_name = region_name
+        
+        return new_action_handler
+    
+    def is_replicated_upload_step(self, step_config):
+        return step_config.get("Action") == "UploadDirectoryContentsToBucket" and step_config.get("BucketNamePrefix") is not None
+    
+    def run(self):
+        
+        primary_region_name = self.region_list[0]
+        
+        step_list = self.get_deploy_step_list()
+        
+        click.echo("Deploying to regions: {}".format(", ".join(self.region_list)))
+        
+        # Buckets first, since uploads to every region need them.
+        bucket_step_list = [x for x in step_list if x.get("Action") == "CreateBucketIfNotExists"]
+        
+        self.run_for_each_region(bucket_step_list, self.region_list)
+        
+        for each_step in step_list:
+            if not self.is_replicated_upload_step(each_step):
+                continue
+            
+            upload_action = self.create_action(each_step, primary_region_name)
+            
+            # The keys uploaded are what gets replicated.
+            upload_action.file_md5_map = {}
+            
+            try:
+                upload_action.run()
+            except Exception as e:
+                self.record_region_result(primary_region_name, e)
+                raise
+            
+            with concurrent.futures.ThreadPoolExecutor(max_workers = len(self.region_list)) as executor:
+                future_region_map = {}
+                
+                for each_region_name in self.region_list[1:]:
+                    future_region_map[executor.submit(
+                        self.replicate_upload,
+                        upload_action,
+                        each_step,
+                        each_region_name
+                    )] = each_region_name
+            
+            for each_future, each_region_name in future_region_map.items():
+                if each_future.exception() is not None:
+                    self.record_region_result(each_region_name, each_future.exception())
+        
+        remaining_step_list = [
+            x for x in step_list if x.get("Action") != "CreateBucketIfNotExists" and not self.is_replicated_upload_step(x)
+        ]
+        
+        self.run_for_each_region(remaining_step_list, self.region_list)
+        
+        self.print_summary()
+    
+    # ETags differ between multipart uploads and copies of the same bytes, so 
+    # objects are compared by the source MD5 kept in their metadata, plus 
+    # their upload headers.
+    def replicate_upload(self, upload_action, step_config, region_name):
+        source_bucket_name = upload_action.get_bucket_name()
+        
+        region_upload_action = self.create_action(step_config, region_name)
+        destination_bucket_name = region_upload_action.get_bucket_name()
+        
+        s3_client = aws_helpers.get_client("s3", region_name)
+        
+        def is_object_current(each_s3_key):
+            try:
+                response = s3_client.head_object(
+                    Bucket = destination_bucket_name,
+                    Key = each_s3_key
+                )
+            except ClientError as e:
+                if e.response['Error']['Code'] == '404':
+                    return False
+                raise
+            
+            if each_s3_key in upload_action.upload_only_if_not_exists_files:
+                return True
+            
+            upload_rule = upload_action.get_upload_rule(each_s3_key)
+            
+            if response.get("ContentEncoding") != upload_rule.get("ContentEncoding") or response.get("CacheControl") != upload_rule.get("CacheControl"):
+                return False
+            
+            return response.get("Metadata", {}).get("boa-nimbus-md5") == upload_action.file_md5_map[each_s3_key]
+        
+        def replicate_object(each_s3_key):
+            if is_object_current(each_s3_key):
+                return False
+            
+            # Metadata and headers are copied along with the object.
+            s3_client.copy_object(
+                Bucket = destination_bucket_name,
+                Key = each_s3_key,
+                CopySource = {
+                    "Bucket": source_bucket_name,
+                    "Key": each_s3_key
+                }
+            )
+            
+            return True
+        
+        with concurrent.futures.ThreadPoolExecutor(max_workers = self.max_copy_workers) as executor:
+            copied_count = sum(executor.map(replicate_object, sorted(upload_action.file_md5_map.keys())))
+        
+        click.echo("Replicated {} of {} object(s) from {} to {}.".format(
+            copied_count,
+            len(upload_action.file_md5_map),
+            source_bucket_name,
+            destination_bucket_name
+        ))
+        
+        if region_upload_action.sync:
+            region_upload_action.delete_stale_objects(
+                destination_bucket_name,
+                set(x[1] for x in upload_action.get_local_file_list())
+            )
+    
+    def run_for_each_region(self, step_list, region_list):
+        
+        with concurrent.futures.ThreadPoolExecutor(max_workers = len(region_list)) as executor:
+            for each_region_name in region_list:
+                executor.submit(self.run_steps_for_region, step_list, each_region_name)
+    
+    def run_steps_for_region(self, step_list, region_name):
+        
+        # A region that has already failed doesn't go any further.
+        if self.region_results_map.get(region_name, {}).get("Error") is not None:
+            return
+        
+        start_time = time.time()
+        
+        try:
+            for each_batch in get_deploy_step_batches(step_list):
+                if len(each_batch) > 1:
+                    ParallelStackDeployer(self.full_config, each_batch, region_name).run()
+                    continue
+                
+                new_action_handler = self.create_action(each_batch[0], region_name)
+                
+                if new_action_handler is not None:
+                    new_action_handler.run()
+        except Exception as e:
+            self.record_region_result(region_name, e, time.time() - start_time)
+            return
+        
+        self.record_region_result(region_name, None, time.time() - start_time)
+    
+    def record_region_result(self, region_name, error, elapsed_seconds = 0):
+        with self.region_results_lock:
+            region_result = self.region_results_map.setdefault(region_name, {
+                "Error": None,
+                "Seconds": 0
+            })
+            
+            region_result["Seconds"] += elapsed_seconds
+            
+            if error is not None and region_result["Error"] is None:
+                region_result["Error"] = error
+    
+    def print_summary(self):
+        
+        click.echo("Region summary:")
+        
+        failed_region_list = []
+        
+        for each_region_name in self.region_list:
+            region_result = self.region_results_map.get(each_region_name, {"Error": None, "Seconds": 0})
+            
+            if region_result["Error"] is None:
+                click.echo(" * {}: OK ({:.1f}s)".format(each_region_name, region_result["Seconds"]))
+            else:
+                failed_region_list.append(each_region_name)
+                click.echo(" * {}: FAILED ({:.1f}s) - {}".format(
+                    each_region_name,
+                    region_result["Seconds"],
+                    region_result["Error"]
+                ))
+        
+        if len(failed_region_list) > 0:
+            raise click.ClickException("Deploy failed in region(s): {}".format(", ".join(failed_region_list)))
@@ -0,0 +1,137 @@
+import os
+import json
+import zipfile
+import click
+import file_helpers
+
+# Lambda's own limit on a function's unzipped code.
+lambda_max_uncompressed_bytes = 250 * 1024 * 1024
+
+def get_top_level_name(entry_name):
+    return entry_name.split("/", 1)[0]
+
+# Only reads the central directory; nothing is decompressed.
+def get_package_size_report(zip_path, top_count = 10):
+    package_size_map = {}
+    file_size_list = []
+    
+    compressed_bytes = 0
+    uncompressed_bytes = 0
+    
+    with zipfile.ZipFile(zip_path) as zf:
+        for each_info in zf.infolist():
+            if each_info.filename.endswith("/"):
+                continue
+            
+            package_dict = package_size_map.setdefault(get_top_level_name(each_info.filename), {
+                "CompressedBytes": 0,
+                "UncompressedBytes": 0
+            })
+            
+            package_dict["CompressedBytes"] += each_info.compress_size
+            package_dict["UncompressedBytes"] += each_info.file_size
+            
+            compressed_bytes += each_info.compress_size
+            uncompressed_bytes += each_info.file_size
+            
+            file_size_list.append((each_info.file_size, each_info.filename))
+    
+    return {
+        "ZipBytes": os.path.getsize(zip_path),
+        "CompressedBytes": compressed_bytes,
+        "UncompressedBytes": uncompressed_bytes,
+        "Packages": package_size_map,
+        "LargestFiles": [
+            {"Name": x[1], "UncompressedBytes": x[0]} for x in sorted(file_size_list, reverse = True)[:top_count]
+        ]
+    }
+
+def format_bytes(byte_count):
+    if abs(byte_count) < 1024:
+        return "{} B".format(byte_count)
+    
+    for each_unit in ["KB", "MB", "GB"]:
+        byte_count /= 1024.0
+        
+        if abs(byte_count) < 1024 or each_unit == "GB":
+            return "{:.1f} {}".format(byte_count, each_unit)
+
+def format_change(new_byte_count, old_byte_count):
+    if old_byte_count is None:
+        return "new"
+    
+    if new_byte_count == old_byte_count:
+        return "unchanged"
+    
+    return "{}{}".format("+" if new_byte_count > old_byte_count else "-", format_bytes(abs(new_byte_count - old_byte_count)))
+
+def load_report(report_path):
+    try:
+        return json.loads(open(report_path).read())
+    except (IOError, ValueError):
+        return None
+
+def write_report(report_path, report):
+    file_helpers.write_file_if_changed(report_path, json.dumps(report, indent = 2, sort_keys = True).encode("utf-8"))
+
+# Only totals are shown for packages that didn't change.
+def print_report(function_name, report, previous_report, top_count = 10):
+    previous_report = previous_report or {}
+    
+    click.echo("Package size of {}: {} zipped ({}), {} unzipped ({}).".format(
+        function_name,
+        format_bytes(report["ZipBytes"]),
+        format_change(report["ZipBytes"], previous_report.get("ZipBytes")),
+        format_bytes(report["UncompressedBytes"]),
+        format_change(report["UncompressedBytes"], previous_report.get("UncompressedBytes"))
+    ))
+    
+    if report["ZipBytes"] == previous_report.get("ZipBytes") and report["UncompressedBytes"] == previous_report.get("UncompressedBytes"):
+        return
+    
+    previous_package_size_map = previous_report.get("Packages", {})
+    
+    sorted_package_names = sorted(
+        report["Packages"].keys(),
+        key = lambda x: report["Packages"][x]["CompressedBytes"],
+        reverse = True
+    )
+    
+    click.echo("  Largest packages (compressed / uncompressed, change):")
+    
+    for each_name in sorted_package_names[:top_count]:
+        each_package_dict = report["Packages"][each_name]
+        
+        click.echo("    {:>10} / {:>10}  {:>12}  {}".format(
+            format_bytes(each_package_dict["CompressedBytes"]),
+            format_bytes(each_package_dict["UncompressedBytes"]),
+            format_change(each_package_dict["CompressedBytes"], previous_package_size_map.get(each_name, {}).get("CompressedBytes")),
+            each_name
+        ))
+    
+    removed_package_names = sorted(set(previous_package_size_map.keys()) - set(report["Packages"].keys()))
+    
+    if len(removed_package_names) > 0:
+        click.echo("  Removed: {}".format(", ".join(removed_package_names)))
+    
+    click.echo("  Largest files (uncompressed):")
+    
+    for each_file_dict in report["LargestFiles"][:top_count]:
+        click.echo("    {:>10}  {}".format(format_bytes(each_file_dict["UncompressedBytes"]), each_file_dict["Name"]))
+
+def get_budget_violations(function_name, report, budget):
+    violation_list = []
+    
+    for budget_key, report_key, description in [
+        ("MaxZipBytes", "ZipBytes", "zipped"),
+        ("MaxUncompressedBytes", "UncompressedBytes", "unzipped")
+    ]:
+        if budget.get(budget_key) is not None and report[report_key] > budget[budget_key]:
+            violation_list.append("{} is {} {}, over its budget of {}".format(
+                function_name,
+                format_bytes(report[report_key]),
+                description,
+                format_bytes(budget[budget_key])
+            ))
+    
+    return violation_list
@@ -0,0 +1,208 @@
+import threading
+import concurrent.futures
+import click
+import aws_helpers
+import cloudformation_template_helpers
+
+from create_or_update_cloudformation_stack import CreateOrUpdateCloudFormationStackDeployStepAction
+
+default_max_parallel_stacks = 4
+
+# Consecutive stack steps share a batch; any other step gets its own.
+def get_deploy_step_batches(step_list):
+    batch_list = []
+    
+    for each_step in step_list:
+        is_stack_step = each_step.get("Action") == "CreateOrUpdateCloudFormationStack"
+        
+        if is_stack_step and len(batch_list) > 0 and batch_list[-1][0].get("Action") == "CreateOrUpdateCloudFormationStack":
+            batch_list[-1].append(each_step)
+        else:
+            batch_list.append([each_step])
+    
+    return batch_list
+
+# A stack waits for the stacks in its batch whose exports it imports. When one 
+# fails, stacks depending on it are skipped, but unrelated ones still finish.
+class ParallelStackDeployer(object):
+    
+    def __init__(self, full_config, step_config_list, region_name = None):
+        self.full_config = full_config
+        self.step_config_list = step_config_list
+        self.region_name = region_name
+        self.max_workers = full_config.get("MaxParallelStacks", default_max_parallel_stacks)
+        
+        self.stack_status_map = {}
+        self.stack_status_lock = threading.Lock()
+    
+    def create_action(self, step_config):
+        new_action_handler = CreateOrUpdateCloudFormationStackDeployStepAction(self.full_config, step_config)
+        new_action_handler.region_name = self.region_name
+        new_action_handler.status_listener = self.set_stack_status
+        
+        return new_action_handler
+    
+    # {action index: set of indices it waits for}. A stack whose imports can't 
+    # be resolved locally waits for every stack before it.
+    def get_dependency_map(self, action_list):
+        region_name = aws_helpers.get_client("cloudformation", self.region_name).meta.region_name
+        
+        export_list = []
+        import_list = []
+        
+        for each_action in action_list:
+            cf_template = cloudformation_template_helpers.load_template(each_action.template_path) or {}
+            
+            variables = cloudformation_template_helpers.get_parameter_defaults(cf_template)
+            variables.update(dict((k, str(v)) for k, v in each_action.stack_parameter_defaults.items()))
+            variables.update(each_action.get_parameter_update_values())
+            variables["AWS::StackName"] = each_action.stack_name
+            variables["AWS::Region"] = region_name
+            
+            export_list.append(cloudformation_template_helpers.get_export_names(cf_template, variables))
+            import_list.append(cloudformation_template_helpers.get_import_names(cf_template, variables))
+        
+        dependency_map = {}
+        
+        for each_index, each_action in enumerate(action_list):
+            import_names, has_unresolved_imports = import_list[each_index]
+            
+            dependency_set = set()
+            
+            for other_index, other_action in enumerate(action_list):
+                if other_index == each_index:
+                    continue
+                
+                export_names, has_unresolved_exports = export_list[other_index]
+                
+                if len(import_names & export_names) > 0:
+                    dependency_set.add(other_index)
+                
+                if other_index > each_index:
+                    continue
+                
+                if has_unresolved_imports:
+                    dependency_set.add(other_index)
+                elif has_unresolved_exports and len(import_names) > 0:
+                    dependency_set.add(other_index)
+                elif other_action.stack_name == each_action.stack_name:
+                    dependency_set.add(other_index)
+            
+            dependency_map[each_index] = dependency_set
+        
+        return dependency_map
+    
+    def set_stack_status(self, stack_name, stack_status):
+        with self.stack_status_lock:
+            if self.stack_status_map.get(stack_name) == stack_status:
+                return
+            
+            self.stack_status_map[stack_name] = stack_status
+            
+            self.print_stack_statuses()
+    
+    def print_stack_statuses(self):
+        click.echo(" > Stacks{}: {}".format(
+            "" if self.region_name is None else " ({})".format(self.region_name),
+            ", ".join("{} {}".format(x, self.stack_status_map[x]) for x in sorted(self.stack_status_map.keys()))
+        ))
+    
+    # Stacks that can never start.
+    def get_circular_indices(self, dependency_map):
+        ordered_indices = set()
+        
+        while True:
+            ready_indices = set(
+                x for x, y in dependency_map.items() if x not in ordered_indices and y <= ordered_indices
+            )
+            
+            if len(ready_indices) == 0:
+                break
+            
+            ordered_indices |= ready_indices
+        
+        return set(dependency_map.keys()) - ordered_indices
+    
+    def run(self):
+        
+        action_list = [self.create_action(x) for x in self.step_config_list]
+        
+        dependency_map = self.get_dependency_map(action_list)
+        
+        circular_indices = self.get_circular_indices(dependency_map)
+        
+        if len(circular_indices) > 0:
+            raise click.ClickException("Circular Fn::ImportValue dependencies between stacks: {}".format(
+                ", ".join(sorted(action_list[x].stack_name for x in circular_indices))
+            ))
+        
+        for each_index, each_action in enumerate(action_list):
+            if len(dependency_map[each_index]) > 0:
+                click.echo("Stack {} waits for: {}".format(
+                    each_action.stack_name,
+                    ", ".join(sorted(set(action_list[x].stack_name for x in dependency_map[each_index])))
+                ))
+            
+            self.stack_status_map[each_action.stack_name] = "WAITING"
+        
+        self.print_stack_statuses()
+        
+        pending_indices = set(range(len(action_list)))
+        completed_indices = set()
+        failed_index_error_map = {}
+        
+        with concurrent.futures.ThreadPoolExecutor(max_workers = max(1, self.max_workers)) as executor:
+            future_index_map = {}
+            
+            while True:
+                
+                # Skipping a stack can make others skippable, so repeat 
+                # until nothing changes.
+                has_changed = True
+                
+                while has_changed:
+                    has_changed = False
+                    
+                    for each_index in sorted(pending_indices):
+                        each_action = action_list[each_index]
+                        
+                        unfinished_dependency_set = dependency_map[each_index] - completed_indices
+                        
+                        if len(unfinished_dependency_set) == 0:
+                            pending_indices.remove(each_index)
+                            future_index_map[executor.submit(each_action.run)] = each_index
+                        
+                        elif len(unfinished_dependency_set - pending_indices - set(future_index_map.values())) > 0:
+                            # Something it depends on failed or was skipped.
+                            pending_indices.remove(each_index)
+                            self.set_stack_status(each_action.stack_name, "SKIPPED")
+                            has_changed = True
+                
+                if len(future_index_map) == 0:
+                    break
+                
+                done_future_set, _ = concurrent.futures.wait(
+                    list(future_index_map.keys()),
+                    return_when = concurrent.futures.FIRST_COMPLETED
+                )
+                
+                for each_future in done_future_set:
+                    each_index = future_index_map.pop(each_future)
+                    
+                    if each_future.exception() is not None:
+                        failed_index_error_map[each_index] = each_future.exception()
+                        self.set_stack_status(action_list[each_index].stack_name, "FAILED")
+                    else:
+                        completed_indices.add(each_index)
+                        self.set_stack_status(action_list[each_index].stack_name, "DONE")
+        
+        if len(failed_index_error_map) > 0:
+            for each_index in sorted(failed_index_error_map.keys()):
+                click.echo("Stack {} failed: {}".format(
+                    action_list[each_index].stack_name,
+                    failed_index_error_map[each_index]
+                ), err = True)
+            
+            raise click.ClickException("Deploy failed for stack(s): {}".format(", ".join(
+                action_list[x].stack_name for x in sorted(failed_index_error_map.keys())
+            )))
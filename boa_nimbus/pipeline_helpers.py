@@ -0,0 +1,81 @@
+import queue
+import threading
+
+# Marks the end of a stage's input.
+end_of_input = object()
+
+# stage_list is [(function, worker count), ...]; each function returns the 
+# item for the next stage, or None to drop it. Bounded queues hold about 
+# queue_size items per stage. An error escaping a stage stops the pipeline and 
+# is raised here.
+def run_pipeline(source_iterable, stage_list, queue_size = 1000):
+    queue_list = [queue.Queue(maxsize = queue_size) for x in stage_list]
+    
+    error_list = []
+    stop_event = threading.Event()
+    
+    def put_item(output_queue, item):
+        # Give up on a full queue once the pipeline is stopping.
+        while not stop_event.is_set():
+            try:
+                output_queue.put(item, timeout = 0.1)
+                return
+            except queue.Full:
+                continue
+    
+    def run_worker(stage_function, input_queue, output_queue):
+        while True:
+            item = input_queue.get()
+            
+            if item is end_of_input:
+                # Let the stage's other workers see it too.
+                input_queue.put(end_of_input)
+                return
+            
+            if stop_event.is_set():
+                continue
+            
+            try:
+                result = stage_function(item)
+            except Exception as e:
+                error_list.append(e)
+                stop_event.set()
+                continue
+            
+            if result is not None and output_queue is not None:
+                put_item(output_queue, result)
+    
+    stage_thread_lists = []
+    
+    for stage_index, (stage_function, worker_count) in enumerate(stage_list):
+        output_queue = queue_list[stage_index + 1] if stage_index + 1 < len(stage_list) else None
+        
+        thread_list = []
+        
+        for each_worker_index in range(max(1, worker_count)):
+            t = threading.Thread(
+                target = run_worker,
+                args = (stage_function, queue_list[stage_index], output_queue)
+            )
+            t.daemon = True
+            t.start()
+            thread_list.append(t)
+        
+        stage_thread_lists.append(thread_list)
+    
+    try:
+        for each_item in source_iterable:
+            if stop_event.is_set():
+                break
+            
+            put_item(queue_list[0], each_item)
+    finally:
+        # Shut the stages down in order, each once the one before is done.
+        for stage_index, thread_list in enumerate(stage_thread_lists):
+            queue_list[stage_index].put(end_of_input)
+            
+            for each_thread in thread_list:
+                each_thread.join()
+    
+    if len(error_list) > 0:
+        raise error_list[0]
@@ -0,0 +1,150 @@
+import threading
+import concurrent.futures
+import click
+from botocore.exceptions import ClientError
+import artifacts_manifest_helpers
+
+from create_bucket_if_not_exists import CreateBucketIfNotExistsDeployStepAction
+from upload_directory_contents_to_bucket import UploadDirectoryContentsToBucketDeployStepAction
+from update_lambda_function_sources import UpdateLambdaFunctionSourcesDeployStepAction
+
+# Only work the regular deploy would repeat as a no-op is done early, so 
+# running all deploy steps afterwards keeps their ordering guarantees.
+class PipelinedDeployer(object):
+    
+    def __init__(self, full_config, max_workers = 8):
+        self.full_config = full_config
+        self.max_workers = max_workers
+        
+        self.completed_step_indices = set()
+        self.upload_action_list = []
+        self.lambda_action_list = []
+        
+        self.future_list = []
+        self.future_list_lock = threading.Lock()
+        
+        self.upload_executor = None
+        self.lambda_executor = None
+    
+    def get_deploy_step_list(self):
+        step_list = []
+        
+        for each_group_dict in self.full_config.get("DeployStepGroups", []):
+            step_list.extend(each_group_dict.get("Steps", []))
+        
+        return step_list
+    
+    def start(self):
+        
+        click.echo("Starting pipelined deploy workers.")
+        
+        preceding_stack_names = set()
+        created_bucket_name_prefixes = set()
+        
+        for each_index, each_step in enumerate(self.get_deploy_step_list()):
+            step_action = each_step.get("Action", "")
+            
+            if step_action == "CreateBucketIfNotExists" and len(preceding_stack_names) == 0:
+                # Doesn't depend on anything built, and uploads need it.
+                CreateBucketIfNotExistsDeployStepAction(self.full_config, each_step).run()
+                self.completed_step_indices.add(each_index)
+                created_bucket_name_prefixes.add(each_step.get("BucketNamePrefix", ""))
+            
+            elif step_action == "CreateOrUpdateCloudFormationStack":
+                preceding_stack_names.add(each_step["StackName"])
+            
+            elif step_action == "UploadDirectoryContentsToBucket":
+                upload_action = UploadDirectoryContentsToBucketDeployStepAction(self.full_config, each_step)
+                
+                # Buckets looked up from a stack may not exist until it's deployed.
+                if upload_action.stack_name in preceding_stack_names:
+                    continue
+                
+                # Nor may named buckets until their (not yet run) step creates them.
+                if upload_action.bucket_name_prefix is not None and upload_action.bucket_name_prefix not in created_bucket_name_prefixes:
+                    continue
+                
+                self.upload_action_list.append((upload_action, upload_action.get_bucket_name()))
+            
+            elif step_action == "UpdateLambdaFunctionSources":
+                
+                # The stack must be deployed before its functions are updated.
+                if each_step["StackName"] in preceding_stack_names:
+                    continue
+                
+                lambda_action = UpdateLambdaFunctionSourcesDeployStepAction(self.full_config, each_step)
+                
+                try:
+                    function_update_list = lambda_action.get_function_update_list()
+                except ClientError as e:
+                    click.echo("Not updating functions of {} early: {}".format(each_step["StackName"], e), err = True)
+                    continue
+                
+                function_code_sha256_map = lambda_action.get_function_code_sha256_map()
+                
+                package_function_map = {}
+                
+                for each_function_update in function_update_list:
+                    each_function_update["function_sha256_base64"] = function_code_sha256_map.get(each_function_update["physical_resource_id"])
+                    
+                    package_key = artifacts_manifest_helpers.get_manifest_key(
+                        lambda_action.get_local_package_path(each_function_update["s3_key"])
+                    )
+                    package_function_map.setdefault(package_key, []).append(each_function_update)
+                
+                self.lambda_action_list.append((lambda_action, package_function_map))
+        
+        self.upload_executor = concurrent.futures.ThreadPoolExecutor(max_workers = self.max_workers)
+        self.lambda_executor = concurrent.futures.ThreadPoolExecutor(max_workers = self.max_workers)
+        
+        artifacts_manifest_helpers.artifact_listeners.append(self.submit_artifact)
+    
+    def add_future(self, future):
+        with self.future_list_lock:
+            self.future_list.append(future)
+    
+    def submit_artifact(self, artifact_dict):
+        self.add_future(self.upload_executor.submit(self.upload_artifact, artifact_dict))
+    
+    def upload_artifact(self, artifact_dict):
+        uploaded_to_bucket_names = set()
+        
+        for each_upload_action, each_bucket_name in self.upload_action_list:
+            each_s3_key = each_upload_action.get_s3_key_for_file(artifact_dict["Path"])
+            
+            if each_s3_key is None:
+                continue
+            
+            each_upload_action.upload_file_if_necessary(each_bucket_name, artifact_dict["Path"], each_s3_key)
+            uploaded_to_bucket_names.add(each_bucket_name)
+        
+        for each_lambda_action, each_package_function_map in self.lambda_action_list:
+            for each_function_update in each_package_function_map.get(artifact_dict["Path"], []):
+                
+                # Only update from packages this pipeline just uploaded.
+                if each_function_update["bucket_name"] not in uploaded_to_bucket_names:
+                    continue
+                
+                self.add_future(self.lambda_executor.submit(
+                    each_lambda_action.update_function_code_if_necessary,
+                    s3_object_etag = artifact_dict["Md5"],
+                    **each_function_update
+                ))
+    
+    # With raise_errors off (e.g. the build already failed), errors are only 
+    # reported, so they don't replace the one being handled.
+    def finish(self, raise_errors = True):
+        if self.submit_artifact in artifacts_manifest_helpers.artifact_listeners:
+            artifacts_manifest_helpers.artifact_listeners.remove(self.submit_artifact)
+        
+        # Uploads can add Lambda updates while they run, so drain the upload 
+        # pool before the update pool.
+        for each_executor in [self.upload_executor, self.lambda_executor]:
+            if each_executor is not None:
+                each_executor.shutdown(wait = True)
+        
+        for each_future in self.future_list:
+            if raise_errors:
+                each_future.result()
+            elif each_future.exception() is not None:
+                click.echo("Pipelined deploy error: {}".format(each_future.exception()), err = True)
@@ -3,6 +3,7 @@ import json
 import click
 import yaml
 import boto3
+import file_helpers
 
 class PreprocessSwaggerInputBuildStepAction(object):
     
@@ -33,8 +34,16 @@ class PreprocessSwaggerInputBuildStepAction(object):
         tasks_performed_list = []
     
         if "x-boa-cors-enable" in input_template:
+            cors_transformer = SwaggerCorsTransformer(input_template, aws_region, aws_account_id)
+            
             for each_path in input_template.get("paths", {}).keys():
-                self.enable_cors_for_path_by_default(input_template, tasks_performed_list, each_path, aws_region, aws_account_id)
+                cors_transformer.enable_cors_for_path(each_path)
+                
+                tasks_performed_list.append(
+                    "Enabled CORS for {}".format(
+                        each_path
+                    )
+                )
     
         self.clear_root_custom_properties(input_template)
     
@@ -45,243 +54,347 @@ class PreprocessSwaggerInputBuildStepAction(object):
             for each_task in tasks_performed_list:
                 click.echo(" * {}".format(each_task))
                 
-        click.echo("Writing output Swagger file: {}.".format(self.output_file))
-        yaml.dump(input_template, open(self.output_file, "w"))
-    
-    def enable_cors_for_path_by_default(self, input_template, tasks_performed_list, each_path, aws_region, aws_account_id):
-    
-        lambda_direct_default_error_regex_format = input_template.get("x-boa-lambda-default-error-regex-format")
-        lambda_direct_default_error_response_template = input_template.get("x-boa-lambda-default-error-response-template")
-    
-        lambda_direct_catchall_error_status_code = input_template.get("x-boa-lambda-catchall-error-status-code")
-        lambda_direct_catchall_error_description = input_template.get("x-boa-lambda-catchall-error-description", "Error")
-        lambda_direct_catchall_error_regex_format = input_template.get("x-boa-lambda-catchall-error-regex-format")
-        lambda_direct_catchall_error_response_template = input_template.get("x-boa-lambda-catchall-error-response-template")
+        output_bytes = canonical_yaml_dump(input_template).encode("utf-8")
+        
+        if file_helpers.write_file_if_changed(self.output_file, output_bytes):
+            click.echo("Wrote output Swagger file: {}.".format(self.output_file))
+        else:
+            click.echo("Output Swagger file unchanged: {}.".format(self.output_file))
     
-        methods_list = list(input_template["paths"][each_path].keys())
+    def clear_root_custom_properties(self, input_template):
+        for each_key in list(input_template.keys()):
+            if each_key.startswith("x-boa-"):
+                del input_template[each_key]
+
+
+# Same bytes for the same data, whatever the dict order or shared references.
+class CanonicalYamlDumper(yaml.SafeDumper):
     
-        cors_methods_list = []
+    def ignore_aliases(self, data):
+        return True
     
-        if 'options' in methods_list:
-            print('Skipping adding CORS for method(s) of {} due to existing OPTIONS method.'.format(
-                each_path
-            ))
+    def represent_dict(self, data):
+        return self.represent_mapping(
+            "tag:yaml.org,2002:map",
+            sorted(data.items(), key = lambda x: (str(x[0]), type(x[0]).__name__))
+        )
+
+CanonicalYamlDumper.add_representer(dict, CanonicalYamlDumper.represent_dict)
+
+def canonical_yaml_dump(data):
+    return yaml.dump(
+        data,
+        Dumper = CanonicalYamlDumper,
+        default_flow_style = False,
+        allow_unicode = True,
+        width = float("inf")
+    )
+
+
+# Settings from the template's root are computed once, so each path only pays 
+# for its own methods.
+class SwaggerCorsTransformer(object):
     
-        response_mapping_headers = ["Access-Control-Allow-Origin", "Access-Control-Allow-Headers", "Access-Control-Allow-Methods"]
+    cors_allow_origin_string = "stageVariables.CorsOrigins"
     
+    def __init__(self, input_template, aws_region, aws_account_id):
+        self.input_template = input_template
+        self.aws_region = aws_region
+        self.aws_account_id = aws_account_id
+        
+        self.default_error_regex_format = input_template.get("x-boa-lambda-default-error-regex-format")
+        self.default_error_response_template = input_template.get("x-boa-lambda-default-error-response-template")
+        
+        self.catchall_error_status_code = input_template.get("x-boa-lambda-catchall-error-status-code")
+        self.catchall_error_description = input_template.get("x-boa-lambda-catchall-error-description", "Error")
+        self.catchall_error_regex_format = input_template.get("x-boa-lambda-catchall-error-regex-format")
+        self.catchall_error_response_template = input_template.get("x-boa-lambda-catchall-error-response-template")
+        
+        self.response_mapping_headers = ["Access-Control-Allow-Origin", "Access-Control-Allow-Headers", "Access-Control-Allow-Methods"]
+        self.max_age_value = None
+        
         if "x-boa-cors-max-age" in input_template:
-            response_mapping_headers.append("Access-Control-Max-Age")
-    
-        cors_headers_list = []
+            self.response_mapping_headers.append("Access-Control-Max-Age")
+            self.max_age_value = "'{}'".format(input_template["x-boa-cors-max-age"])
+        
+        self.base_cors_headers_list = []
         if "x-boa-cors-headers" in input_template:
-            cors_headers_list.extend(input_template["x-boa-cors-headers"].split(","))
+            self.base_cors_headers_list.extend(input_template["x-boa-cors-headers"].split(","))
+        
+        self.mock_request_template = json.dumps({"statusCode": 200})
+        
+        # Filled lazily so that unused, incomplete definitions don't raise.
+        self.security_headers_map = {}
     
-        for each_method in methods_list:
-            cors_methods_list.append(each_method.upper())
+    def get_security_definition_headers(self, security_name):
+        headers_list = self.security_headers_map.get(security_name)
         
-            for each_security_dict in input_template["paths"][each_path][each_method].get("security", []):
-                first_key_name = list(each_security_dict.keys())[0]
+        if headers_list is None:
+            each_definition = self.input_template["securityDefinitions"][security_name]
             
-                each_definition = input_template["securityDefinitions"][first_key_name]
-                if each_definition.get("type") == "apiKey":
-                    if each_definition["name"] not in cors_headers_list:
-                        cors_headers_list.append(each_definition["name"])
+            headers_list = []
             
-                if each_definition.get("x-amazon-apigateway-authtype") == "awsSigv4":
-                    headers_to_add = ["x-amz-date", "x-amz-security-token"]
-                    for each_header in headers_to_add:
-                        if each_header not in cors_headers_list:
-                            cors_headers_list.append(each_header)
+            if each_definition.get("type") == "apiKey":
+                headers_list.append(each_definition["name"])
             
+            if each_definition.get("x-amazon-apigateway-authtype") == "awsSigv4":
+                headers_list.extend(["x-amz-date", "x-amz-security-token"])
             
+            self.security_headers_map[security_name] = headers_list
+        
+        return headers_list
     
+    def enable_cors_for_path(self, each_path):
+        
+        path_def = self.input_template["paths"][each_path]
+        
+        methods_list = list(path_def.keys())
+
+        cors_methods_list = []
+        cors_headers_list = list(self.base_cors_headers_list)
+        cors_headers_set = set(cors_headers_list)
+        
+        if "options" in methods_list:
+            click.echo("Skipping adding CORS for method(s) of {} due to existing OPTIONS method.".format(
+                each_path
+            ))
+        
+        for each_method in methods_list:
+            cors_methods_list.append(each_method.upper())
+            
+            for each_security_dict in path_def[each_method].get("security", []):
+                first_key_name = list(each_security_dict.keys())[0]
+                
+                for each_header in self.get_security_definition_headers(first_key_name):
+                    if each_header not in cors_headers_set:
+                        cors_headers_set.add(each_header)
+                        cors_headers_list.append(each_header)
+        
         if "OPTIONS" not in cors_methods_list:
             cors_methods_list.append("OPTIONS")
-    
-        cors_allow_origin_string = "stageVariables.CorsOrigins"
-    
-        for each_method in methods_list:
-            each_method_def = input_template["paths"][each_path][each_method]
-            responses_dict = each_method_def.get("responses", {})
         
-            if "responses" not in each_method_def:
-                each_method_def["responses"] = responses_dict
+        allow_methods_value = "'{}'".format(
+            ",".join(cors_methods_list).upper()
+        )
+        allow_headers_value = "'{}'".format(
+            ",".join(cors_headers_list)
+        )
         
-            response_keys = list(responses_dict.keys())
+        for each_method in methods_list:
+            self.enable_cors_for_method(path_def[each_method], allow_methods_value, allow_headers_value)
         
-            add_cors_response_headers = False
+        path_def["options"] = self.build_options_method_def(allow_methods_value, allow_headers_value)
+    
+    def enable_cors_for_method(self, each_method_def, allow_methods_value, allow_headers_value):
         
-            static_body_mapping = each_method_def.get("x-boa-static-body-mapping")
-            lambda_resource_name = each_method_def.get("x-boa-lambda-resource-name")
-            lambda_integration_type = each_method_def.get("x-boa-lambda-integration-type", "proxy")
+        responses_dict = each_method_def.get("responses", {})
         
+        if "responses" not in each_method_def:
+            each_method_def["responses"] = responses_dict
         
-            default_integration_type_string = "aws_proxy"
-            if lambda_integration_type == "direct":
-                default_integration_type_string = "aws"
+        static_body_mapping = each_method_def.get("x-boa-static-body-mapping")
+        lambda_resource_name = each_method_def.get("x-boa-lambda-resource-name")
+        lambda_integration_type = each_method_def.get("x-boa-lambda-integration-type", "proxy")
         
-            add_cors_response_headers = True
+        is_direct_integration = lambda_integration_type == "direct"
         
-            if lambda_integration_type == "direct" and str(lambda_direct_catchall_error_status_code) not in responses_dict:
-                responses_dict[str(lambda_direct_catchall_error_status_code)] = {
-                    "description": lambda_direct_catchall_error_description
-                }
+        default_integration_type_string = "aws_proxy"
+        if is_direct_integration:
+            default_integration_type_string = "aws"
         
-            for each_response_key in list(responses_dict.keys()):
-                each_response_headers = responses_dict.get("headers", {})
-            
-                if add_cors_response_headers:
-                    for each_cors_header in response_mapping_headers:
-                        each_response_headers[each_cors_header] = {
-                            "type": "string"
-                        }
-            
-                    each_response_headers["Content-Type"] = {
-                        "type": "string"
-                    }
-            
-                each_method_def["responses"][each_response_key]["headers"] = each_response_headers
+        if is_direct_integration and str(self.catchall_error_status_code) not in responses_dict:
+            responses_dict[str(self.catchall_error_status_code)] = {
+                "description": self.catchall_error_description
+            }
         
-            apig_integration_def = each_method_def.get("x-amazon-apigateway-integration", {})
+        # Existing integration responses are only reused if the method 
+        # already had an integration defined.
+        had_integration_def = "x-amazon-apigateway-integration" in each_method_def
         
-            apig_integration_def["responses"] = apig_integration_def.get("responses", {})
+        apig_integration_def = each_method_def.get("x-amazon-apigateway-integration", {})
         
-            apig_responses_def = apig_integration_def["responses"]
+        apig_integration_def["responses"] = apig_integration_def.get("responses", {})
         
+        apig_responses_def = apig_integration_def["responses"]
         
+        if static_body_mapping is not None:
+            apig_integration_def["type"] = "mock"
+            apig_integration_def["passthroughBehavior"] = "WHEN_NO_MATCH"
+            apig_integration_def["requestTemplates"] = {
+                "application/json": self.mock_request_template
+            }
         
-            if static_body_mapping is not None:
-                apig_integration_def["type"] = "mock"
-                apig_integration_def["passthroughBehavior"] = "WHEN_NO_MATCH"
-                apig_integration_def["requestTemplates"] = {
-                    "application/json": json.dumps({"statusCode": 200})
-                }
+        elif lambda_resource_name is not None:
+            apig_integration_def["type"] = apig_integration_def.get("type", default_integration_type_string)
+            apig_integration_def["passthroughBehavior"] = apig_integration_def.get("passthroughBehavior", "WHEN_NO_MATCH")
+            apig_integration_def["httpMethod"] = apig_integration_def.get("httpMethod", "POST")
             
-            elif lambda_resource_name is not None:
-                apig_integration_def["type"] = apig_integration_def.get("type", default_integration_type_string)
-                apig_integration_def["passthroughBehavior"] = apig_integration_def.get("passthroughBehavior", "WHEN_NO_MATCH")
-                apig_integration_def["httpMethod"] = apig_integration_def.get("httpMethod", "POST")
-            
-                default_new_uri = "arn:aws:apigateway:{aws_region}:lambda:path/2015-03-31/functions/arn:aws:lambda:{aws_region}:{aws_account_id}:function:{function_name}/invocations".format(
-                    aws_account_id = aws_account_id,
-                    aws_region = aws_region,
+            if "uri" not in apig_integration_def:
+                apig_integration_def["uri"] = "arn:aws:apigateway:{aws_region}:lambda:path/2015-03-31/functions/arn:aws:lambda:{aws_region}:{aws_account_id}:function:{function_name}/invocations".format(
+                    aws_account_id = self.aws_account_id,
+                    aws_region = self.aws_region,
                     function_name = "${stageVariables.%s}" % lambda_resource_name
                 )
-                apig_integration_def["uri"] = apig_integration_def.get("uri", default_new_uri)
             
-                if lambda_integration_type == "direct":
-                    apig_request_templates = apig_integration_def.get("requestTemplates", {})
+            if is_direct_integration:
+                apig_request_templates = apig_integration_def.get("requestTemplates", {})
                 
-                    apig_request_templates["application/json"] = apig_request_templates.get("application/json", default_lambda_integration_body_mapping_template)
-                    apig_integration_def["requestTemplates"] = apig_request_templates
+                apig_request_templates["application/json"] = apig_request_templates.get("application/json", default_lambda_integration_body_mapping_template)
+                apig_integration_def["requestTemplates"] = apig_request_templates
         
-            responses_already_specified = len(apig_integration_def["responses"]) > 0
+        responses_already_specified = len(apig_responses_def) > 0
         
-            if lambda_integration_type == "direct":
-                catchall_error_response = apig_responses_def.get(lambda_direct_catchall_error_regex_format, {})
+        if is_direct_integration:
+            catchall_error_response = apig_responses_def.get(self.catchall_error_regex_format, {})
             
-                catchall_error_response["statusCode"] = lambda_direct_catchall_error_status_code
-                response_templates_map = catchall_error_response.get("responseTemplates", {})
+            catchall_error_response["statusCode"] = self.catchall_error_status_code
+            response_templates_map = catchall_error_response.get("responseTemplates", {})
             
-                response_templates_map["application/json"] = response_templates_map.get("application/json", lambda_direct_catchall_error_response_template)
+            response_templates_map["application/json"] = response_templates_map.get("application/json", self.catchall_error_response_template)
             
-                catchall_error_response["responseTemplates"] = response_templates_map
-                apig_responses_def[lambda_direct_catchall_error_regex_format] = catchall_error_response
+            catchall_error_response["responseTemplates"] = response_templates_map
+            apig_responses_def[self.catchall_error_regex_format] = catchall_error_response
         
-            response_keys = list(responses_dict.keys())
-            
-            produces_list = each_method_def.get("produces", [])
+        # Maps each status code to the first integration response using it.
+        status_code_key_map = None
+        if responses_already_specified:
+            status_code_key_map = self.build_status_code_key_map(apig_responses_def)
+        
+        produces_list = each_method_def.get("produces", [])
+        
+        default_content_type_plain = "application/json"
+        
+        if len(produces_list) == 1:
+            default_content_type_plain = produces_list[0]
         
-            for each_response_key in response_keys:
+        default_content_type_value = "'{}'".format(
+            default_content_type_plain
+        )
+        
+        for each_response_key in list(responses_dict.keys()):
             
-                apig_integration_response_key = ""
-                if str(each_response_key) == "200":
-                    apig_integration_response_key = "default"
-                else:
-                    apig_integration_response_key = str(each_response_key)
+            each_response_headers = responses_dict.get("headers", {})
             
-                if responses_already_specified:
-                    for each_key in list(apig_integration_def["responses"].keys()):
-                        each_existing_response = apig_integration_def["responses"][each_key]
-                    
-                        if str(each_existing_response.get("statusCode")) == str(apig_integration_response_key):
-                            apig_integration_response_key = each_key
-                            break
+            for each_cors_header in self.response_mapping_headers:
+                each_response_headers[each_cors_header] = {
+                    "type": "string"
+                }
             
-                if lambda_integration_type == "direct" and lambda_direct_default_error_regex_format is not None:
-                    if apig_integration_response_key not in list(apig_integration_def["responses"].keys()):
-                        apig_integration_response_key = lambda_direct_default_error_regex_format.format(
-                            error_code = apig_integration_response_key
-                        )
+            each_response_headers["Content-Type"] = {
+                "type": "string"
+            }
             
+            responses_dict[each_response_key]["headers"] = each_response_headers
             
+            apig_integration_response_key = ""
+            if str(each_response_key) == "200":
+                apig_integration_response_key = "default"
+            else:
+                apig_integration_response_key = str(each_response_key)
             
-                each_response_dict = each_method_def.get("x-amazon-apigateway-integration", {}).get("responses", {}).get(apig_integration_response_key, {})
+            if status_code_key_map is not None:
+                apig_integration_response_key = status_code_key_map.get(apig_integration_response_key, apig_integration_response_key)
             
-                each_response_dict["statusCode"] = each_response_key
+            if is_direct_integration and self.default_error_regex_format is not None:
+                if apig_integration_response_key not in apig_responses_def:
+                    apig_integration_response_key = self.default_error_regex_format.format(
+                        error_code = apig_integration_response_key
+                    )
             
-                response_templates_map = each_response_dict.get("responseTemplates", {})
+            previous_response_dict = apig_responses_def.get(apig_integration_response_key)
+            previous_status_code = None
             
-                if static_body_mapping is not None and apig_integration_response_key == "default":
-                    response_templates_map["application/json"] = response_templates_map.get("application/json", static_body_mapping)
+            if previous_response_dict is not None:
+                previous_status_code = str(previous_response_dict.get("statusCode"))
             
-                elif lambda_integration_type == "direct" and apig_integration_response_key != "default":
-                    if lambda_direct_default_error_response_template is not None:
-                        response_templates_map["application/json"] = response_templates_map.get("application/json", lambda_direct_default_error_response_template)
+            each_response_dict = {}
+            if had_integration_def and previous_response_dict is not None:
+                each_response_dict = previous_response_dict
             
-                each_response_dict["responseTemplates"] = response_templates_map
+            each_response_dict["statusCode"] = each_response_key
             
-                response_parameters = each_response_dict.get("responseParameters", {})
+            response_templates_map = each_response_dict.get("responseTemplates", {})
             
-                if add_cors_response_headers:
-                    response_parameters["method.response.header.Access-Control-Allow-Methods"] = "'{}'".format(
-                        ",".join(cors_methods_list).upper()
-                    )
-                    response_parameters["method.response.header.Access-Control-Allow-Headers"] = "'{}'".format(
-                        ",".join(cors_headers_list)
-                    )
-                    response_parameters["method.response.header.Access-Control-Allow-Origin"] = cors_allow_origin_string
-                    
-                    default_content_type_plain = "application/json"
-                    
-                    if len(produces_list) == 1:
-                        default_content_type_plain = produces_list[0]
-                    
-                    default_content_type_value = "'{}'".format(
-                        default_content_type_plain
-                    )
-                    
-                    response_parameters["method.response.header.Content-Type"] = response_parameters.get("method.response.header.Content-Type", default_content_type_value)
-                
-                    if "x-boa-cors-max-age" in input_template:
-                        response_parameters["method.response.header.Access-Control-Max-Age"] = "'{}'".format(
-                            input_template["x-boa-cors-max-age"]
-                        )
-                
-                    for each_cors_header in response_mapping_headers:
-                        each_method_def["responses"][each_response_key]["headers"][each_cors_header] = {
-                            "type": "string"
-                        }
+            if static_body_mapping is not None and apig_integration_response_key == "default":
+                response_templates_map["application/json"] = response_templates_map.get("application/json", static_body_mapping)
+            
+            elif is_direct_integration and apig_integration_response_key != "default":
+                if self.default_error_response_template is not None:
+                    response_templates_map["application/json"] = response_templates_map.get("application/json", self.default_error_response_template)
             
-                each_response_dict["responseParameters"] = response_parameters
+            each_response_dict["responseTemplates"] = response_templates_map
+            
+            response_parameters = each_response_dict.get("responseParameters", {})
+            
+            response_parameters["method.response.header.Access-Control-Allow-Methods"] = allow_methods_value
+            response_parameters["method.response.header.Access-Control-Allow-Headers"] = allow_headers_value
+            response_parameters["method.response.header.Access-Control-Allow-Origin"] = self.cors_allow_origin_string
+            
+            response_parameters["method.response.header.Content-Type"] = response_parameters.get("method.response.header.Content-Type", default_content_type_value)
+            
+            if self.max_age_value is not None:
+                response_parameters["method.response.header.Access-Control-Max-Age"] = self.max_age_value
+            
+            each_response_dict["responseParameters"] = response_parameters
+            
+            apig_responses_def[apig_integration_response_key] = each_response_dict
+            
+            if status_code_key_map is not None:
+                new_status_code = str(each_response_key)
                 
-                apig_responses_def[apig_integration_response_key] = each_response_dict
+                if previous_response_dict is None:
+                    status_code_key_map.setdefault(new_status_code, apig_integration_response_key)
+                elif previous_status_code != new_status_code:
+                    # An existing response changed status code, so earlier 
+                    # lookups may now resolve differently.
+                    status_code_key_map = self.build_status_code_key_map(apig_responses_def)
+        
+        each_method_def["x-amazon-apigateway-integration"] = apig_integration_def
         
-            each_method_def["x-amazon-apigateway-integration"] = apig_integration_def
+        # Clear custom keys from output.
+        for each_key in ["x-boa-static-body-mapping", "x-boa-lambda-resource-name"]:
+            if each_key in each_method_def:
+                del each_method_def[each_key]
+    
+    def build_status_code_key_map(self, apig_responses_def):
+        status_code_key_map = {}
+        
+        for each_key, each_existing_response in apig_responses_def.items():
+            status_code_key_map.setdefault(str(each_existing_response.get("statusCode")), each_key)
         
-            # Clear custom keys from output.
-            for each_key in ["x-boa-static-body-mapping", "x-boa-lambda-resource-name"]:
-                if each_key in each_method_def:
-                    del each_method_def[each_key]
+        return status_code_key_map
     
-        options_method_def = {
+    def build_options_method_def(self, allow_methods_value, allow_headers_value):
+        
+        options_headers = {}
+        
+        for each_cors_header in self.response_mapping_headers:
+            options_headers[each_cors_header] = {
+                "type": "string"
+            }
+        
+        options_headers["Content-Type"] = {
+            "type": "string"
+        }
+        
+        response_parameters = {
+            "method.response.header.Access-Control-Allow-Methods": allow_methods_value,
+            "method.response.header.Access-Control-Allow-Headers": allow_headers_value,
+            "method.response.header.Access-Control-Allow-Origin": self.cors_allow_origin_string,
+            "method.response.header.Content-Type": "'application/json'"
+        }
+        
+        if self.max_age_value is not None:
+            response_parameters["method.response.header.Access-Control-Max-Age"] = self.max_age_value
+        
+        return {
             "produces": [
                 "application/json"
             ],
             "responses": {
                 "200": {
                     "description": "200 response",
-                    "headers": {},
+                    "headers": options_headers,
                     "schema": {
                         "$ref": "#/definitions/Empty"
                     }
@@ -291,59 +404,16 @@ class PreprocessSwaggerInputBuildStepAction(object):
                 "responses": {
                     "default": {
                         "statusCode": "200",
-                        "responseParameters": {}
+                        "responseParameters": response_parameters
                     }
                 },
                 "requestTemplates": {
-                    "application/json": json.dumps({"statusCode": 200})
+                    "application/json": self.mock_request_template
                 },
                 "passthroughBehavior": "WHEN_NO_MATCH",
                 "type": "mock"
             }
         }
-    
-        for each_cors_header in response_mapping_headers:
-            options_method_def["responses"]["200"]["headers"][each_cors_header] = {
-                "type": "string"
-            }
-    
-        options_method_def["responses"]["200"]["headers"]["Content-Type"] = {
-            "type": "string"
-        }
-    
-        response_parameters = options_method_def["x-amazon-apigateway-integration"]["responses"]["default"]["responseParameters"]
-    
-        response_parameters["method.response.header.Access-Control-Allow-Methods"] = "'{}'".format(
-            ",".join(cors_methods_list).upper()
-        )
-        response_parameters["method.response.header.Access-Control-Allow-Headers"] = "'{}'".format(
-            ",".join(cors_headers_list)
-        )
-        response_parameters["method.response.header.Access-Control-Allow-Origin"] = cors_allow_origin_string
-        response_parameters["method.response.header.Content-Type"] = "'{}'".format(
-            "application/json"
-        )
-    
-        if "x-boa-cors-max-age" in input_template:
-            response_parameters["method.response.header.Access-Control-Max-Age"] = "'{}'".format(
-                input_template["x-boa-cors-max-age"]
-            )
-    
-    
-        input_template["paths"][each_path]["options"] = options_method_def
-    
-        tasks_performed_list.append(
-            "Enabled CORS for {}".format(
-                each_path
-            )
-        )
-    
-    def clear_root_custom_properties(self, input_template):
-        for each_key in list(input_template.keys()):
-            if each_key.startswith("x-boa-"):
-                del input_template[each_key]
-        
-
 
 default_lambda_integration_body_mapping_template = """#set($allParams = $input.params())
 {
@@ -0,0 +1,212 @@
+import os
+import zlib
+import uuid
+import shutil
+import zipfile
+import tempfile
+import click
+import boto3
+from botocore.exceptions import ClientError
+import zip_helpers
+import local_cache_helpers
+
+# Bump when the layout of cached artifacts changes.
+remote_cache_key_version = "v1"
+
+remote_cache_backend = None
+remote_cache_push_enabled = True
+
+class DirectoryRemoteCacheBackend(object):
+    
+    def __init__(self, cache_config):
+        self.path = cache_config["Path"]
+        
+        os.makedirs(self.path, exist_ok = True)
+    
+    def describe(self):
+        return self.path
+    
+    def fetch_file(self, key, destination_path):
+        cached_file_path = os.path.join(self.path, key)
+        
+        if not os.path.isfile(cached_file_path):
+            local_cache_helpers.record_access(self.path, hit = False)
+            return False
+        
+        temp_path = "{}.{}.tmp".format(destination_path, uuid.uuid4())
+        
+        try:
+            shutil.copyfile(cached_file_path, temp_path)
+            os.replace(temp_path, destination_path)
+        except FileNotFoundError:
+            # Evicted since it was checked for.
+            local_cache_helpers.record_access(self.path, hit = False)
+            return False
+        except:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+            raise
+        
+        local_cache_helpers.record_access(self.path, cached_file_path)
+        
+        return True
+    
+    def discard_file(self, key):
+        local_cache_helpers.record_unusable_hit(self.path)
+        
+        try:
+            os.unlink(os.path.join(self.path, key))
+        except OSError:
+            pass
+    
+    def push_file(self, key, source_path):
+        cached_file_path = os.path.join(self.path, key)
+        
+        os.makedirs(os.path.dirname(cached_file_path), exist_ok = True)
+        
+        # Other runners may be reading the same directory, so only ever 
+        # swap complete files into place.
+        temp_path = "{}.{}.tmp".format(cached_file_path, uuid.uuid4())
+        
+        try:
+            shutil.copyfile(source_path, temp_path)
+            os.replace(temp_path, cached_file_path)
+        except:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+            raise
+
+class S3RemoteCacheBackend(object):
+    
+    def __init__(self, cache_config):
+        self.bucket_name = cache_config["Bucket"]
+        self.key_prefix = cache_config.get("Prefix", "boa-nimbus-cache/")
+        
+        client_kwargs = {}
+        
+        if cache_config.get("EndpointUrl") is not None:
+            client_kwargs["endpoint_url"] = cache_config["EndpointUrl"]
+        
+        if cache_config.get("Region") is not None:
+            client_kwargs["region_name"] = cache_config["Region"]
+        
+        self.s3_client = boto3.client("s3", **client_kwargs)
+    
+    def describe(self):
+        return "s3://{}/{}".format(self.bucket_name, self.key_prefix)
+    
+    def fetch_file(self, key, destination_path):
+        temp_path = "{}.{}.tmp".format(destination_path, uuid.uuid4())
+        
+        try:
+            self.s3_client.download_file(self.bucket_name, self.key_prefix + key, temp_path)
+            os.replace(temp_path, destination_path)
+        except ClientError as e:
+            if e.response['Error']['Code'] in ['404', 'NoSuchKey']:
+                return False
+            raise
+        finally:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+        
+        return True
+    
+    def push_file(self, key, source_path):
+        self.s3_client.upload_file(source_path, self.bucket_name, self.key_prefix + key)
+    
+    def discard_file(self, key):
+        # Replaced when the rebuilt output is pushed.
+        pass
+
+remote_cache_backend_classes = {
+    "Directory": DirectoryRemoteCacheBackend,
+    "S3": S3RemoteCacheBackend
+}
+
+def configure_remote_cache(cache_config):
+    global remote_cache_backend
+    global remote_cache_push_enabled
+    
+    backend_type = cache_config.get("Type", "Directory")
+    
+    if backend_type not in remote_cache_backend_classes:
+        raise click.ClickException("Unsupported \"RemoteBuildCache\" type: {}".format(backend_type))
+    
+    remote_cache_backend = remote_cache_backend_classes[backend_type](cache_config)
+    remote_cache_push_enabled = cache_config.get("Push", True)
+    
+    click.echo("Using remote build cache: {}".format(remote_cache_backend.describe()))
+
+def get_remote_cache_key(category, content_hash, file_name):
+    return "/".join([remote_cache_key_version, category, content_hash, file_name])
+
+# The remote cache never fails a build; if it can't be reached, that's a miss.
+def fetch_file(key, destination_path):
+    if remote_cache_backend is None:
+        return False
+    
+    try:
+        return remote_cache_backend.fetch_file(key, destination_path)
+    except Exception as e:
+        click.echo("Unable to fetch {} from remote build cache: {}".format(key, e), err = True)
+        return False
+
+def push_file(key, source_path):
+    if remote_cache_backend is None or not remote_cache_push_enabled:
+        return
+    
+    try:
+        remote_cache_backend.push_file(key, source_path)
+    except Exception as e:
+        click.echo("Unable to push {} to remote build cache: {}".format(key, e), err = True)
+
+# A corrupt archive is discarded and counted as a miss.
+def fetch_directory(key, destination_dir):
+    if remote_cache_backend is None:
+        return False
+    
+    temp_dir = tempfile.mkdtemp()
+    
+    try:
+        archive_path = os.path.join(temp_dir, "archive.zip")
+        
+        if not fetch_file(key, archive_path):
+            return False
+        
+        try:
+            # Check every entry first, so a bad archive leaves nothing 
+            # half-extracted behind.
+            with zipfile.ZipFile(archive_path) as zf:
+                bad_entry_name = zf.testzip()
+            
+            if bad_entry_name is not None:
+                raise zipfile.BadZipFile("Bad CRC for {}".format(bad_entry_name))
+            
+            zip_helpers.extract_zip_preserving_modes(archive_path, destination_dir)
+        except (zipfile.BadZipFile, zlib.error, EOFError) as e:
+            click.echo("Discarding corrupt {} from remote build cache: {}".format(key, e), err = True)
+            remote_cache_backend.discard_file(key)
+            return False
+    finally:
+        shutil.rmtree(temp_dir)
+    
+    return True
+
+def push_directory(key, source_dir):
+    if remote_cache_backend is None or not remote_cache_push_enabled:
+        return
+    
+    temp_dir = tempfile.mkdtemp()
+    
+    try:
+        archive_path = os.path.join(temp_dir, "archive.zip")
+        
+        zip_helpers.write_zip_from_trees(
+            archive_path,
+            [zip_helpers.get_tree_entries(source_dir, [])],
+            compress_level = 1
+        )
+        
+        push_file(key, archive_path)
+    finally:
+        shutil.rmtree(temp_dir)
@@ -1,6 +1,14 @@
 import os
+import glob
+import json
+import shutil
+import hashlib
 import click
 import subprocess
+import hashing_helpers
+import build_cache_helpers
+import file_helpers
+import local_cache_helpers
 
 class RunCommandBuildStepAction(object):
     
@@ -10,9 +18,39 @@ class RunCommandBuildStepAction(object):
         
         if len(self.command) == 0:
             raise click.ClickException("\"RunCommand\" build step has no command.")
+        
+        # Globs (relative to Directory) and environment variable names that 
+        # determine the command's result, and the globs of what it produces. 
+        # With Inputs declared, the command only runs when something changed.
+        self.inputs = step_config.get("Inputs", [])
+        self.outputs = step_config.get("Outputs", [])
+        self.environment = step_config.get("Environment", [])
+        self.output_cache_directory = step_config.get("OutputCacheDirectory")
+        
+        # Without inputs, nothing could ever tell it to run again.
+        if len(self.outputs) > 0 and len(self.inputs) == 0:
+            click.echo("WARNING: \"{}\" declares \"Outputs\" but no \"Inputs\", so it runs every time.".format(self.command), err = True)
+        
+        self.build_cache_key = "RunCommand-{}".format(self.command)
     
     def run(self):
         
+        caching_enabled = len(self.inputs) > 0 and build_cache_helpers.build_cache_hashes_directory is not None
+        
+        input_digest = None
+        
+        if caching_enabled:
+            input_digest = self.get_input_digest()
+            
+            if self.are_outputs_current(input_digest):
+                click.echo("Skipping \"{}\". No change since last run.".format(self.command))
+                return
+            
+            if self.restore_outputs(input_digest):
+                click.echo("Skipping \"{}\". Restored its outputs from {}.".format(self.command, self.output_cache_directory))
+                self.write_run_record(input_digest)
+                return
+        
         click.echo("Running \"{}\".".format(self.command))
         
         change_dir = self.run_directory != ""
@@ -31,4 +69,164 @@ class RunCommandBuildStepAction(object):
         finally:
             if change_dir:
                 os.chdir(previous_working_dir)
-        
\ No newline at end of file
+        
+        if caching_enabled:
+            output_file_map = self.write_run_record(input_digest)
+            self.store_outputs(input_digest, output_file_map)
+    
+    def get_base_directory(self):
+        return self.run_directory or "."
+    
+    def get_matching_files(self, pattern_list):
+        base_directory = self.get_base_directory()
+        
+        matching_file_set = set()
+        
+        for each_pattern in pattern_list:
+            for each_path in glob.glob(os.path.join(base_directory, each_pattern), recursive = True):
+                if os.path.isfile(each_path):
+                    matching_file_set.add(os.path.relpath(each_path, base_directory).replace(os.sep, "/"))
+        
+        return sorted(matching_file_set)
+    
+    def get_input_digest(self):
+        input_digest = hashlib.sha1()
+        
+        input_digest.update("command={}\n".format(self.command).encode("utf-8"))
+        
+        for each_name in sorted(self.environment):
+            input_digest.update("env:{}={}\n".format(each_name, os.environ.get(each_name, "<unset>")).encode("utf-8"))
+        
+        for each_path in self.get_matching_files(self.inputs):
+            input_digest.update("file:{}={}\n".format(
+                each_path,
+                hashing_helpers.file_sha1_checksum(os.path.join(self.get_base_directory(), each_path))
+            ).encode("utf-8"))
+        
+        return input_digest.hexdigest()
+    
+    # {relative path: {"Size", "ModifiedTime"[, "Sha1"]}}
+    def get_output_file_map(self, include_hashes = False):
+        output_file_map = {}
+        
+        for each_path in self.get_matching_files(self.outputs):
+            full_path = os.path.join(self.get_base_directory(), each_path)
+            file_stat = os.stat(full_path)
+            
+            output_file_map[each_path] = {
+                "Size": file_stat.st_size,
+                "ModifiedTime": file_stat.st_mtime
+            }
+            
+            if include_hashes:
+                output_file_map[each_path]["Sha1"] = hashing_helpers.file_sha1_checksum(full_path)
+        
+        return output_file_map
+    
+    def get_run_record_path(self):
+        return build_cache_helpers.get_previous_build_cache_hash_file_path(self.build_cache_key, self.get_base_directory())
+    
+    def write_run_record(self, input_digest):
+        output_file_map = self.get_output_file_map(include_hashes = True)
+        
+        file_helpers.write_file_if_changed(self.get_run_record_path(), json.dumps({
+            "path": input_digest,
+            "outputs": output_file_map
+        }, sort_keys = True).encode("utf-8"))
+        
+        return output_file_map
+    
+    def are_outputs_current(self, input_digest):
+        try:
+            run_record = json.loads(open(self.get_run_record_path()).read())
+        except (IOError, ValueError):
+            return False
+        
+        if run_record.get("path") != input_digest:
+            return False
+        
+        # Every declared output has to match something, and nothing may have 
+        # changed since the last run.
+        for each_pattern in self.outputs:
+            if len(self.get_matching_files([each_pattern])) == 0:
+                return False
+        
+        recorded_output_file_map = run_record.get("outputs", {})
+        current_output_file_map = self.get_output_file_map()
+        
+        if set(recorded_output_file_map.keys()) != set(current_output_file_map.keys()):
+            return False
+        
+        for each_path, each_file_dict in current_output_file_map.items():
+            recorded_file_dict = recorded_output_file_map[each_path]
+            
+            if each_file_dict["Size"] != recorded_file_dict["Size"] or each_file_dict["ModifiedTime"] != recorded_file_dict["ModifiedTime"]:
+                return False
+        
+        return True
+    
+    def get_output_cache_paths(self, input_digest):
+        return (
+            os.path.join(self.output_cache_directory, "runs", "{}.json".format(input_digest)),
+            os.path.join(self.output_cache_directory, "objects")
+        )
+    
+    # Each file is stored once, by its hash.
+    def store_outputs(self, input_digest, output_file_map):
+        if self.output_cache_directory is None or len(output_file_map) == 0:
+            return
+        
+        run_manifest_path, objects_directory = self.get_output_cache_paths(input_digest)
+        
+        os.makedirs(objects_directory, exist_ok = True)
+        
+        for each_path, each_file_dict in output_file_map.items():
+            object_path = os.path.join(objects_directory, each_file_dict["Sha1"])
+            
+            if not os.path.exists(object_path):
+                temp_object_path = "{}.{}.tmp".format(object_path, os.getpid())
+                shutil.copy2(os.path.join(self.get_base_directory(), each_path), temp_object_path)
+                os.replace(temp_object_path, object_path)
+        
+        file_helpers.write_file_if_changed(run_manifest_path, json.dumps(
+            dict((x, y["Sha1"]) for x, y in output_file_map.items()),
+            sort_keys = True
+        ).encode("utf-8"))
+    
+    # Returns False unless every output is in the cache.
+    def restore_outputs(self, input_digest):
+        if self.output_cache_directory is None:
+            return False
+        
+        run_manifest_path, objects_directory = self.get_output_cache_paths(input_digest)
+        
+        try:
+            output_hash_map = json.loads(open(run_manifest_path).read())
+        except (IOError, ValueError):
+            local_cache_helpers.record_access(self.output_cache_directory, hit = False)
+            return False
+        
+        for each_hash in output_hash_map.values():
+            if not os.path.exists(os.path.join(objects_directory, each_hash)):
+                local_cache_helpers.record_access(self.output_cache_directory, hit = False)
+                return False
+        
+        for each_path, each_hash in output_hash_map.items():
+            full_path = os.path.join(self.get_base_directory(), each_path)
+            object_path = os.path.join(objects_directory, each_hash)
+            
+            os.makedirs(os.path.dirname(os.path.abspath(full_path)), exist_ok = True)
+            
+            try:
+                shutil.copy2(object_path, full_path)
+            except FileNotFoundError:
+                # Evicted since it was checked for. Running the command 
+                # rewrites whatever was restored.
+                local_cache_helpers.record_access(self.output_cache_directory, hit = False)
+                return False
+            
+            local_cache_helpers.touch_entry(object_path)
+        
+        local_cache_helpers.record_access(self.output_cache_directory, run_manifest_path)
+        
+        return True
@@ -0,0 +1,80 @@
+import json
+import hashlib
+import threading
+import file_helpers
+
+default_stack_fingerprint_path = ".boa-nimbus-stack-fingerprints.json"
+
+stack_fingerprint_path = default_stack_fingerprint_path
+
+# Set by --force-stack-check to ask CloudFormation about every stack anyway.
+force_stack_check = False
+
+fingerprint_lock = threading.Lock()
+
+# Stack statuses a deploy can safely leave as they are.
+settled_stack_statuses = set([
+    "CREATE_COMPLETE",
+    "UPDATE_COMPLETE"
+])
+
+def configure_stack_fingerprints(full_config, force = False):
+    global stack_fingerprint_path, force_stack_check
+    
+    stack_fingerprint_path = full_config.get("StackFingerprintPath", default_stack_fingerprint_path)
+    force_stack_check = force
+
+def get_stack_fingerprint(fingerprint_values):
+    return hashlib.sha1(
+        json.dumps(fingerprint_values, sort_keys = True).encode("utf-8")
+    ).hexdigest()
+
+def get_stack_record_key(account_id, region_name, stack_name):
+    return "{}/{}/{}".format(account_id, region_name, stack_name)
+
+def load_stack_records():
+    try:
+        with open(stack_fingerprint_path) as f:
+            return json.loads(f.read())
+    except (IOError, ValueError):
+        return {}
+
+# The stack ID catches a stack deleted and recreated outside boa-nimbus.
+def is_stack_unchanged(record_key, fingerprint, stack_id, stack_status):
+    if force_stack_check:
+        return False
+    
+    with fingerprint_lock:
+        stack_record = load_stack_records().get(record_key)
+    
+    if stack_record is None:
+        return False
+    
+    return stack_record.get("Fingerprint") == fingerprint and stack_record.get("StackId") == stack_id and stack_status in settled_stack_statuses
+
+def record_stack(record_key, fingerprint, stack_id, stack_status):
+    with fingerprint_lock:
+        stack_records = load_stack_records()
+        
+        stack_records[record_key] = {
+            "Fingerprint": fingerprint,
+            "StackId": stack_id,
+            "StackStatus": stack_status
+        }
+        
+        file_helpers.write_file_if_changed(
+            stack_fingerprint_path,
+            json.dumps(stack_records, indent = 4, sort_keys = True).encode("utf-8")
+        )
+
+def forget_stack(record_key):
+    with fingerprint_lock:
+        stack_records = load_stack_records()
+        
+        if stack_records.pop(record_key, None) is None:
+            return
+        
+        file_helpers.write_file_if_changed(
+            stack_fingerprint_path,
+            json.dumps(stack_records, indent = 4, sort_keys = True).encode("utf-8")
+        )
@@ -1,12 +1,13 @@
 import os
 import json
-import threading
+import time
+import concurrent.futures
 import click
-import boto3
 from botocore.exceptions import ClientError
 import yaml
-
-lambda_client = boto3.client("lambda")
+import artifacts_manifest_helpers
+import aws_helpers
+import deploy_journal_helpers
 
 class UpdateLambdaFunctionSourcesDeployStepAction(object):
     
@@ -15,14 +16,51 @@ class UpdateLambdaFunctionSourcesDeployStepAction(object):
         self.stack_name = step_config["StackName"]
         self.template_path = step_config["TemplatePath"]
         self.lambda_package_directory = step_config["LambdaPackageRelativeDirectory"]
+        self.max_concurrent_updates = step_config.get("MaxConcurrentUpdates", 10)
+        self.update_status_poll_seconds = step_config.get("UpdateStatusPollSeconds", 2)
+        self.update_status_timeout_seconds = step_config.get("UpdateStatusTimeoutSeconds", 300)
+        self.list_objects_threshold = step_config.get("ListObjectsThreshold", 100)
+        self.s3_object_metadata_map = {}
+        self.region_name = None
     
     def run(self):
         
-        response = boto3.client("sts").get_caller_identity()
+        function_update_list = self.get_function_update_list()
+        
+        if len(function_update_list) == 0:
+            return
+        
+        function_code_sha256_map = self.get_function_code_sha256_map()
+        
+        s3_key_etag_map = self.get_s3_key_etags(
+            function_update_list[0]["bucket_name"],
+            [x["s3_key"] for x in function_update_list]
+        )
+        
+        with concurrent.futures.ThreadPoolExecutor(max_workers = self.max_concurrent_updates) as executor:
+            future_list = []
+            
+            for each_function_update in function_update_list:
+                future_list.append(executor.submit(
+                    self.update_function_code_if_necessary,
+                    function_sha256_base64 = function_code_sha256_map.get(each_function_update["physical_resource_id"]),
+                    s3_object_etag = s3_key_etag_map.get(each_function_update["s3_key"]),
+                    **each_function_update
+                ))
+        
+        for each_future in future_list:
+            each_future.result()
+    
+    # Each as keyword arguments for update_function_code_if_necessary.
+    def get_function_update_list(self):
+        # Clients are created here rather than at import so they pick up the
+        # region and profile given on the command line.
+        self.lambda_client = aws_helpers.get_client("lambda", self.region_name)
+        self.s3_client = aws_helpers.get_client("s3", self.region_name)
         
-        bucket_name = self.bucket_name_prefix + response["Account"]
+        bucket_name = aws_helpers.get_bucket_name(self.bucket_name_prefix, self.region_name)
         
-        cf_resource_iterator = boto3.client("cloudformation").get_paginator("list_stack_resources").paginate(
+        cf_resource_iterator = aws_helpers.get_client("cloudformation", self.region_name).get_paginator("list_stack_resources").paginate(
             StackName = self.stack_name
         )
         
@@ -38,7 +76,7 @@ class UpdateLambdaFunctionSourcesDeployStepAction(object):
         
         resources_map = cf_template.get("Resources", {})
         
-        thread_list = []
+        function_update_list = []
         
         for each_resource_key, each_resource_dict in resources_map.items():
             if each_resource_dict.get("Type") != "AWS::Lambda::Function":
@@ -56,66 +94,191 @@ class UpdateLambdaFunctionSourcesDeployStepAction(object):
             
             each_function_s3_key = each_function_code_dict.get("S3Key")
             
-            if each_function_s3_key is None:
+            # Keys given as stack parameters (e.g. content-addressed keys) 
+            # are updated by the stack itself.
+            if not isinstance(each_function_s3_key, str):
                 continue
             
-            t = threading.Thread(
-                target = self.update_function_code_if_necessary, 
-                kwargs = {
-                    "logical_resource_id": each_resource_key,
-                    "physical_resource_id": physical_resource_id,
-                    "bucket_name": bucket_name,
-                    "s3_key": each_function_s3_key
-                }
+            function_update_list.append({
+                "logical_resource_id": each_resource_key,
+                "physical_resource_id": physical_resource_id,
+                "bucket_name": bucket_name,
+                "s3_key": each_function_s3_key
+            })
+        
+        return function_update_list
+    
+    def get_local_package_path(self, s3_key):
+        return os.path.join(self.lambda_package_directory, s3_key)
+    
+    # One paginated listing instead of a GetFunction call per function.
+    def get_function_code_sha256_map(self):
+        function_code_sha256_map = {}
+        
+        for each_response in self.lambda_client.get_paginator("list_functions").paginate():
+            for each_function in each_response.get("Functions", []):
+                function_code_sha256_map[each_function["FunctionName"]] = each_function["CodeSha256"]
+        
+        return function_code_sha256_map
+    
+    # Keys are checked with HEAD requests, except under a prefix holding at 
+    # least list_objects_threshold of them, which is listed instead. The 
+    # bucket's root is never listed.
+    def get_s3_key_etags(self, bucket_name, s3_key_list):
+        s3_key_etag_map = {}
+        
+        prefix_keys_map = {}
+        
+        for each_s3_key in set(s3_key_list):
+            each_prefix = each_s3_key.rsplit("/", 1)[0] + "/" if "/" in each_s3_key else ""
+            prefix_keys_map.setdefault(each_prefix, set()).add(each_s3_key)
+        
+        head_s3_key_list = []
+        
+        for each_prefix, each_s3_key_set in prefix_keys_map.items():
+            if each_prefix == "" or len(each_s3_key_set) < self.list_objects_threshold:
+                head_s3_key_list.extend(sorted(each_s3_key_set))
+                continue
+            
+            response_iter = self.s3_client.get_paginator("list_objects_v2").paginate(
+                Bucket = bucket_name,
+                Prefix = each_prefix
             )
             
-            thread_list.append(t)
+            for each_response in response_iter:
+                for each_object in each_response.get("Contents", []):
+                    if each_object["Key"] in each_s3_key_set:
+                        s3_key_etag_map[each_object["Key"]] = each_object["ETag"].strip('"')
         
-        for each_thread in thread_list:
-            each_thread.start()
+        with concurrent.futures.ThreadPoolExecutor(max_workers = self.max_concurrent_updates) as executor:
+            future_map = dict(
+                (x, executor.submit(self.head_s3_object, bucket_name, x)) for x in head_s3_key_list
+            )
         
-        for each_thread in thread_list:
-            each_thread.join()
+        for each_s3_key, each_future in future_map.items():
+            response = each_future.result()
             
+            if response is None:
+                continue
+            
+            s3_key_etag_map[each_s3_key] = response["ETag"].strip('"')
+            
+            # Saves get_s3_object_sha256_base64 asking again.
+            self.s3_object_metadata_map[each_s3_key] = response.get("Metadata", {})
         
-        #click.echo("Boafile: {}".format(cf_template))
+        return s3_key_etag_map
     
-    def update_function_code_if_necessary(self, logical_resource_id, physical_resource_id, bucket_name, s3_key):
-        
+    def head_s3_object(self, bucket_name, s3_key):
         try:
-            response = boto3.client("s3").head_object(
+            return self.s3_client.head_object(
                 Bucket = bucket_name,
                 Key = s3_key
             )
         except ClientError as e:
-            if e.response['Error']['Code'] == '404':
-                click.echo("No file found at s3://{}/{}.".format(
-                    bucket_name,
-                    s3_key
-                ), err = True)
-                return
-            else:
-                raise
+            if e.response['Error']['Code'] in ['404', 'NoSuchKey']:
+                return None
+            raise
+    
+    def update_function_code_if_necessary(self, logical_resource_id, physical_resource_id, bucket_name, s3_key, function_sha256_base64, s3_object_etag):
         
-        s3_object_sha256_base64 = response.get("Metadata", {}).get("boa-nimbus-sha256-base64", "")
+        if s3_object_etag is None:
+            click.echo("No file found at s3://{}/{}.".format(
+                bucket_name,
+                s3_key
+            ), err = True)
+            return
         
-        response = lambda_client.get_function(
-            FunctionName = physical_resource_id
-        )
+        if deploy_journal_helpers.is_function_update_completed(self.region_name, physical_resource_id, bucket_name, s3_key, s3_object_etag):
+            click.echo("Skipping {}. Completed before resuming.".format(
+                logical_resource_id
+            ))
+            return
+        
+        s3_object_sha256_base64 = self.get_s3_object_sha256_base64(bucket_name, s3_key, s3_object_etag)
         
-        function_sha256_base64 = response["Configuration"]["CodeSha256"]
+        if function_sha256_base64 is None:
+            # Not in the listing (e.g. given as an ARN), so ask for it directly.
+            response = self.lambda_client.get_function(
+                FunctionName = physical_resource_id
+            )
+            
+            function_sha256_base64 = response["Configuration"]["CodeSha256"]
         
         if s3_object_sha256_base64 == function_sha256_base64:
             click.echo("Skipping {}. No changes needed.".format(
                 logical_resource_id
             ))
+            deploy_journal_helpers.record_function_update(self.region_name, physical_resource_id, bucket_name, s3_key, s3_object_etag)
             return
         
         click.echo("Updating code of {}.".format(logical_resource_id))
         
-        lambda_client.update_function_code(
+        self.lambda_client.update_function_code(
             FunctionName = physical_resource_id,
             S3Bucket = bucket_name,
             S3Key = s3_key
         )
-        
\ No newline at end of file
+        
+        self.wait_for_function_update(logical_resource_id, physical_resource_id)
+        
+        deploy_journal_helpers.record_function_update(self.region_name, physical_resource_id, bucket_name, s3_key, s3_object_etag)
+    
+    def get_s3_object_sha256_base64(self, bucket_name, s3_key, s3_object_etag):
+        
+        # The build's artifacts manifest already knows the package's SHA-256.
+        # It applies when the uploaded object is that same file, i.e. its
+        # (single part) ETag is the local file's MD5.
+        artifact_dict = artifacts_manifest_helpers.get_artifact(
+            self.get_local_package_path(s3_key)
+        )
+        
+        if artifact_dict is not None and artifact_dict["Md5"] == s3_object_etag:
+            return artifact_dict["Sha256Base64"]
+        
+        # Object listings don't include user metadata, so fall back to the
+        # object's headers.
+        object_metadata = self.s3_object_metadata_map.get(s3_key)
+        
+        if object_metadata is None:
+            object_metadata = self.s3_client.head_object(
+                Bucket = bucket_name,
+                Key = s3_key
+            ).get("Metadata", {})
+        
+        return object_metadata.get("boa-nimbus-sha256-base64", "")
+    
+    # Older botocore releases (including the pinned 1.5.48) drop 
+    # LastUpdateStatus. Lambda applied updates synchronously back then, so 
+    # there's nothing to wait for.
+    def wait_for_function_update(self, logical_resource_id, physical_resource_id):
+        deadline = time.time() + self.update_status_timeout_seconds
+        
+        while True:
+            response = self.lambda_client.get_function_configuration(
+                FunctionName = physical_resource_id
+            )
+            
+            if "LastUpdateStatus" not in response:
+                click.echo("LastUpdateStatus not reported for {} (botocore may predate it). Not waiting for the update.".format(
+                    logical_resource_id
+                ), err = True)
+                return
+            
+            last_update_status = response["LastUpdateStatus"]
+            
+            if last_update_status != "InProgress":
+                break
+            
+            if time.time() >= deadline:
+                raise click.ClickException("Timed out after {} second(s) waiting for the code update of {}.".format(
+                    self.update_status_timeout_seconds,
+                    logical_resource_id
+                ))
+            
+            time.sleep(self.update_status_poll_seconds)
+        
+        if last_update_status == "Failed":
+            raise click.ClickException("Code update of {} failed: {}".format(
+                logical_resource_id,
+                response.get("LastUpdateStatusReason", "Unknown reason")
+            ))
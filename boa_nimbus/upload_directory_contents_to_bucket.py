@@ -1,10 +1,21 @@
 import os
-import threading
+import re
+import fnmatch
 import click
-import boto3
 from botocore.exceptions import ClientError
-import mime
-import hashing_helpers
+import artifacts_manifest_helpers
+import aws_helpers
+import artifact_keys_helpers
+import compression_helpers
+import mime_type_helpers
+import deploy_journal_helpers
+import concurrency_helpers
+import pipeline_helpers
+
+stack_template_key_prefix = "boa-nimbus/"
+
+def has_glob_characters(pattern):
+    return any(x in pattern for x in "*?[")
 
 class UploadDirectoryContentsToBucketDeployStepAction(object):
     
@@ -14,21 +25,80 @@ class UploadDirectoryContentsToBucketDeployStepAction(object):
         self.stack_name = step_config.get("StackName")
         self.directory = step_config["Directory"]
         self.except_files = step_config.get("ExceptFiles", [])
-        self.upload_only_if_not_exists_files = step_config.get("UploadOnlyIfNotExists", [])
+        self.upload_only_if_not_exists_files = set(step_config.get("UploadOnlyIfNotExists", []))
+        
+        # Plain keys are looked up in a set; glob patterns are compiled into 
+        # a single regular expression.
+        self.except_file_keys = set(x for x in self.except_files if not has_glob_characters(x))
+        
+        except_file_patterns = [fnmatch.translate(x) for x in self.except_files if has_glob_characters(x)]
+        
+        self.except_files_regex = None
+        
+        if len(except_file_patterns) > 0:
+            self.except_files_regex = re.compile("|".join("(?:{})".format(x) for x in except_file_patterns))
+        
+        self.content_addressed_keys = step_config.get("ContentAddressedKeys", False)
+        self.content_addressed_key_prefix = step_config.get("ContentAddressedKeyPrefix", artifact_keys_helpers.default_content_addressed_key_prefix)
+        
+        # Deletes objects under SyncPrefix that no longer exist locally.
+        self.sync = step_config.get("Sync", False)
+        self.sync_prefix = step_config.get("SyncPrefix")
+        self.sync_dry_run = step_config.get("SyncDryRun", False)
+        self.sync_max_deletes = step_config.get("SyncMaxDeletes", 1000)
+        
+        # Files at least this large are uploaded in parts, so an interrupted 
+        # upload can be resumed with --resume.
+        self.multipart_threshold = step_config.get("MultipartThreshold", 64 * 1024 * 1024)
+        self.multipart_chunk_size = max(step_config.get("MultipartChunkSize", 16 * 1024 * 1024), 5 * 1024 * 1024)
+        
+        if self.sync and self.content_addressed_keys:
+            raise click.ClickException("\"Sync\" can't be used with \"ContentAddressedKeys\". Use the gc command to remove old artifacts.")
+        
+        # Other steps may upload to the same bucket, so sync never covers the 
+        # whole bucket unless told to with a SyncPrefix of "".
+        if self.sync and self.sync_prefix is None:
+            raise click.ClickException("\"Sync\" needs a \"SyncPrefix\" for the objects it may delete (\"\" for the whole bucket).")
+        
+        # {extension: MIME type}, ahead of the bundled mime.types.txt.
+        self.content_type_overrides = {}
+        
+        for each_extension, each_mime_type in step_config.get("ContentTypeOverrides", {}).items():
+            self.content_type_overrides[mime_type_helpers.normalize_extension(each_extension)] = each_mime_type
+        
+        # [{"Pattern": "*.js", "ContentEncoding": "gzip", "CacheControl": "..."}, ...]
+        # The first rule whose pattern matches a key applies to it.
+        self.upload_rules = step_config.get("UploadRules", [])
+        
+        for each_rule in self.upload_rules:
+            if "Pattern" not in each_rule:
+                raise click.ClickException("Each of \"UploadRules\" needs a \"Pattern\".")
+            
+            if each_rule.get("ContentEncoding") is not None:
+                compression_helpers.validate_content_encoding(each_rule["ContentEncoding"])
         
-        self.global_exclude_files = [
+        self.region_name = None
+        
+        self.global_exclude_files = set([
             ".DS_Store"
-        ]
+        ])
+        
+        # Set to a dict to collect key -> MD5 of every local file this step 
+        # covers when it runs. Off by default so memory doesn't grow with 
+        # the size of the tree.
+        self.file_md5_map = None
+        
+        self.hash_workers = step_config.get("HashWorkers", os.cpu_count() or 4)
+        self.pipeline_queue_size = step_config.get("PipelineQueueSize", 1000)
     
-    def __get_bucket_name(self):
+    def get_bucket_name(self):
         if self.bucket_name_prefix is not None:
             
-            response = boto3.client("sts").get_caller_identity()
-            return self.bucket_name_prefix + response["Account"]
+            return aws_helpers.get_bucket_name(self.bucket_name_prefix, self.region_name)
             
         elif self.stack_bucket_logical_resource_id is not None and self.stack_name is not None:
             
-            response_iter = boto3.client("cloudformation").get_paginator("list_stack_resources").paginate(
+            response_iter = aws_helpers.get_client("cloudformation", self.region_name).get_paginator("list_stack_resources").paginate(
                 StackName = self.stack_name
             )
             
@@ -44,10 +114,106 @@ class UploadDirectoryContentsToBucketDeployStepAction(object):
         
         
         
-        bucket_name = self.__get_bucket_name()
+        bucket_name = self.get_bucket_name()
+        
+        self.failed_s3_keys = []
+        
+        # Only sync needs every local key at the end.
+        local_s3_key_set = set() if self.sync else None
+        
+        def walk_local_files():
+            for each_file_path, each_s3_key in self.iter_local_files():
+                if local_s3_key_set is not None:
+                    local_s3_key_set.add(each_s3_key)
+                
+                yield each_file_path, each_s3_key
+        
+        # Walk -> filter -> hash -> compare -> upload, streamed. The shared 
+        # S3 limiter decides how many requests actually run at once; the 
+        # upload stage only needs enough workers to reach its ceiling.
+        pipeline_helpers.run_pipeline(
+            walk_local_files(),
+            [
+                (lambda x: self.prepare_upload_in_thread(bucket_name, *x), self.hash_workers),
+                (lambda x: self.upload_prepared_file_in_thread(bucket_name, x), concurrency_helpers.get_limiter("s3").max_limit)
+            ],
+            queue_size = self.pipeline_queue_size
+        )
+        
+        # Finishing "successfully" would discard the deploy journal, so 
+        # failed uploads have to fail the step.
+        if len(self.failed_s3_keys) > 0:
+            raise click.ClickException("Unable to upload {} file(s): {}".format(
+                len(self.failed_s3_keys),
+                ", ".join(sorted(self.failed_s3_keys))
+            ))
+        
+        if self.sync:
+            self.delete_stale_objects(bucket_name, local_s3_key_set)
+    
+    def delete_stale_objects(self, bucket_name, local_s3_key_set):
+        s3_client = aws_helpers.get_client("s3", self.region_name)
+        
+        stale_s3_key_list = []
         
-        thread_list = []
+        response_iter = s3_client.get_paginator("list_objects_v2").paginate(
+            Bucket = bucket_name,
+            Prefix = self.sync_prefix
+        )
         
+        for each_response in response_iter:
+            for each_object in each_response.get("Contents", []):
+                each_s3_key = each_object["Key"]
+                
+                if each_s3_key in local_s3_key_set:
+                    continue
+                
+                if self.is_except_file(each_s3_key) or each_s3_key in self.upload_only_if_not_exists_files:
+                    continue
+                
+                # Stack templates are uploaded alongside by the stack step.
+                if each_s3_key.startswith(stack_template_key_prefix):
+                    continue
+                
+                stale_s3_key_list.append(each_s3_key)
+        
+        if len(stale_s3_key_list) == 0:
+            return
+        
+        if self.sync_dry_run:
+            click.echo("Sync dry run. Would delete {} object(s) from {}:".format(
+                len(stale_s3_key_list),
+                bucket_name
+            ))
+            
+            for each_s3_key in stale_s3_key_list:
+                click.echo(" * {}".format(each_s3_key))
+            
+            return
+        
+        if self.sync_max_deletes is not None and len(stale_s3_key_list) > self.sync_max_deletes:
+            raise click.ClickException("Sync would delete {} objects from {}, more than \"SyncMaxDeletes\" ({}). Nothing was deleted.".format(
+                len(stale_s3_key_list),
+                bucket_name,
+                self.sync_max_deletes
+            ))
+        
+        click.echo("Deleting {} object(s) no longer in {}.".format(
+            len(stale_s3_key_list),
+            self.directory
+        ))
+        
+        aws_helpers.delete_objects(s3_client, bucket_name, stale_s3_key_list)
+    
+    
+    def is_except_file(self, s3_key):
+        if s3_key in self.except_file_keys:
+            return True
+        
+        return self.except_files_regex is not None and self.except_files_regex.match(s3_key) is not None
+    
+    # Yields (file path, key) as the directory is walked.
+    def iter_local_files(self):
         for dir_name, subdir_list, file_list in os.walk(self.directory):
             
             for each_file in file_list:
@@ -56,38 +222,132 @@ class UploadDirectoryContentsToBucketDeployStepAction(object):
                 
                 each_s3_key = each_s3_key[len(self.directory)+1:]
                 
-                if each_s3_key in self.except_files:
+                if self.is_except_file(each_s3_key):
                     continue
                 
                 if each_file in self.global_exclude_files:
                     continue
                 
-                each_file_path = os.path.join(dir_name, each_file)
-                
-                t = threading.Thread(
-                    target = self.upload_file_if_necessary,
-                    kwargs = {
-                        "bucket_name": bucket_name,
-                        "each_file_path": each_file_path,
-                        "each_s3_key": each_s3_key
-                    }
-                )
-                
-                thread_list.append(t)
+                yield os.path.join(dir_name, each_file), each_s3_key
+    
+    def get_local_file_list(self):
+        return list(self.iter_local_files())
+    
+    # Without uploading anything.
+    def get_content_addressed_keys(self):
+        content_addressed_key_list = []
         
-        for each_thread in thread_list:
-            each_thread.start()
+        for each_file_path, each_s3_key in self.get_local_file_list():
+            each_file_md5, each_file_sha256_base64 = artifacts_manifest_helpers.get_file_digests(each_file_path)
+            
+            content_addressed_key_list.append(artifact_keys_helpers.get_content_addressed_key(
+                each_s3_key,
+                each_file_sha256_base64,
+                self.content_addressed_key_prefix
+            ))
         
-        for each_thread in thread_list:
-            each_thread.join()
-                
+        return content_addressed_key_list
+    
+    def get_upload_rule(self, s3_key):
+        for each_rule in self.upload_rules:
+            if fnmatch.fnmatchcase(s3_key, each_rule["Pattern"]):
+                return each_rule
+        
+        return {}
+    
+    # None if file_path is outside the directory or excluded.
+    def get_s3_key_for_file(self, file_path):
+        relative_path = os.path.relpath(file_path, self.directory)
+        
+        if relative_path == os.pardir or relative_path.startswith(os.pardir + os.sep):
+            return None
+        
+        each_s3_key = relative_path.replace(os.sep, "/")
+        
+        if self.is_except_file(each_s3_key):
+            return None
+        
+        if os.path.basename(file_path) in self.global_exclude_files:
+            return None
+        
+        return each_s3_key
+    
+    def prepare_upload_in_thread(self, bucket_name, each_file_path, each_s3_key):
+        try:
+            return self.prepare_upload(bucket_name, each_file_path, each_s3_key)
+        except Exception as e:
+            click.echo("Error uploading {}: {}".format(each_s3_key, e), err = True)
+            self.failed_s3_keys.append(each_s3_key)
+    
+    def upload_prepared_file_in_thread(self, bucket_name, prepared_upload):
+        try:
+            self.upload_prepared_file(bucket_name, prepared_upload)
+        except Exception as e:
+            click.echo("Error uploading {}: {}".format(prepared_upload["s3_key"], e), err = True)
+            self.failed_s3_keys.append(prepared_upload["s3_key"])
     
     def upload_file_if_necessary(self, bucket_name, each_file_path, each_s3_key):
         
-        s3_client = boto3.client("s3")
+        prepared_upload = self.prepare_upload(bucket_name, each_file_path, each_s3_key)
+        
+        if prepared_upload is not None:
+            self.upload_prepared_file(bucket_name, prepared_upload)
+    
+    # Returns None if the deploy journal says it's already done.
+    def prepare_upload(self, bucket_name, each_file_path, each_s3_key):
+        source_s3_key = each_s3_key
         
-        each_file_md5 = hashing_helpers.file_md5_checksum(os.path.abspath(each_file_path))
-        each_file_sha256_base64 = hashing_helpers.file_sha256_checksum_base64(os.path.abspath(each_file_path))
+        journal_entry = deploy_journal_helpers.get_completed_upload(bucket_name, source_s3_key, each_file_path)
+        
+        if journal_entry is not None:
+            if self.content_addressed_keys:
+                artifact_keys_helpers.record_resolved_key(source_s3_key, journal_entry["Key"])
+            
+            if self.file_md5_map is not None:
+                self.file_md5_map[journal_entry["Key"]] = journal_entry["Md5"]
+            
+            click.echo("Skipping upload of {}. Completed before resuming.".format(
+                journal_entry["Key"]
+            ))
+            return
+        
+        each_file_md5, each_file_sha256_base64 = artifacts_manifest_helpers.get_file_digests(each_file_path)
+        
+        if self.content_addressed_keys:
+            content_addressed_s3_key = artifact_keys_helpers.get_content_addressed_key(
+                each_s3_key,
+                each_file_sha256_base64,
+                self.content_addressed_key_prefix
+            )
+            
+            artifact_keys_helpers.record_resolved_key(each_s3_key, content_addressed_s3_key)
+            
+            each_s3_key = content_addressed_s3_key
+        
+        if self.file_md5_map is not None:
+            self.file_md5_map[each_s3_key] = each_file_md5
+        
+        return {
+            "file_path": each_file_path,
+            "source_s3_key": source_s3_key,
+            "s3_key": each_s3_key,
+            "md5": each_file_md5,
+            "sha256_base64": each_file_sha256_base64
+        }
+    
+    def upload_prepared_file(self, bucket_name, prepared_upload):
+        each_file_path = prepared_upload["file_path"]
+        source_s3_key = prepared_upload["source_s3_key"]
+        each_s3_key = prepared_upload["s3_key"]
+        each_file_md5 = prepared_upload["md5"]
+        each_file_sha256_base64 = prepared_upload["sha256_base64"]
+        
+        s3_client = aws_helpers.get_client("s3", self.region_name)
+        
+        upload_rule = self.get_upload_rule(each_s3_key)
+        
+        content_encoding = upload_rule.get("ContentEncoding")
+        cache_control = upload_rule.get("CacheControl")
         
         preexisting_file_md5 = None
         
@@ -99,6 +359,10 @@ class UploadDirectoryContentsToBucketDeployStepAction(object):
         
             preexisting_file_md5 = response.get("Metadata", {}).get("boa-nimbus-md5", "")
             
+            # Changed headers need a new upload too, even for the same file.
+            if response.get("ContentEncoding") != content_encoding or response.get("CacheControl") != cache_control:
+                preexisting_file_md5 = ""
+            
         except ClientError as e:
             if e.response['Error']['Code'] == '404':
                 pass
@@ -106,12 +370,22 @@ class UploadDirectoryContentsToBucketDeployStepAction(object):
                 raise
         
         if preexisting_file_md5 is not None and each_s3_key in self.upload_only_if_not_exists_files:
+            deploy_journal_helpers.record_upload(bucket_name, source_s3_key, each_s3_key, each_file_path, each_file_md5)
+            return
+        
+        # A content-addressed key can only ever hold these same bytes.
+        if preexisting_file_md5 is not None and self.content_addressed_keys:
+            click.echo("Skipping upload of {}. Already uploaded.".format(
+                each_s3_key
+            ))
+            deploy_journal_helpers.record_upload(bucket_name, source_s3_key, each_s3_key, each_file_path, each_file_md5)
             return
         
         if preexisting_file_md5 == each_file_md5:
             click.echo("Skipping upload of {}. No changes since last upload.".format(
                 each_s3_key
             ))
+            deploy_journal_helpers.record_upload(bucket_name, source_s3_key, each_s3_key, each_file_path, each_file_md5)
             return
         
         click.echo("Uploading file: {}.".format(
@@ -119,21 +393,122 @@ class UploadDirectoryContentsToBucketDeployStepAction(object):
         ))
         
         
-        s3_object_content = open(each_file_path, "rb").read()
-        
-        mime_type = "binary/octet-stream"
+        # Compressed uploads keep the source file's hashes in their metadata, 
+        # so change detection still compares against the source.
+        if content_encoding is not None:
+            s3_object_content = compression_helpers.get_compressed_content(
+                each_file_path,
+                each_file_sha256_base64,
+                content_encoding
+            )
+        elif os.path.getsize(each_file_path) >= self.multipart_threshold:
+            s3_object_content = None
+        else:
+            s3_object_content = open(each_file_path, "rb").read()
         
-        mime_type_list = mime.Types.of(each_file_path)
-        if len(mime_type_list):
-            mime_type = str(mime_type_list[0])
+        mime_type = mime_type_helpers.get_mime_type(each_file_path, self.content_type_overrides)
         
-        s3_client.put_object(
-            Bucket = bucket_name,
-            Key = each_s3_key,
-            Body = s3_object_content,
-            ContentType = mime_type,
-            Metadata = {
+        put_object_args = {
+            "Bucket": bucket_name,
+            "Key": each_s3_key,
+            "ContentType": mime_type,
+            "Metadata": {
                 "boa-nimbus-md5": each_file_md5,
                 "boa-nimbus-sha256-base64": each_file_sha256_base64
             }
+        }
+        
+        if content_encoding is not None:
+            put_object_args["ContentEncoding"] = content_encoding
+        
+        if cache_control is not None:
+            put_object_args["CacheControl"] = cache_control
+        
+        if s3_object_content is None:
+            response = self.upload_file_multipart(s3_client, put_object_args, each_file_path, each_file_md5)
+        else:
+            response = s3_client.put_object(Body = s3_object_content, **put_object_args)
+        
+        deploy_journal_helpers.record_upload(
+            bucket_name,
+            source_s3_key,
+            each_s3_key,
+            each_file_path,
+            each_file_md5,
+            response.get("ETag", "").strip('"')
+        )
+    
+    # An upload of the same file left unfinished by an interrupted run is 
+    # continued from its last part.
+    def upload_file_multipart(self, s3_client, object_args, file_path, file_md5):
+        bucket_name = object_args["Bucket"]
+        s3_key = object_args["Key"]
+        
+        upload_id = deploy_journal_helpers.get_multipart_upload_id(bucket_name, s3_key, file_md5, self.multipart_chunk_size)
+        
+        part_etag_map = {}
+        
+        if upload_id is not None:
+            try:
+                response_iter = s3_client.get_paginator("list_parts").paginate(
+                    Bucket = bucket_name,
+                    Key = s3_key,
+                    UploadId = upload_id
+                )
+                
+                for each_response in response_iter:
+                    for each_part in each_response.get("Parts", []):
+                        part_etag_map[each_part["PartNumber"]] = each_part["ETag"]
+                
+                click.echo("Resuming upload of {} with {} part(s) already uploaded.".format(
+                    s3_key,
+                    len(part_etag_map)
+                ))
+            except ClientError as e:
+                if e.response['Error']['Code'] == 'NoSuchUpload':
+                    upload_id = None
+                else:
+                    raise
+        
+        if upload_id is None:
+            response = s3_client.create_multipart_upload(**object_args)
+            upload_id = response["UploadId"]
+            
+            deploy_journal_helpers.record_multipart_upload_started(bucket_name, s3_key, file_md5, self.multipart_chunk_size, upload_id, self.region_name)
+        
+        part_number = 0
+        
+        with open(file_path, "rb") as f:
+            while True:
+                part_number += 1
+                
+                if part_number in part_etag_map:
+                    f.seek(self.multipart_chunk_size, os.SEEK_CUR)
+                    continue
+                
+                part_content = f.read(self.multipart_chunk_size)
+                
+                if len(part_content) == 0 and part_number > 1:
+                    break
+                
+                response = s3_client.upload_part(
+                    Bucket = bucket_name,
+                    Key = s3_key,
+                    UploadId = upload_id,
+                    PartNumber = part_number,
+                    Body = part_content
+                )
+                
+                part_etag_map[part_number] = response["ETag"]
+                
+                if len(part_content) < self.multipart_chunk_size:
+                    break
+        
+        return s3_client.complete_multipart_upload(
+            Bucket = bucket_name,
+            Key = s3_key,
+            UploadId = upload_id,
+            MultipartUpload = {
+                "Parts": [{"PartNumber": x, "ETag": part_etag_map[x]} for x in sorted(part_etag_map.keys())]
+            }
         )
\ No newline at end of file
@@ -0,0 +1,212 @@
+import os
+import uuid
+import zlib
+import zipfile
+import collections
+import concurrent.futures
+
+# Formats that are already compressed; deflating them again wastes time.
+default_store_only_extensions = [
+    ".whl", ".egg", ".zip", ".jar", ".gz", ".tgz", ".bz2", ".xz", ".lzma",
+    ".png", ".jpg", ".jpeg", ".gif", ".webp", ".mp3", ".mp4", ".woff", ".woff2"
+]
+
+# Entries that don't shrink below this fraction of their size are stored.
+minimum_compression_ratio = 0.95
+
+# Files are handed to compression workers in batches of about this many 
+# bytes, so packages made of many small files don't pay per-file overhead.
+compression_batch_bytes = 4 * 1024 * 1024
+
+# exclude_files apply at any depth, top_level_exclude_files only at the root.
+def get_tree_entries(root_dir, exclude_files, top_level_exclude_files = None):
+    entries_map = {}
+    
+    if root_dir is None or not os.path.isdir(root_dir):
+        return entries_map
+    
+    for dir_name, subdir_list, file_list in os.walk(root_dir):
+        subdir_list[:] = [x for x in subdir_list if x not in exclude_files]
+        
+        if dir_name == root_dir and top_level_exclude_files is not None:
+            subdir_list[:] = [x for x in subdir_list if x not in top_level_exclude_files]
+            file_list = [x for x in file_list if x not in top_level_exclude_files]
+        
+        for each_file in file_list:
+            if each_file in exclude_files:
+                continue
+            
+            each_file_path = os.path.join(dir_name, each_file)
+            each_arcname = os.path.relpath(each_file_path, root_dir).replace(os.sep, "/")
+            
+            entries_map[each_arcname] = each_file_path
+    
+    return entries_map
+
+# Runs on worker threads; zlib releases the GIL while it compresses.
+def compress_zip_entry_batch(entry_list, compress_level):
+    result_list = []
+    
+    for each_file_path, should_deflate in entry_list:
+        with open(each_file_path, "rb") as f:
+            raw_data = f.read()
+        
+        crc = zlib.crc32(raw_data) & 0xffffffff
+        compress_type = zipfile.ZIP_STORED
+        data = raw_data
+        
+        if should_deflate and len(raw_data) > 0:
+            compressor = zlib.compressobj(compress_level, zlib.DEFLATED, -15)
+            compressed_data = compressor.compress(raw_data) + compressor.flush()
+            
+            if len(compressed_data) < len(raw_data) * minimum_compression_ratio:
+                compress_type = zipfile.ZIP_DEFLATED
+                data = compressed_data
+        
+        result_list.append((compress_type, data, crc, len(raw_data)))
+    
+    return result_list
+
+# True if ZipFile has the private members write_compressed_entry needs.
+def can_write_compressed_entries(zf):
+    return all(hasattr(zf, x) for x in ["fp", "start_dir", "filelist", "NameToInfo", "_writecheck", "_didModify"])
+
+# ZipFile has no public way to append already compressed data, so this mirrors 
+# ZipFile.open() writing to a seekable file and relies on its private members 
+# (fp, start_dir, _writecheck, _didModify) as of Python 3.6 to 3.11.
+def write_compressed_entry(zf, zinfo, compress_type, data, crc, file_size):
+    if file_size > zipfile.ZIP64_LIMIT or len(data) > zipfile.ZIP64_LIMIT:
+        raise zipfile.LargeZipFile("Zip entry too large: {}".format(zinfo.filename))
+    
+    zinfo.compress_type = compress_type
+    zinfo.compress_size = len(data)
+    zinfo.file_size = file_size
+    zinfo.CRC = crc
+    zinfo.flag_bits = 0x00
+    
+    zf.fp.seek(zf.start_dir)
+    zinfo.header_offset = zf.fp.tell()
+    
+    zf._writecheck(zinfo)
+    zf._didModify = True
+    
+    zf.fp.write(zinfo.FileHeader(False))
+    zf.fp.write(data)
+    
+    zf.start_dir = zf.fp.tell()
+    zf.filelist.append(zinfo)
+    zf.NameToInfo[zinfo.filename] = zinfo
+
+def get_entry_batches(arcname_list, entries_map, store_only_extensions):
+    batch_list = []
+    current_batch = []
+    current_batch_bytes = 0
+    
+    for each_arcname in arcname_list:
+        each_file_path = entries_map[each_arcname]
+        should_deflate = os.path.splitext(each_arcname)[1].lower() not in store_only_extensions
+        
+        current_batch.append((each_arcname, each_file_path, should_deflate))
+        current_batch_bytes += os.path.getsize(each_file_path)
+        
+        if current_batch_bytes >= compression_batch_bytes:
+            batch_list.append(current_batch)
+            current_batch = []
+            current_batch_bytes = 0
+    
+    if len(current_batch) > 0:
+        batch_list.append(current_batch)
+    
+    return batch_list
+
+# Later maps win when archive names collide. Without the ZipFile internals, 
+# ZipFile.write() compresses each file again instead. Written next to zip_path 
+# and moved into place, so a failed build never leaves a truncated package.
+def write_zip_from_trees(zip_path, tree_entries_list, compress_level = zlib.Z_DEFAULT_COMPRESSION, max_workers = None, store_only_extensions = None):
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    
+    if store_only_extensions is None:
+        store_only_extensions = default_store_only_extensions
+    
+    store_only_extensions = set(x.lower() for x in store_only_extensions)
+    
+    entries_map = {}
+    
+    for each_tree_entries in tree_entries_list:
+        entries_map.update(each_tree_entries)
+    
+    batch_list = get_entry_batches(sorted(entries_map.keys()), entries_map, store_only_extensions)
+    
+    zip_dir = os.path.dirname(os.path.abspath(zip_path))
+    os.makedirs(zip_dir, exist_ok = True)
+    
+    temp_zip_path = os.path.join(zip_dir, ".{}.{}.tmp".format(
+        os.path.basename(zip_path),
+        uuid.uuid4()
+    ))
+    
+    executor = None
+    if max_workers > 1 and len(batch_list) > 1:
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers = max_workers)
+    
+    try:
+        with zipfile.ZipFile(temp_zip_path, "w", zipfile.ZIP_DEFLATED) as zf:
+            
+            use_compressed_entries = can_write_compressed_entries(zf)
+            
+            def write_batch(each_batch, each_result_list):
+                for (each_arcname, each_file_path, should_deflate), each_result in zip(each_batch, each_result_list):
+                    if use_compressed_entries:
+                        zinfo = zipfile.ZipInfo.from_file(each_file_path, each_arcname)
+                        write_compressed_entry(zf, zinfo, *each_result)
+                    else:
+                        zf.write(each_file_path, each_arcname, each_result[0])
+            
+            if executor is None:
+                for each_batch in batch_list:
+                    write_batch(each_batch, compress_zip_entry_batch(
+                        [(x[1], x[2]) for x in each_batch],
+                        compress_level
+                    ))
+            else:
+                # Keep a bounded number of batches in flight so memory use 
+                # doesn't grow with the size of the package.
+                pending_queue = collections.deque()
+                
+                for each_batch in batch_list:
+                    pending_queue.append((each_batch, executor.submit(
+                        compress_zip_entry_batch,
+                        [(x[1], x[2]) for x in each_batch],
+                        compress_level
+                    )))
+                    
+                    if len(pending_queue) >= max_workers * 2:
+                        done_batch, done_future = pending_queue.popleft()
+                        write_batch(done_batch, done_future.result())
+                
+                while len(pending_queue) > 0:
+                    done_batch, done_future = pending_queue.popleft()
+                    write_batch(done_batch, done_future.result())
+        
+        os.replace(temp_zip_path, zip_path)
+    except:
+        if os.path.exists(temp_zip_path):
+            os.unlink(temp_zip_path)
+        raise
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    
+    return len(entries_map)
+
+# ZipFile.extractall drops the permission bits.
+def extract_zip_preserving_modes(zip_path, destination_dir):
+    with zipfile.ZipFile(zip_path) as zf:
+        for each_info in zf.infolist():
+            extracted_path = zf.extract(each_info, destination_dir)
+            
+            each_mode = (each_info.external_attr >> 16) & 0o777
+            
+            if each_mode != 0 and not each_info.is_dir():
+                os.chmod(extracted_path, each_mode)
@@ -11,7 +11,6 @@ requires = [
     "botocore==1.5.48",
     "docutils==0.13.1",
     "jmespath==0.9.2",
-    "mime==0.1.0",
     "python-dateutil==2.6.0",
     "s3transfer==0.1.10",
     "six==1.10.0"
@@ -26,6 +25,7 @@ setup_options = dict(
     url='https://github.com/moduspwnens/boa-nimbus',
     packages=find_packages(exclude=['tests*']),
     install_requires=requires,
+    python_requires='>=3.6',
     include_package_data=True,
     entry_points = '''
         [console_scripts]
@@ -37,7 +37,6 @@ setup_options = dict(
         'Intended Audience :: System Administrators',
         'Natural Language :: English',
         'Programming Language :: Python',
-        'Programming Language :: Python :: 3.5',
         'Programming Language :: Python :: 3.6',
     ),
 )
@@ -0,0 +1,65 @@
+import os
+import json
+import shutil
+import pytest
+
+import hashing_helpers
+import artifacts_manifest_helpers
+
+@pytest.fixture
+def manifest_path(tmpdir, monkeypatch):
+    monkeypatch.chdir(str(tmpdir))
+    monkeypatch.setattr(artifacts_manifest_helpers, "manifest_changed", False)
+    monkeypatch.setattr(artifacts_manifest_helpers, "manifest_written_time", 0)
+    
+    artifacts_manifest_helpers.configure_artifacts_manifest({"ArtifactsManifestPath": "manifest.json"})
+    
+    return str(tmpdir.join("manifest.json"))
+
+def write_package(path, data):
+    with open(path, "wb") as f:
+        f.write(data)
+
+def test_manifest_written_in_batches(manifest_path, monkeypatch):
+    monkeypatch.setattr(artifacts_manifest_helpers, "manifest_write_interval_seconds", 3600)
+    
+    for each_index in range(3):
+        write_package("package{}.zip".format(each_index), os.urandom(1000))
+        artifacts_manifest_helpers.record_artifact("package{}.zip".format(each_index))
+    
+    # Only the first artifact is written straight away.
+    assert list(json.loads(open(manifest_path).read())["Artifacts"].keys()) == ["package0.zip"]
+    
+    artifacts_manifest_helpers.flush_manifest()
+    
+    assert sorted(json.loads(open(manifest_path).read())["Artifacts"].keys()) == ["package0.zip", "package1.zip", "package2.zip"]
+
+def test_artifact_trusted_after_copy(manifest_path):
+    package_data = os.urandom(200 * 1024)
+    write_package("package.zip", package_data)
+    
+    artifact_dict = artifacts_manifest_helpers.record_artifact("package.zip")
+    
+    # Copying (e.g. between CI jobs) changes the modified time only.
+    os.rename("package.zip", "original.zip")
+    shutil.copyfile("original.zip", "package.zip")
+    os.utime("package.zip", (0, 12345))
+    
+    assert artifacts_manifest_helpers.get_artifact("package.zip") == artifact_dict
+    assert artifacts_manifest_helpers.get_file_digests("package.zip") == hashing_helpers.file_md5_and_sha256_base64("package.zip")
+
+def test_changed_artifact_not_trusted(manifest_path):
+    package_data = bytearray(os.urandom(200 * 1024))
+    write_package("package.zip", package_data)
+    
+    artifacts_manifest_helpers.record_artifact("package.zip")
+    
+    package_data[-1] ^= 0xff
+    write_package("package.zip", package_data)
+    os.utime("package.zip", (0, 12345))
+    
+    assert artifacts_manifest_helpers.get_artifact("package.zip") is None
+    
+    write_package("package.zip", package_data + b"x")
+    
+    assert artifacts_manifest_helpers.get_artifact("package.zip") is None
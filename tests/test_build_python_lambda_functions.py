@@ -0,0 +1,11 @@
+import build_cache_helpers
+from build_python_lambda_functions import BuildPythonLambdaFunctionsBuildStepAction
+
+def test_size_reports_are_kept_per_output_directory(tmpdir, monkeypatch):
+    monkeypatch.setattr(build_cache_helpers, "build_cache_hashes_directory", str(tmpdir))
+    
+    first_action = BuildPythonLambdaFunctionsBuildStepAction({}, {"OutputDirectory": "build/api"})
+    second_action = BuildPythonLambdaFunctionsBuildStepAction({}, {"OutputDirectory": "build/worker"})
+    
+    assert first_action.get_size_report_path("handler") != second_action.get_size_report_path("handler")
+    assert first_action.get_size_report_path("handler") == first_action.get_size_report_path("handler")
@@ -0,0 +1,12 @@
+from click.testing import CliRunner
+
+import cli
+
+def test_build_profile_options_need_profile_imports(tmpdir, monkeypatch):
+    monkeypatch.chdir(str(tmpdir))
+    tmpdir.join("boafile.yaml").write("BuildStepGroups: []\n")
+    
+    result = CliRunner().invoke(cli.build, ["--no-use-docker", "--python", "python3.6", "--budget-ms", "500"])
+    
+    assert result.exit_code != 0
+    assert "only apply with --profile-imports" in result.output
@@ -0,0 +1,114 @@
+import itertools
+import boto3
+import pytest
+from botocore.exceptions import ClientError
+from botocore.stub import Stubber
+
+import aws_helpers
+import concurrency_helpers
+
+@pytest.fixture(autouse = True)
+def fake_clock(monkeypatch):
+    # Every call appears to take the same time, so the limiter's latency 
+    # check never holds back growth, and backoff doesn't sleep.
+    clock = itertools.count(10000)
+    
+    monkeypatch.setattr(concurrency_helpers.time, "time", lambda: next(clock) * 0.1)
+    monkeypatch.setattr(concurrency_helpers.time, "sleep", lambda seconds: None)
+    
+    concurrency_helpers.configure_concurrency({"ConcurrencyLimits": {
+        "s3": {"Initial": 8, "Min": 1, "Max": 64},
+        "lambda": {"Initial": 8, "Min": 1, "Max": 64}
+    }})
+    
+    yield
+    
+    concurrency_helpers.configure_concurrency({})
+
+def get_stubbed_client(monkeypatch, service_name):
+    client = boto3.client(service_name, region_name = "us-east-1", aws_access_key_id = "testing", aws_secret_access_key = "testing")
+    
+    monkeypatch.setattr(aws_helpers.boto3, "client", lambda service_name, region_name = None: client)
+    
+    return aws_helpers.get_client(service_name), Stubber(client)
+
+def add_throttle(stubber, operation_name, error_code, http_status_code):
+    stubber.add_client_error(operation_name, service_error_code = error_code, http_status_code = http_status_code)
+
+def test_s3_slow_down_halves_limit_then_grows(monkeypatch, capsys):
+    s3_client, stubber = get_stubbed_client(monkeypatch, "s3")
+    limiter = concurrency_helpers.get_limiter("s3")
+    
+    add_throttle(stubber, "head_object", "SlowDown", 503)
+    stubber.add_response("head_object", {})
+    
+    with stubber:
+        s3_client.head_object(Bucket = "bucket", Key = "key")
+    
+    # Halved from 8, then one success's worth of growth.
+    assert limiter.throttle_count == 1
+    assert int(limiter.limit) == 4
+    
+    throttled_limit = limiter.limit
+    
+    for each_index in range(20):
+        stubber.add_response("head_object", {})
+    
+    with stubber:
+        for each_index in range(20):
+            s3_client.head_object(Bucket = "bucket", Key = "key")
+    
+    stubber.assert_no_pending_responses()
+    
+    assert limiter.limit > throttled_limit + 3
+    assert limiter.peak_limit == 8
+    
+    concurrency_helpers.print_summary()
+    
+    assert "s3: concurrency {} (peak 8), 21 call(s), 1 throttled, 0 failed".format(int(limiter.limit)) in capsys.readouterr().out
+
+def test_lambda_too_many_requests_backs_off_to_min(monkeypatch, capsys):
+    lambda_client, stubber = get_stubbed_client(monkeypatch, "lambda")
+    limiter = concurrency_helpers.get_limiter("lambda")
+    
+    for each_index in range(limiter.max_throttled_attempts):
+        add_throttle(stubber, "get_function", "TooManyRequestsException", 429)
+    
+    with stubber:
+        with pytest.raises(ClientError):
+            lambda_client.get_function(FunctionName = "function")
+    
+    assert limiter.throttle_count == limiter.max_throttled_attempts
+    assert limiter.limit == 1
+    
+    concurrency_helpers.print_summary()
+    
+    assert "lambda: concurrency 1 (peak 8), 0 call(s), 6 throttled, 0 failed" in capsys.readouterr().out
+
+def test_throttles_seen_by_botocore_retries_count_once():
+    limiter = concurrency_helpers.get_limiter("s3")
+    handler = concurrency_helpers.on_needs_retry("s3")
+    
+    with pytest.raises(ClientError):
+        with limiter.slot():
+            handler(response = (None, {"Error": {"Code": "SlowDown"}}))
+            raise ClientError({"Error": {"Code": "SlowDown"}}, "HeadObject")
+    
+    assert limiter.throttle_count == 1
+    assert limiter.limit == 4
+
+def test_client_errors_are_not_failures(monkeypatch):
+    s3_client, stubber = get_stubbed_client(monkeypatch, "s3")
+    limiter = concurrency_helpers.get_limiter("s3")
+    
+    stubber.add_client_error("head_object", service_error_code = "404", http_status_code = 404)
+    stubber.add_client_error("head_object", service_error_code = "InternalError", http_status_code = 500)
+    
+    with stubber:
+        for each_index in range(2):
+            with pytest.raises(ClientError):
+                s3_client.head_object(Bucket = "bucket", Key = "key")
+    
+    assert limiter.call_count == 2
+    assert limiter.error_count == 1
+    assert limiter.throttle_count == 0
@@ -0,0 +1,62 @@
+import os
+import boto3
+from botocore.stub import Stubber
+
+import aws_helpers
+import deploy_journal_helpers
+
+def start_journal(tmpdir, monkeypatch):
+    monkeypatch.setattr(deploy_journal_helpers, "deploy_journal_path", str(tmpdir.join("journal.jsonl")))
+    monkeypatch.setattr(deploy_journal_helpers, "resumed_entries", {})
+    
+    deploy_journal_helpers.start_run()
+
+def test_fresh_start_aborts_unfinished_multipart_uploads(tmpdir, monkeypatch):
+    start_journal(tmpdir, monkeypatch)
+    
+    package_path = str(tmpdir.join("package.zip"))
+    open(package_path, "wb").write(b"data")
+    
+    deploy_journal_helpers.record_multipart_upload_started("bucket", "done.zip", "md5", 5, "upload-1", "us-west-2")
+    deploy_journal_helpers.record_upload("bucket", "done.zip", "done.zip", package_path, "md5")
+    deploy_journal_helpers.record_multipart_upload_started("bucket", "unfinished.zip", "md5", 5, "upload-2", "us-west-2")
+    deploy_journal_helpers.record_multipart_upload_started("bucket", "gone.zip", "md5", 5, "upload-3", "us-west-2")
+    
+    s3_client = boto3.client("s3", region_name = "us-west-2", aws_access_key_id = "testing", aws_secret_access_key = "testing")
+    stubber = Stubber(s3_client)
+    
+    region_name_list = []
+    
+    def get_client(service_name, region_name = None):
+        region_name_list.append(region_name)
+        return s3_client
+    
+    monkeypatch.setattr(aws_helpers, "get_client", get_client)
+    
+    stubber.add_response("abort_multipart_upload", {}, {"Bucket": "bucket", "Key": "unfinished.zip", "UploadId": "upload-2"})
+    stubber.add_client_error(
+        "abort_multipart_upload",
+        service_error_code = "NoSuchUpload",
+        http_status_code = 404,
+        expected_params = {"Bucket": "bucket", "Key": "gone.zip", "UploadId": "upload-3"}
+    )
+    
+    with stubber:
+        deploy_journal_helpers.start_run()
+    
+    stubber.assert_no_pending_responses()
+    
+    assert region_name_list == ["us-west-2", "us-west-2"]
+    assert not os.path.exists(deploy_journal_helpers.deploy_journal_path)
+
+def test_resume_keeps_multipart_uploads(tmpdir, monkeypatch):
+    start_journal(tmpdir, monkeypatch)
+    
+    deploy_journal_helpers.record_multipart_upload_started("bucket", "unfinished.zip", "md5", 5, "upload-1")
+    
+    monkeypatch.setattr(aws_helpers, "get_client", None)
+    
+    deploy_journal_helpers.start_run(resume = True)
+    
+    assert deploy_journal_helpers.get_multipart_upload_id("bucket", "unfinished.zip", "md5", 5) == "upload-1"
+    assert deploy_journal_helpers.get_multipart_upload_id("bucket", "unfinished.zip", "other-md5", 5) is None
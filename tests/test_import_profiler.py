@@ -0,0 +1,41 @@
+import os
+import sys
+import zipfile
+
+from import_profiler import ImportTimeProfiler
+
+def write_function_zip(output_directory, function_name, index_source):
+    with zipfile.ZipFile(os.path.join(output_directory, "{}.zip".format(function_name)), "w") as zf:
+        zf.writestr("index.py", index_source)
+        zf.writestr("helper.py", "import json\n")
+
+def get_config(tmpdir):
+    output_directory = str(tmpdir.mkdir("build"))
+    
+    write_function_zip(output_directory, "broken", "import module_that_is_not_packaged\n")
+    write_function_zip(output_directory, "working", "import helper\n")
+    
+    return {
+        "BuildStepGroups": [{"Steps": [{
+            "Action": "BuildPythonLambdaFunctions",
+            "InputDirectory": str(tmpdir.join("src")),
+            "OutputDirectory": output_directory
+        }]}]
+    }
+
+def test_import_failure_does_not_stop_profiling(tmpdir, capsys):
+    ImportTimeProfiler(get_config(tmpdir), sys.executable).run()
+    
+    captured = capsys.readouterr()
+    
+    assert "broken (index): not profiled." in captured.err
+    assert "module_that_is_not_packaged" in captured.err
+    assert "working (index):" in captured.out
+    assert "helper" in captured.out
+
+def test_missing_runtime_interpreter_is_reported(tmpdir, capsys, monkeypatch):
+    monkeypatch.setenv("PATH", str(tmpdir))
+    
+    ImportTimeProfiler(get_config(tmpdir), use_docker = False).run()
+    
+    assert capsys.readouterr().err.count("No python3.6 interpreter found") == 2
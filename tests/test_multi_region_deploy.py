@@ -0,0 +1,66 @@
+import boto3
+from botocore.stub import Stubber
+
+import aws_helpers
+from multi_region_deploy import MultiRegionDeployer
+
+def test_replicate_upload_compares_source_md5(monkeypatch):
+    s3_client = boto3.client("s3", region_name = "us-west-2", aws_access_key_id = "testing", aws_secret_access_key = "testing")
+    stubber = Stubber(s3_client)
+    
+    monkeypatch.setattr(aws_helpers, "get_client", lambda service_name, region_name = None: s3_client)
+    monkeypatch.setattr(aws_helpers, "get_bucket_name", lambda prefix, region_name = None: "{}{}".format(prefix, region_name))
+    
+    step_config = {
+        "Action": "UploadDirectoryContentsToBucket",
+        "BucketNamePrefix": "bucket-",
+        "Directory": "build",
+        "UploadOnlyIfNotExists": ["config.json"],
+        "UploadRules": [{"Pattern": "*.js", "CacheControl": "max-age=60"}]
+    }
+    
+    deployer = MultiRegionDeployer({}, ["us-east-1", "us-west-2"], max_copy_workers = 1)
+    
+    upload_action = deployer.create_action(step_config, "us-east-1")
+    upload_action.file_md5_map = {
+        "app.js": "md5-app",
+        "changed.html": "md5-new",
+        "config.json": "md5-config",
+        "missing.zip": "md5-missing",
+        "multipart.zip": "md5-multipart"
+    }
+    
+    def expect_head(s3_key, response):
+        stubber.add_response("head_object", response, {"Bucket": "bucket-us-west-2", "Key": s3_key})
+    
+    def expect_copy(s3_key):
+        stubber.add_response("copy_object", {}, {
+            "Bucket": "bucket-us-west-2",
+            "Key": s3_key,
+            "CopySource": {"Bucket": "bucket-us-east-1", "Key": s3_key}
+        })
+    
+    # Same file, but its cache headers changed since it was copied.
+    expect_head("app.js", {"Metadata": {"boa-nimbus-md5": "md5-app"}})
+    expect_copy("app.js")
+    
+    expect_head("changed.html", {"Metadata": {"boa-nimbus-md5": "md5-old"}})
+    expect_copy("changed.html")
+    
+    expect_head("config.json", {"Metadata": {"boa-nimbus-md5": "md5-other"}})
+    
+    stubber.add_client_error(
+        "head_object",
+        service_error_code = "404",
+        http_status_code = 404,
+        expected_params = {"Bucket": "bucket-us-west-2", "Key": "missing.zip"}
+    )
+    expect_copy("missing.zip")
+    
+    # A multipart ETag never matches a copy's, but the metadata does.
+    expect_head("multipart.zip", {"ETag": '"abc-3"', "Metadata": {"boa-nimbus-md5": "md5-multipart"}})
+    
+    with stubber:
+        deployer.replicate_upload(upload_action, step_config, "us-west-2")
+    
+    stubber.assert_no_pending_responses()
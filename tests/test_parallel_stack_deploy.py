@@ -0,0 +1,141 @@
+import os
+import click
+import pytest
+
+import aws_helpers
+import cloudformation_template_helpers
+from parallel_stack_deploy import ParallelStackDeployer
+from create_or_update_cloudformation_stack import CreateOrUpdateCloudFormationStackDeployStepAction
+
+network_template = """
+Outputs:
+  VpcId:
+    Value: vpc-1
+    Export:
+      Name: !Sub "${AWS::StackName}-VpcId"
+"""
+
+service_template = """
+Parameters:
+  NetworkStackName:
+    Type: String
+    Default: network
+Resources:
+  Service:
+    Type: AWS::EC2::SecurityGroup
+    Properties:
+      VpcId: !ImportValue
+        Fn::Sub: "${NetworkStackName}-VpcId"
+"""
+
+unresolved_import_template = """
+Parameters:
+  NetworkStackName:
+    Type: String
+Resources:
+  Service:
+    Type: AWS::EC2::SecurityGroup
+    Properties:
+      VpcId: !ImportValue
+        Fn::Sub: "${NetworkStackName}-VpcId"
+"""
+
+unrelated_template = """
+Resources:
+  Topic:
+    Type: AWS::SNS::Topic
+"""
+
+class FakeClient(object):
+    
+    class meta(object):
+        region_name = "eu-west-1"
+
+@pytest.fixture
+def write_step(tmpdir, monkeypatch):
+    monkeypatch.setattr(aws_helpers, "get_client", lambda service_name, region_name = None: FakeClient())
+    
+    def write_step(stack_name, template_string):
+        template_path = os.path.join(str(tmpdir), "{}.yaml".format(stack_name))
+        
+        with open(template_path, "w") as f:
+            f.write(template_string)
+        
+        return {
+            "Action": "CreateOrUpdateCloudFormationStack",
+            "StackName": stack_name,
+            "TemplatePath": template_path
+        }
+    
+    return write_step
+
+def get_dependency_map(step_config_list):
+    deployer = ParallelStackDeployer({}, step_config_list)
+    
+    return deployer.get_dependency_map([deployer.create_action(x) for x in step_config_list])
+
+def test_resolves_import_value_with_sub():
+    variables = {"NetworkStackName": "network", "AWS::StackName": "service"}
+    
+    assert cloudformation_template_helpers.resolve_string({"Fn::Sub": "${NetworkStackName}-VpcId"}, variables) == "network-VpcId"
+    assert cloudformation_template_helpers.resolve_string({"Fn::Sub": ["${Name}-VpcId", {"Name": {"Ref": "NetworkStackName"}}]}, variables) == "network-VpcId"
+    assert cloudformation_template_helpers.resolve_string({"Fn::Sub": "${!Literal}"}, variables) == "${Literal}"
+    assert cloudformation_template_helpers.resolve_string({"Fn::Sub": "${Missing}-VpcId"}, variables) is None
+    
+    import_names, has_unresolved_imports = cloudformation_template_helpers.get_import_names(
+        {"Resources": {"Service": {"Properties": {"VpcId": {"Fn::ImportValue": {"Fn::Sub": "${NetworkStackName}-VpcId"}}}}}},
+        variables
+    )
+    
+    assert import_names == set(["network-VpcId"])
+    assert not has_unresolved_imports
+
+def test_stack_waits_for_the_stack_it_imports_from(write_step):
+    dependency_map = get_dependency_map([
+        write_step("service", service_template),
+        write_step("network", network_template),
+        write_step("topics", unrelated_template)
+    ])
+    
+    assert dependency_map == {0: set([1]), 1: set(), 2: set()}
+
+def test_unresolved_import_waits_for_all_earlier_stacks(write_step):
+    dependency_map = get_dependency_map([
+        write_step("network", network_template),
+        write_step("topics", unrelated_template),
+        write_step("service", unresolved_import_template),
+        write_step("later", unrelated_template)
+    ])
+    
+    assert dependency_map[2] == set([0, 1])
+    assert dependency_map[3] == set()
+
+def test_circular_dependencies_are_detected():
+    deployer = ParallelStackDeployer({}, [])
+    
+    assert deployer.get_circular_indices({0: set([1]), 1: set([0]), 2: set(), 3: set([2])}) == set([0, 1])
+    assert deployer.get_circular_indices({0: set(), 1: set([0]), 2: set([1])}) == set()
+
+def test_stacks_depending_on_a_failed_stack_are_skipped(write_step, monkeypatch):
+    run_stack_names = []
+    
+    def run(self):
+        run_stack_names.append(self.stack_name)
+        
+        if self.stack_name == "network":
+            raise click.ClickException("Stack creation failed.")
+    
+    monkeypatch.setattr(CreateOrUpdateCloudFormationStackDeployStepAction, "run", run)
+    
+    deployer = ParallelStackDeployer({}, [
+        write_step("network", network_template),
+        write_step("service", service_template),
+        write_step("topics", unrelated_template)
+    ])
+    
+    with pytest.raises(click.ClickException) as e:
+        deployer.run()
+    
+    assert "network" in str(e.value.message)
+    assert sorted(run_stack_names) == ["network", "topics"]
+    assert deployer.stack_status_map == {"network": "FAILED", "service": "SKIPPED", "topics": "DONE"}
@@ -0,0 +1,52 @@
+import pytest
+
+import aws_helpers
+import pipelined_deploy
+from pipelined_deploy import PipelinedDeployer
+
+@pytest.fixture
+def created_bucket_prefixes(monkeypatch):
+    created_bucket_prefixes = []
+    
+    monkeypatch.setattr(aws_helpers, "get_bucket_name", lambda prefix, region_name = None: prefix + "123456789012")
+    monkeypatch.setattr(
+        pipelined_deploy.CreateBucketIfNotExistsDeployStepAction,
+        "run",
+        lambda self: created_bucket_prefixes.append(self.bucket_name_prefix)
+    )
+    
+    return created_bucket_prefixes
+
+def test_only_uploads_to_buckets_already_created(created_bucket_prefixes):
+    full_config = {"DeployStepGroups": [{"Steps": [
+        {"Action": "CreateBucketIfNotExists", "BucketNamePrefix": "early-"},
+        {"Action": "CreateOrUpdateCloudFormationStack", "StackName": "stack", "TemplatePath": "template.yaml"},
+        {"Action": "CreateBucketIfNotExists", "BucketNamePrefix": "late-"},
+        {"Action": "UploadDirectoryContentsToBucket", "BucketNamePrefix": "early-", "Directory": "build"},
+        {"Action": "UploadDirectoryContentsToBucket", "BucketNamePrefix": "late-", "Directory": "build"},
+        {"Action": "UploadDirectoryContentsToBucket", "BucketNamePrefix": "unmanaged-", "Directory": "build"}
+    ]}]}
+    
+    pipelined_deployer = PipelinedDeployer(full_config)
+    pipelined_deployer.start()
+    pipelined_deployer.finish()
+    
+    assert created_bucket_prefixes == ["early-"]
+    assert pipelined_deployer.completed_step_indices == set([0])
+    assert [x[1] for x in pipelined_deployer.upload_action_list] == ["early-123456789012"]
+
+def test_finish_without_raising_errors(created_bucket_prefixes, capsys):
+    pipelined_deployer = PipelinedDeployer({})
+    pipelined_deployer.start()
+    
+    def fail():
+        raise ValueError("upload failed")
+    
+    pipelined_deployer.add_future(pipelined_deployer.upload_executor.submit(fail))
+    
+    pipelined_deployer.finish(raise_errors = False)
+    
+    assert "upload failed" in capsys.readouterr().err
+    
+    with pytest.raises(ValueError):
+        pipelined_deployer.finish()
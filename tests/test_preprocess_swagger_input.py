@@ -0,0 +1,41 @@
+import os
+import glob
+import yaml
+import pytest
+
+from preprocess_swagger_input import PreprocessSwaggerInputBuildStepAction, SwaggerCorsTransformer, canonical_yaml_dump
+
+fixtures_directory = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "swagger_cors")
+
+# The expected outputs were produced by the implementation before 
+# SwaggerCorsTransformer, with the same region and account.
+fixture_input_paths = sorted(glob.glob(os.path.join(fixtures_directory, "*.input.yaml")))
+
+def transform_template(input_template):
+    cors_transformer = SwaggerCorsTransformer(input_template, "us-west-2", "123456789012")
+    
+    for each_path in input_template.get("paths", {}).keys():
+        cors_transformer.enable_cors_for_path(each_path)
+    
+    PreprocessSwaggerInputBuildStepAction({}, {}).clear_root_custom_properties(input_template)
+    
+    return input_template
+
+@pytest.mark.parametrize("input_path", fixture_input_paths, ids = os.path.basename)
+def test_cors_output_matches_baseline(input_path):
+    with open(input_path) as f:
+        input_template = yaml.safe_load(f)
+    
+    with open(input_path.replace(".input.yaml", ".expected.yaml")) as f:
+        expected_string = f.read()
+    
+    assert canonical_yaml_dump(transform_template(input_template)) == expected_string
+
+def test_fixtures_exist():
+    assert len(fixture_input_paths) > 0
+
+def test_existing_options_method_is_reported(capsys):
+    with open(os.path.join(fixtures_directory, "security_and_existing.input.yaml")) as f:
+        transform_template(yaml.safe_load(f))
+    
+    assert "due to existing OPTIONS method" in capsys.readouterr().out
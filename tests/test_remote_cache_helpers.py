@@ -0,0 +1,59 @@
+import os
+import pytest
+
+import local_cache_helpers
+import remote_cache_helpers
+
+@pytest.fixture
+def directory_cache(tmpdir, monkeypatch):
+    cache_path = str(tmpdir.mkdir("cache"))
+    
+    monkeypatch.setattr(local_cache_helpers, "pending_cache_counts", {})
+    monkeypatch.setattr(remote_cache_helpers, "remote_cache_push_enabled", True)
+    monkeypatch.setattr(
+        remote_cache_helpers,
+        "remote_cache_backend",
+        remote_cache_helpers.DirectoryRemoteCacheBackend({"Path": cache_path})
+    )
+    
+    return cache_path
+
+def push_source_directory(tmpdir, key):
+    source_dir = str(tmpdir.mkdir("source"))
+    
+    with open(os.path.join(source_dir, "module.py"), "w") as f:
+        f.write("value = 1\n" * 1000)
+    
+    remote_cache_helpers.push_directory(key, source_dir)
+
+def test_fetch_directory(tmpdir, directory_cache):
+    push_source_directory(tmpdir, "v/test/hash/dist.zip")
+    
+    destination_dir = str(tmpdir.join("destination"))
+    
+    assert remote_cache_helpers.fetch_directory("v/test/hash/dist.zip", destination_dir)
+    assert open(os.path.join(destination_dir, "module.py")).read() == "value = 1\n" * 1000
+    assert local_cache_helpers.pending_cache_counts[directory_cache] == {"Hits": 1, "Misses": 0}
+
+@pytest.mark.parametrize("corrupt", ["truncate", "flip_byte"])
+def test_fetch_directory_discards_corrupt_archive(tmpdir, directory_cache, corrupt):
+    push_source_directory(tmpdir, "v/test/hash/dist.zip")
+    
+    cached_file_path = os.path.join(directory_cache, "v/test/hash/dist.zip")
+    archive_bytes = bytearray(open(cached_file_path, "rb").read())
+    
+    if corrupt == "truncate":
+        archive_bytes = archive_bytes[:len(archive_bytes) // 2]
+    else:
+        # Inside the first entry's compressed data.
+        archive_bytes[60] ^= 0xff
+    
+    with open(cached_file_path, "wb") as f:
+        f.write(archive_bytes)
+    
+    destination_dir = str(tmpdir.join("destination"))
+    
+    assert not remote_cache_helpers.fetch_directory("v/test/hash/dist.zip", destination_dir)
+    assert not os.path.exists(os.path.join(destination_dir, "module.py"))
+    assert not os.path.exists(cached_file_path)
+    assert local_cache_helpers.pending_cache_counts[directory_cache] == {"Hits": 0, "Misses": 1}
@@ -0,0 +1,41 @@
+import os
+import pytest
+
+import build_cache_helpers
+from run_command import RunCommandBuildStepAction
+
+@pytest.fixture
+def project_directory(tmpdir, monkeypatch):
+    monkeypatch.setattr(build_cache_helpers, "build_cache_hashes_directory", str(tmpdir.mkdir("hashes")))
+    
+    project_directory = str(tmpdir.mkdir("project"))
+    
+    with open(os.path.join(project_directory, "input.txt"), "w") as f:
+        f.write("one")
+    
+    return project_directory
+
+def run_step(project_directory, **step_config):
+    step_config.update({
+        "Directory": project_directory,
+        "Command": "cat input.txt >> output.txt"
+    })
+    
+    RunCommandBuildStepAction({}, step_config).run()
+    
+    return open(os.path.join(project_directory, "output.txt")).read()
+
+def test_skips_when_inputs_unchanged(project_directory):
+    assert run_step(project_directory, Inputs = ["input.txt"], Outputs = ["output.txt"]) == "one"
+    assert run_step(project_directory, Inputs = ["input.txt"], Outputs = ["output.txt"]) == "one"
+    
+    with open(os.path.join(project_directory, "input.txt"), "w") as f:
+        f.write("two")
+    
+    assert run_step(project_directory, Inputs = ["input.txt"], Outputs = ["output.txt"]) == "onetwo"
+
+def test_outputs_without_inputs_always_run(project_directory, capsys):
+    assert run_step(project_directory, Outputs = ["output.txt"]) == "one"
+    assert run_step(project_directory, Outputs = ["output.txt"]) == "oneone"
+    
+    assert "declares \"Outputs\" but no \"Inputs\"" in capsys.readouterr().err
@@ -0,0 +1,40 @@
+import stack_fingerprint_helpers
+
+def configure(tmp_path):
+    stack_fingerprint_helpers.configure_stack_fingerprints({
+        "StackFingerprintPath": str(tmp_path / "fingerprints.json")
+    })
+
+def test_stack_records_are_keyed_by_account(tmp_path):
+    configure(tmp_path)
+    
+    stack_fingerprint_helpers.record_stack(
+        stack_fingerprint_helpers.get_stack_record_key("111111111111", "eu-west-1", "api"),
+        "fingerprint",
+        "stack-id",
+        "UPDATE_COMPLETE"
+    )
+    
+    assert stack_fingerprint_helpers.is_stack_unchanged(
+        stack_fingerprint_helpers.get_stack_record_key("111111111111", "eu-west-1", "api"),
+        "fingerprint",
+        "stack-id",
+        "UPDATE_COMPLETE"
+    )
+    assert not stack_fingerprint_helpers.is_stack_unchanged(
+        stack_fingerprint_helpers.get_stack_record_key("222222222222", "eu-west-1", "api"),
+        "fingerprint",
+        "stack-id",
+        "UPDATE_COMPLETE"
+    )
+
+def test_recreated_or_unsettled_stack_is_not_skipped(tmp_path):
+    configure(tmp_path)
+    
+    record_key = stack_fingerprint_helpers.get_stack_record_key("111111111111", "eu-west-1", "api")
+    
+    stack_fingerprint_helpers.record_stack(record_key, "fingerprint", "old-stack-id", "CREATE_COMPLETE")
+    
+    assert not stack_fingerprint_helpers.is_stack_unchanged(record_key, "fingerprint", "new-stack-id", "CREATE_COMPLETE")
+    assert not stack_fingerprint_helpers.is_stack_unchanged(record_key, "fingerprint", "old-stack-id", "UPDATE_ROLLBACK_COMPLETE")
+    assert not stack_fingerprint_helpers.is_stack_unchanged(record_key, "other-fingerprint", "old-stack-id", "CREATE_COMPLETE")
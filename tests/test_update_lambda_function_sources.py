@@ -0,0 +1,89 @@
+import boto3
+import click
+import pytest
+from botocore.stub import Stubber
+
+from update_lambda_function_sources import UpdateLambdaFunctionSourcesDeployStepAction
+
+def create_action(**step_config):
+    step_config.update({
+        "StackName": "stack",
+        "TemplatePath": "template.yaml",
+        "LambdaPackageRelativeDirectory": "build"
+    })
+    
+    return UpdateLambdaFunctionSourcesDeployStepAction({}, step_config)
+
+def create_stubbed_client(service_name):
+    client = boto3.client(
+        service_name,
+        region_name = "us-east-1",
+        aws_access_key_id = "testing",
+        aws_secret_access_key = "testing"
+    )
+    
+    return client, Stubber(client)
+
+def test_get_s3_key_etags_heads_each_key():
+    action = create_action(MaxConcurrentUpdates = 1)
+    action.s3_client, stubber = create_stubbed_client("s3")
+    
+    stubber.add_response(
+        "head_object",
+        {"ETag": '"abc"', "Metadata": {"boa-nimbus-sha256-base64": "sha"}},
+        {"Bucket": "bucket", "Key": "lambda/a.zip"}
+    )
+    stubber.add_client_error(
+        "head_object",
+        service_error_code = "404",
+        http_status_code = 404,
+        expected_params = {"Bucket": "bucket", "Key": "lambda/b.zip"}
+    )
+    
+    with stubber:
+        s3_key_etag_map = action.get_s3_key_etags("bucket", ["lambda/a.zip", "lambda/b.zip"])
+    
+    stubber.assert_no_pending_responses()
+    
+    assert s3_key_etag_map == {"lambda/a.zip": "abc"}
+    assert action.get_s3_object_sha256_base64("bucket", "lambda/a.zip", "abc") == "sha"
+
+def test_get_s3_key_etags_lists_crowded_prefix():
+    action = create_action(ListObjectsThreshold = 2)
+    action.s3_client, stubber = create_stubbed_client("s3")
+    
+    stubber.add_response(
+        "list_objects_v2",
+        {"Contents": [
+            {"Key": "lambda/a.zip", "ETag": '"abc"'},
+            {"Key": "lambda/b.zip", "ETag": '"def"'},
+            {"Key": "lambda/other.zip", "ETag": '"123"'}
+        ]},
+        {"Bucket": "bucket", "Prefix": "lambda/"}
+    )
+    
+    with stubber:
+        s3_key_etag_map = action.get_s3_key_etags("bucket", ["lambda/a.zip", "lambda/b.zip"])
+    
+    assert s3_key_etag_map == {"lambda/a.zip": "abc", "lambda/b.zip": "def"}
+
+def test_wait_for_function_update_times_out():
+    action = create_action(UpdateStatusPollSeconds = 0, UpdateStatusTimeoutSeconds = 0)
+    action.lambda_client, stubber = create_stubbed_client("lambda")
+    
+    stubber.add_response("get_function_configuration", {"LastUpdateStatus": "InProgress"}, {"FunctionName": "fn"})
+    
+    with stubber:
+        with pytest.raises(click.ClickException):
+            action.wait_for_function_update("Function", "fn")
+
+def test_wait_for_function_update_without_status_field():
+    action = create_action()
+    action.lambda_client, stubber = create_stubbed_client("lambda")
+    
+    stubber.add_response("get_function_configuration", {"FunctionName": "fn"}, {"FunctionName": "fn"})
+    
+    with stubber:
+        action.wait_for_function_update("Function", "fn")
+    
+    stubber.assert_no_pending_responses()
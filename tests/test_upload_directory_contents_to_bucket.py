@@ -0,0 +1,43 @@
+import boto3
+import click
+import pytest
+from botocore.stub import Stubber
+
+import aws_helpers
+from upload_directory_contents_to_bucket import UploadDirectoryContentsToBucketDeployStepAction
+
+def test_sync_requires_sync_prefix():
+    with pytest.raises(click.ClickException):
+        UploadDirectoryContentsToBucketDeployStepAction({}, {"Directory": "build", "BucketNamePrefix": "bucket-", "Sync": True})
+    
+    # An empty prefix has to be asked for.
+    UploadDirectoryContentsToBucketDeployStepAction({}, {"Directory": "build", "BucketNamePrefix": "bucket-", "Sync": True, "SyncPrefix": ""})
+
+def test_sync_only_deletes_under_sync_prefix(monkeypatch):
+    s3_client = boto3.client("s3", region_name = "us-east-1", aws_access_key_id = "testing", aws_secret_access_key = "testing")
+    stubber = Stubber(s3_client)
+    
+    monkeypatch.setattr(aws_helpers, "get_client", lambda service_name, region_name = None: s3_client)
+    
+    upload_action = UploadDirectoryContentsToBucketDeployStepAction({}, {
+        "Directory": "build",
+        "BucketNamePrefix": "bucket-",
+        "Sync": True,
+        "SyncPrefix": "site/"
+    })
+    
+    stubber.add_response(
+        "list_objects_v2",
+        {"Contents": [{"Key": "site/index.html"}, {"Key": "site/old.html"}]},
+        {"Bucket": "bucket", "Prefix": "site/"}
+    )
+    stubber.add_response(
+        "delete_objects",
+        {"Deleted": [{"Key": "site/old.html"}]},
+        {"Bucket": "bucket", "Delete": {"Objects": [{"Key": "site/old.html"}], "Quiet": True}}
+    )
+    
+    with stubber:
+        upload_action.delete_stale_objects("bucket", set(["site/index.html"]))
+    
+    stubber.assert_no_pending_responses()
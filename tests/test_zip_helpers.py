@@ -0,0 +1,59 @@
+import os
+import zipfile
+import pytest
+
+import zip_helpers
+
+@pytest.fixture
+def source_tree(tmpdir):
+    root_dir = str(tmpdir.mkdir("source"))
+    os.makedirs(os.path.join(root_dir, "package"))
+    
+    contents_map = {
+        "package/__init__.py": b"",
+        "package/module.py": b"print('hello')\n" * 2000,
+        "package/data.whl": os.urandom(4096),
+        "random.bin": os.urandom(64 * 1024)
+    }
+    
+    for each_arcname, each_data in contents_map.items():
+        with open(os.path.join(root_dir, each_arcname), "wb") as f:
+            f.write(each_data)
+    
+    return root_dir, contents_map
+
+def check_zip(zip_path, contents_map):
+    with zipfile.ZipFile(zip_path) as zf:
+        assert zf.testzip() is None
+        assert sorted(zf.namelist()) == sorted(contents_map.keys())
+        
+        for each_arcname, each_data in contents_map.items():
+            assert zf.read(each_arcname) == each_data
+        
+        assert zf.getinfo("package/module.py").compress_type == zipfile.ZIP_DEFLATED
+        assert zf.getinfo("package/data.whl").compress_type == zipfile.ZIP_STORED
+        assert zf.getinfo("random.bin").compress_type == zipfile.ZIP_STORED
+
+@pytest.mark.parametrize("max_workers", [1, 4])
+def test_write_zip_from_trees(tmpdir, monkeypatch, source_tree, max_workers):
+    root_dir, contents_map = source_tree
+    
+    # One entry per batch, so several batches are in flight at once.
+    monkeypatch.setattr(zip_helpers, "compression_batch_bytes", 1)
+    
+    zip_path = str(tmpdir.join("out.zip"))
+    entries_map = zip_helpers.get_tree_entries(root_dir, [])
+    
+    assert zip_helpers.write_zip_from_trees(zip_path, [entries_map], max_workers = max_workers) == len(contents_map)
+    
+    check_zip(zip_path, contents_map)
+
+def test_write_zip_without_private_zipfile_members(tmpdir, monkeypatch, source_tree):
+    root_dir, contents_map = source_tree
+    
+    monkeypatch.setattr(zip_helpers, "can_write_compressed_entries", lambda zf: False)
+    
+    zip_path = str(tmpdir.join("out.zip"))
+    zip_helpers.write_zip_from_trees(zip_path, [zip_helpers.get_tree_entries(root_dir, [])], max_workers = 2)
+    
+    check_zip(zip_path, contents_map)